@@ -0,0 +1,26 @@
+"""Keyset pagination indexes
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Индексы (name, id) для постраничного обхода с сортировкой по названию
+    op.create_index('ix_companies_name_id', 'companies', ['name', 'id'], unique=False)
+    op.create_index('ix_banks_name_id', 'banks', ['name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_banks_name_id', table_name='banks')
+    op.drop_index('ix_companies_name_id', table_name='companies')
@@ -0,0 +1,26 @@
+"""Bank accounts parent indexes
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Подсчет и выборка счетов по компании/банку без полного сканирования
+    op.create_index('ix_bank_accounts_company_id_id', 'bank_accounts', ['company_id', 'id'], unique=False)
+    op.create_index('ix_bank_accounts_bank_id_id', 'bank_accounts', ['bank_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_bank_accounts_bank_id_id', table_name='bank_accounts')
+    op.drop_index('ix_bank_accounts_company_id_id', table_name='bank_accounts')
@@ -0,0 +1,63 @@
+"""Name search indexes
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+TABLES = ('companies', 'banks')
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Триграммные GIN-индексы для ILIKE '%...%' по названию
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in TABLES:
+            op.create_index(
+                f'ix_{table}_name_trgm', table, ['name'],
+                postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+            )
+    elif dialect == 'sqlite':
+        # FTS5 с триграммами поверх таблиц, синхронизируется триггерами
+        for table in TABLES:
+            fts = f'{table}_fts'
+            op.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5(name, content='{table}', content_rowid='id', tokenize='trigram')"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF name ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); "
+                f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END"
+            )
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in TABLES:
+            op.drop_index(f'ix_{table}_name_trgm', table_name=table)
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            fts = f'{table}_fts'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {fts}')
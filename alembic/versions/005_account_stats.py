@@ -0,0 +1,37 @@
+"""Account stats counters
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('account_stats',
+        sa.Column('scope', sa.String(length=10), nullable=False),
+        sa.Column('parent_id', sa.Integer(), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('is_active', sa.String(length=1), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('scope', 'parent_id', 'currency', 'is_active')
+    )
+    # Начальные значения по существующим счетам
+    for scope, column in (('bank', 'bank_id'), ('company', 'company_id')):
+        op.execute(
+            f"INSERT INTO account_stats (scope, parent_id, currency, is_active, count) "
+            f"SELECT '{scope}', {column}, currency, is_active, COUNT(*) FROM bank_accounts "
+            f"GROUP BY {column}, currency, is_active"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('account_stats')
@@ -0,0 +1,28 @@
+"""Row version columns for optimistic locking
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+TABLES = ('companies', 'banks', 'bank_accounts')
+
+
+def upgrade() -> None:
+    # server_default заполняет существующие строки без перезаписи таблицы (PostgreSQL 11+)
+    for table in TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, 'version')
@@ -0,0 +1,35 @@
+"""Bank accounts ON DELETE CASCADE
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+# Внешние ключи в 001 созданы без имен: имена PostgreSQL по умолчанию, а в SQLite
+# (пересоздание таблицы в batch-режиме) те же имена задаются соглашением
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+FOREIGN_KEYS = (('company_id', 'companies'), ('bank_id', 'banks'))
+
+
+def _recreate_foreign_keys(ondelete) -> None:
+    with op.batch_alter_table('bank_accounts', naming_convention=NAMING_CONVENTION) as batch_op:
+        for column, parent in FOREIGN_KEYS:
+            name = f'bank_accounts_{column}_fkey'
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, parent, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    _recreate_foreign_keys('CASCADE')
+
+
+def downgrade() -> None:
+    _recreate_foreign_keys(None)
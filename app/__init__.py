@@ -0,0 +1,4 @@
+import time
+
+# Начало импорта пакета приложения - точка отсчета холодного старта
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,76 @@
+"""Служебные команды:
+
+    python -m app.cli rebuild-stats
+    python -m app.cli import-banks 20261018_ED807_full.xml [--dry-run] [--close-missing]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import zipfile
+from typing import Iterator
+
+# Байт, читаемых из файла справочника за раз
+READ_CHUNK_SIZE = 1 << 20
+
+async def rebuild_stats() -> None:
+    from .crud.stats import account_stats_crud
+    from .database import AsyncSessionLocal, async_engine
+    
+    async with AsyncSessionLocal() as db:
+        rows = await account_stats_crud.rebuild(db)
+    await async_engine.dispose()
+    print(f"Счетчики счетов пересчитаны: {rows} строк")
+
+def read_chunks(path: str) -> Iterator[bytes]:
+    """Файл справочника кусками; из zip-архива ЦБ берется первый XML"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            name = next(name for name in archive.namelist() if name.lower().endswith(".xml"))
+            with archive.open(name) as f:
+                yield from iter(lambda: f.read(READ_CHUNK_SIZE), b"")
+        return
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(READ_CHUNK_SIZE), b"")
+
+async def import_banks(path: str, close_missing: bool, dry_run: bool) -> int:
+    from .crud.bank import bank_crud
+    from .database import AsyncSessionLocal, async_engine
+    from .ed807 import CHANGES_CLOSE_MISSING_ERROR, ED807Parser, iter_entries
+    
+    start = time.perf_counter()
+    parser = ED807Parser()
+    entries = list(iter_entries(read_chunks(path), parser))
+    if close_missing and parser.is_changes:
+        print(CHANGES_CLOSE_MISSING_ERROR, file=sys.stderr)
+        return 2
+    async with AsyncSessionLocal() as db:
+        counts = await bank_crud.sync_directory(db, entries, close_missing=close_missing, dry_run=dry_run)
+    await async_engine.dispose()
+    print(json.dumps(
+        {"total": len(entries) + parser.skipped, "skipped": parser.skipped, "dry_run": dry_run, **counts,
+         "seconds": round(time.perf_counter() - start, 2)},
+        ensure_ascii=False
+    ))
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Служебные команды Banking API")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild-stats", help="Пересчитать счетчики для /stats/accounts по таблице счетов")
+    import_parser = commands.add_parser("import-banks", help="Синхронизировать банки со справочником БИК (ED807)")
+    import_parser.add_argument("path", help="XML справочника или zip-архив с ним")
+    import_parser.add_argument("--dry-run", action="store_true", help="Только посчитать изменения")
+    import_parser.add_argument("--close-missing", action="store_true",
+                               help="Закрыть банки, которых нет в файле (только для полного справочника FIRR)")
+    
+    args = parser.parse_args()
+    if args.command == "rebuild-stats":
+        asyncio.run(rebuild_stats())
+    elif args.command == "import-banks":
+        return asyncio.run(import_banks(args.path, close_missing=args.close_missing, dry_run=args.dry_run))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
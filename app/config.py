@@ -1,4 +1,5 @@
 from pydantic import Field, ConfigDict
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 
 from dotenv import load_dotenv, find_dotenv
@@ -8,10 +9,64 @@ class Settings(BaseSettings):
     model_config = ConfigDict(env_file=".env", extra='allow')
     
     database_url: str = Field(alias="DATABASE_URL")
+    # URL с асинхронным драйвером (asyncpg, aiosqlite); если не задан, выводится из DATABASE_URL
+    async_database_url: Optional[str] = Field(default=None, alias="ASYNC_DATABASE_URL")
+    # Реплики для чтения через запятую (URL как у DATABASE_URL или с асинхронным драйвером)
+    database_replica_urls: str = Field(default="", alias="DATABASE_REPLICA_URLS")
+    replica_check_interval: float = Field(default=5, alias="REPLICA_CHECK_INTERVAL")  # секунды
+    # Сколько секунд после записи чтения клиента идут на основную БД
+    read_your_writes_window: float = Field(default=5, alias="READ_YOUR_WRITES_WINDOW")
+    # Создавать таблицы по моделям при старте вместо проверки миграций (только для разработки)
+    database_create_all: bool = Field(default=False, alias="DATABASE_CREATE_ALL")
+    # Пауза между попытками инициализации, пока БД недоступна или не на последней миграции
+    startup_retry_interval: float = Field(default=5, alias="STARTUP_RETRY_INTERVAL")  # секунды
     secret_key: str = Field(alias="SECRET_KEY")
     algorithm: str = Field(default="HS256", alias="ALGORITHM")
     access_token_expire_minutes: int = 30
     
+    # Пул соединений с БД (на каждый процесс)
+    db_pool_size: int = Field(default=5, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=30, alias="DB_POOL_TIMEOUT")  # секунды ожидания свободного соединения
+    db_pool_recycle: int = Field(default=1800, alias="DB_POOL_RECYCLE")  # секунды жизни соединения
+    db_pool_pre_ping: bool = Field(default=True, alias="DB_POOL_PRE_PING")
+    # Соединений с БД на все воркеры app.server (max_connections PostgreSQL за вычетом резерва);
+    # пул каждого воркера уменьшается, чтобы воркеры вместе не превысили это число
+    db_max_connections: int = Field(default=90, alias="DB_MAX_CONNECTIONS")
+    # Потоки для синхронных обработчиков; по умолчанию db_pool_size + db_max_overflow
+    threadpool_size: Optional[int] = Field(default=None, alias="THREADPOOL_SIZE")
+    
+    # Продакшен-сервер (python -m app.server)
+    web_workers: Optional[int] = Field(default=None, alias="WEB_WORKERS")  # по умолчанию число ядер
+    # Воркер перезапускается после стольких запросов (0 - не перезапускать); разброс,
+    # чтобы воркеры не перезапускались одновременно
+    worker_max_requests: int = Field(default=10000, alias="WORKER_MAX_REQUESTS")
+    worker_max_requests_jitter: int = Field(default=1000, alias="WORKER_MAX_REQUESTS_JITTER")
+    # Секунд на завершение начатых запросов после SIGTERM
+    graceful_timeout: int = Field(default=30, alias="GRACEFUL_TIMEOUT")
+    
+    # Профилирование SQL по запросам (для разработки и CI)
+    query_profiling: bool = Field(default=False, alias="QUERY_PROFILING")
+    query_budget: int = Field(default=15, alias="QUERY_BUDGET")  # запросов к БД на HTTP-запрос
+    slow_query_ms: float = Field(default=100, alias="SLOW_QUERY_MS")
+    repeated_query_threshold: int = Field(default=3, alias="REPEATED_QUERY_THRESHOLD")  # признак N+1
+    
+    # Списки: словари из строк БД кодируются orjson без повторной проверки схемой
+    fast_responses: bool = Field(default=False, alias="FAST_RESPONSES")
+    
+    # Кэш справочников (банки, компании) в памяти процесса
+    reference_cache_size: int = Field(default=10000, alias="REFERENCE_CACHE_SIZE")
+    reference_cache_ttl: float = Field(default=300, alias="REFERENCE_CACHE_TTL")  # секунды
+    # Заполнить кэш справочников при старте
+    reference_cache_preload: bool = Field(default=True, alias="REFERENCE_CACHE_PRELOAD")
+    
+    # Idempotency-Key: memory - ответы в памяти процесса, database - в таблице idempotency_keys (все воркеры)
+    idempotency_store: Literal["memory", "database"] = Field(default="memory", alias="IDEMPOTENCY_STORE")
+    idempotency_cache_size: int = Field(default=10000, alias="IDEMPOTENCY_CACHE_SIZE")
+    idempotency_ttl: float = Field(default=86400, alias="IDEMPOTENCY_TTL")  # секунды хранения ответа
+    # Секунды ожидания запроса с тем же ключом, выполняющегося в другом воркере
+    idempotency_wait: float = Field(default=30, alias="IDEMPOTENCY_WAIT")
+    
     # Database configuration fields
     db_user: str = Field(alias="DB_USER")
     db_password: str = Field(alias="DB_PASSWORD") 
@@ -1,3 +1,4 @@
 from .company import company_crud
 from .bank import bank_crud
-from .bank_account import bank_account_crud
\ No newline at end of file
+from .bank_account import bank_account_crud
+from .stats import account_stats_crud
@@ -1,38 +1,270 @@
-from sqlalchemy.orm import Session, joinedload
+from datetime import datetime, timezone
+from sqlalchemy import func, select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
 from ..models.bank import Bank
-from ..schemas.bank import BankCreate, BankUpdate
-from typing import List, Optional
+from ..models.bank_account import BankAccount
+from .pagination import paginate, make_page
+from .batch import in_request_order, load_rows
+from .fields import selected_attributes, selected_columns, trim_rows
+from .summary import attach_accounts_summary
+from .stats import account_stats_crud
+from .search import search_statement, paginate_search, make_search_page
+from .cache import bank_cache
+from .integrity import constraint_name
+from .versioning import (
+    children_version_columns, delete_version, next_version, split_children_version, update_version
+)
+from ..schemas.bank import BankCreate, BankPatch, BankUpdate, check_correspondent_account
+from ..schemas.fields import FieldSelection
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Поля банка, которые берутся из справочника БИК
+DIRECTORY_FIELDS = ("name", "correspondent_account", "address")
+
+# Строк в одном INSERT ... ON CONFLICT / UPDATE ... WHERE bik IN при синхронизации
+DIRECTORY_BATCH_SIZE = 1000
+
+# Колонки RETURNING для patch: запись и сводка по ее счетам для ETag
+PATCH_RETURNING = (*Bank.__table__.c, *children_version_columns(Bank, BankAccount, "bank_id"))
 
 class BankCRUD:
-    def create(self, db: Session, obj_in: BankCreate) -> Bank:
+    async def create(self, db: AsyncSession, obj_in: BankCreate) -> Bank:
         db_obj = Bank(**obj_in.dict())
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        await db.commit()
+        return await self.get(db, id=db_obj.id)
+    
+    async def get(self, db: AsyncSession, id: int) -> Optional[Bank]:
+        result = await db.execute(
+            select(Bank)
+            .options(selectinload(Bank.bank_accounts))
+            .filter(Bank.id == id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+    
+    async def get_version(self, db: AsyncSession, id: int) -> Optional[tuple]:
+        """Версия для ETag без загрузки связей; состав - как в CompanyCRUD.get_version"""
+        accounts = (
+            select(
+                func.count(BankAccount.id).label("count"),
+                func.coalesce(func.sum(BankAccount.version), 0).label("versions"),
+                func.max(BankAccount.id).label("last_id"),
+            )
+            .filter(BankAccount.bank_id == id)
+            .subquery()
+        )
+        result = await db.execute(
+            select(Bank.id, Bank.version, accounts.c.count, accounts.c.versions, accounts.c.last_id)
+            .join(accounts, true())  # агрегат из одной строки
+            .filter(Bank.id == id)
+        )
+        row = result.first()
+        return tuple(row) if row else None
     
-    def get(self, db: Session, id: int) -> Optional[Bank]:
-        return db.query(Bank).options(joinedload(Bank.bank_accounts)).filter(Bank.id == id).first()
+    def version(self, obj: Bank) -> tuple:
+        """Та же версия, что get_version, по загруженному объекту со счетами"""
+        accounts = obj.bank_accounts
+        return (
+            obj.id, obj.version, len(accounts),
+            sum(account.version for account in accounts), max((account.id for account in accounts), default=None),
+        )
     
-    def get_by_bik(self, db: Session, bik: str) -> Optional[Bank]:
-        return db.query(Bank).filter(Bank.bik == bik).first()
+    async def get_by_bik(self, db: AsyncSession, bik: str) -> Optional[Bank]:
+        result = await db.execute(select(Bank).filter(Bank.bik == bik))
+        return result.scalars().first()
     
-    def get_multi(self, db: Session, skip: int = 0, limit: int = 100) -> List[Bank]:
-        return db.query(Bank).options(joinedload(Bank.bank_accounts)).offset(skip).limit(limit).all()
+    async def get_lookup(self, db: AsyncSession, ids: Iterable[int], store: bool = True) -> Dict[int, dict]:
+        """Краткие данные по id (без текстовых колонок) из кэша справочника; store=False - не заполнять кэш промахами"""
+        return await bank_cache.get_many(db, ids, store=store)
     
-    def update(self, db: Session, db_obj: Bank, obj_in: BankUpdate) -> Bank:
+    async def get_cached(self, db: AsyncSession, id: int) -> Optional[dict]:
+        """Краткие данные по id из кэша; для проверок существования"""
+        return await bank_cache.get(db, id)
+    
+    async def get_cached_by_bik(self, db: AsyncSession, bik: str) -> Optional[dict]:
+        return await bank_cache.get_by_key(db, bik)
+    
+    async def get_multi(
+        self, db: AsyncSession, skip: int = 0, limit: int = 100,
+        cursor: Optional[str] = None, sort: str = "id", accounts_limit: int = 0, as_rows: bool = False,
+        selection: Optional[FieldSelection] = None
+    ) -> Tuple[List[Bank], Optional[str]]:
+        """Страница записей; as_rows - словари из колонок без создания ORM-объектов.
+
+        При selection читаются только выбранные колонки (и колонка сортировки для
+        курсора), а сводка по счетам считается, только если ее поля запрошены.
+        """
+        if selection is None:
+            stmt = select(*Bank.__table__.c) if as_rows else select(Bank)
+        elif as_rows:
+            stmt = select(*selected_columns(Bank, selection.fields, sort))
+        else:
+            stmt = select(Bank).options(load_only(*selected_attributes(Bank, selection.fields, sort)))
+        stmt = paginate(stmt, Bank, limit=limit, skip=skip, cursor=cursor, sort=sort)
+        result = await db.execute(stmt)
+        items, next_cursor = make_page(result.all() if as_rows else result.scalars().all(), limit, sort)
+        if as_rows:
+            items = [row._asdict() for row in items]
+        if selection is None or {"accounts_count", "bank_accounts"} & set(selection.fields):
+            await attach_accounts_summary(db, items, BankAccount.bank_id, accounts_limit, as_rows=as_rows)
+        if as_rows and selection is not None:
+            items = trim_rows(items, selection.fields)
+        return items, next_cursor
+    
+    async def get_many(
+        self, db: AsyncSession, ids: List[int], accounts_limit: int = 0
+    ) -> Tuple[List[dict], List[int]]:
+        """Записи по списку id: (найденные в порядке запроса, отсутствующие id).
+
+        Вместо всех счетов - их число и, при accounts_limit > 0, первые счета
+        (как в списке), чтобы пачка крупных записей не тянула все их счета.
+        """
+        rows = await load_rows(db, Bank, ids)
+        await attach_accounts_summary(db, list(rows.values()), BankAccount.bank_id, accounts_limit, as_rows=True)
+        return in_request_order(ids, rows)
+    
+    async def search(
+        self, db: AsyncSession, q: str, limit: int = 20, cursor: Optional[str] = None
+    ) -> Tuple[List[Bank], Optional[str]]:
+        """Поиск по названию и BIK, по рангу совпадения"""
+        stmt, rank = search_statement(db.get_bind().dialect.name, Bank, Bank.bik, q)
+        result = await db.execute(paginate_search(stmt, Bank, rank, q, limit, cursor))
+        return make_search_page(result.all(), q, limit)
+    
+    async def update(
+        self, db: AsyncSession, db_obj: Bank, obj_in: BankUpdate, version: Optional[int] = None
+    ) -> Optional[Bank]:
+        """Обновление одним UPDATE ... WHERE id [AND version]; VersionConflict, если версия не совпала.
+
+        version - версия из If-Match: запись, измененная после проверки ETag,
+        не перезаписывается. None, если запись удалили после чтения.
+        """
+        old_bik = db_obj.bik
         update_data = obj_in.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_obj, field, value)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
-    
-    def delete(self, db: Session, id: int) -> Optional[Bank]:
-        obj = db.query(Bank).filter(Bank.id == id).first()
+        if await update_version(db, Bank, db_obj.id, update_data, version, (Bank.id,)) is None:
+            return None
+        await db.commit()
+        bank_cache.invalidate(db_obj.id, old_bik, update_data.get("bik", old_bik))
+        return await self.get(db, id=db_obj.id)
+    
+    async def patch(
+        self, db: AsyncSession, id: int, obj_in: BankPatch, version: Optional[int] = None
+    ) -> Optional[Tuple[dict, tuple]]:
+        """Частичное обновление одним UPDATE ... WHERE id AND version RETURNING, без счетов.
+
+        Возвращает (запись, версия для ETag): сводка по счетам для ETag читается
+        подзапросами в том же RETURNING. version - ожидаемая версия (из тела или If-Match).
+
+        None, если банка нет; VersionConflict, если версия не совпала; ValueError -
+        БИК занят или корр. счет не сходится с БИК. Прежние БИК и корр. счет читаются
+        с блокировкой строки, только если меняется одно из них.
+        """
+        values = obj_in.dict(exclude_unset=True, exclude={"version"})
+        old = None
+        if {"bik", "correspondent_account"} & values.keys():
+            result = await db.execute(
+                select(Bank.bik, Bank.correspondent_account).where(Bank.id == id).with_for_update()
+            )
+            old = result.mappings().first()
+            if old is not None:
+                try:
+                    check_correspondent_account(
+                        values.get("bik", old["bik"]), values.get("correspondent_account", old["correspondent_account"])
+                    )
+                except ValueError:
+                    await db.rollback()
+                    raise
+        try:
+            row = await update_version(db, Bank, id, values, version, PATCH_RETURNING)
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            if constraint_name(e) == "ix_banks_bik":
+                raise ValueError("Банк с таким БИК уже существует")
+            raise ValueError("Недопустимые значения полей банка")
+        if row is not None and values:
+            bank_cache.invalidate(id, old["bik"] if old else None, row["bik"])
+        return split_children_version(row) if row is not None else None
+    
+    async def sync_directory(
+        self, db: AsyncSession, entries: List[dict], close_missing: bool = False, dry_run: bool = False
+    ) -> Dict[str, int]:
+        """Синхронизирует банки со справочником БИК (ED807) в одной транзакции.
+
+        Записи сопоставляются с банками по БИК. Изменяются только строки, у которых
+        отличаются название, корр. счет, адрес или признак закрытия, поэтому
+        updated_at остальных не меняется. Новые и измененные банки пишутся пакетами
+        INSERT ... ON CONFLICT (bik) DO UPDATE. Банки со статусом PSDL и, при
+        close_missing, отсутствующие в файле получают closed_at; вернувшиеся в
+        справочник открываются снова.
+        """
+        now = datetime.now(timezone.utc)
+        result = await db.execute(select(Bank.bik, Bank.closed_at, *[getattr(Bank, f) for f in DIRECTORY_FIELDS]))
+        existing = {row.bik: row for row in result}
+        
+        counts = dict.fromkeys(("created", "updated", "closed", "unchanged"), 0)
+        upserts = []
+        for entry in {entry["bik"]: entry for entry in entries}.values():
+            row = existing.get(entry["bik"])
+            values = {"bik": entry["bik"], **{f: entry[f] for f in DIRECTORY_FIELDS}}
+            if row is None:
+                values["closed_at"] = now if entry["closed"] else None
+                upserts.append(values)
+                counts["created"] += 1
+                continue
+            values["closed_at"] = (row.closed_at or now) if entry["closed"] else None
+            if all(getattr(row, f) == values[f] for f in DIRECTORY_FIELDS) and (row.closed_at is None) != entry["closed"]:
+                counts["unchanged"] += 1
+                continue
+            upserts.append(values)
+            counts["closed" if entry["closed"] and row.closed_at is None else "updated"] += 1
+        
+        seen = {entry["bik"] for entry in entries}
+        close = [
+            bik for bik, row in existing.items()
+            if close_missing and bik not in seen and row.closed_at is None
+        ]
+        counts["closed"] += len(close)
+        if dry_run:
+            return counts
+        
+        dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        for start in range(0, len(upserts), DIRECTORY_BATCH_SIZE):
+            stmt = dialect_insert(Bank).values(upserts[start:start + DIRECTORY_BATCH_SIZE])
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=["bik"],
+                set_={
+                    **{f: stmt.excluded[f] for f in (*DIRECTORY_FIELDS, "closed_at")},
+                    **next_version(Bank),
+                    "updated_at": func.now(),
+                },
+            ))
+        for start in range(0, len(close), DIRECTORY_BATCH_SIZE):
+            await db.execute(
+                update(Bank)
+                .where(Bank.bik.in_(close[start:start + DIRECTORY_BATCH_SIZE]))
+                .values(closed_at=now, **next_version(Bank))
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+        if upserts or close:
+            bank_cache.cache.clear()
+        return counts
+    
+    async def delete(self, db: AsyncSession, id: int, version: Optional[int] = None) -> Optional[Bank]:
+        """Удаляет запись (счета - ON DELETE CASCADE); с version - только эту версию, иначе VersionConflict"""
+        result = await db.execute(select(Bank).filter(Bank.id == id))
+        obj = result.scalars().first()
         if obj:
-            db.delete(obj)
-            db.commit()
+            await account_stats_crud.remove_parent(db, "bank", obj.id)
+            if not await delete_version(db, Bank, obj.id, version):
+                return None
+            await db.commit()
+            bank_cache.invalidate(obj.id, obj.bik)
         return obj
 
-bank_crud = BankCRUD()
\ No newline at end of file
+bank_crud = BankCRUD()
@@ -1,61 +1,433 @@
-from sqlalchemy.orm import Session, joinedload
+from collections import Counter
+from sqlalchemy import func, insert, literal_column, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, load_only, raiseload
 from sqlalchemy.exc import IntegrityError
 from ..models.bank_account import BankAccount
-from ..schemas.bank_account import BankAccountCreate, BankAccountUpdate
-from typing import List, Optional
+from ..models.bank import Bank
+from ..models.company import Company
+from .pagination import paginate, make_page
+from .cache import bank_cache, company_cache
+from .integrity import constraint_name
+from .batch import in_request_order, load_rows
+from .fields import selected_attributes, selected_columns
+from .stats import STATS_FIELDS, account_stats_crud
+from .versioning import delete_version, next_version, update_version
+from ..requisites import VALID, account_key_prefix, check_accounts, is_valid_account
+from ..schemas.bank_account import BankAccountCreate, BankAccountUpdate, BulkStatusUpdate
+from ..schemas.fields import FieldSelection
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+# Сообщения об ошибках по имени нарушенного ограничения
+INTEGRITY_ERRORS = {
+    "unique_account_per_bank": "Счет с таким номером уже существует в данном банке",
+    "bank_accounts_company_id_fkey": "Компания не найдена",
+    "bank_accounts_bank_id_fkey": "Банк не найден",
+}
+
+def _integrity_message(error: IntegrityError) -> str:
+    """Сообщение для ошибки записи после проверки ссылок по кэшу.
+
+    Компания и банк к этому моменту проверены, поэтому без имени ограничения
+    (SQLite его не называет) это гонка за уникальный номер счета. Внешний ключ
+    нарушается, только если запись удалили между проверкой и записью.
+    """
+    return INTEGRITY_ERRORS.get(constraint_name(error), INTEGRITY_ERRORS["unique_account_per_bank"])
+
+ACCOUNT_KEY_ERROR = "Номер счета не соответствует БИК банка (неверный контрольный ключ)"
+
+# Поля, от которых зависит контрольный ключ счета
+KEY_FIELDS = {"account_number", "bank_id"}
+
+def _related_columns(model, fk_column: str, prefix: str) -> list:
+    """Колонки связанной записи подзапросами для RETURNING.
+
+    RETURNING выводит колонки без имени таблицы, поэтому условие связи
+    задается полными именами.
+    """
+    condition = literal_column(f"{model.__tablename__}.id") == literal_column(f"{BankAccount.__tablename__}.{fk_column}")
+    return [
+        select(column).where(condition).scalar_subquery().label(f"{prefix}__{column.name}")
+        for column in model.__table__.c
+    ]
+
+# Колонки RETURNING: счет вместе с компанией и банком - ответ без повторного чтения
+RETURNING_COLUMNS = (
+    *BankAccount.__table__.c,
+    *_related_columns(Company, "company_id", "company"),
+    *_related_columns(Bank, "bank_id", "bank"),
+)
+
+# Колонки списка счетов с компанией и банком через JOIN (as_rows)
+JOINED_COLUMNS = (
+    *BankAccount.__table__.c,
+    *[column.label(f"company__{column.name}") for column in Company.__table__.c],
+    *[column.label(f"bank__{column.name}") for column in Bank.__table__.c],
+)
+
+# Связи счета: модель и внешний ключ
+RELATED = {
+    "company": (Company, BankAccount.company_id),
+    "bank": (Bank, BankAccount.bank_id),
+}
+
+def _joined(stmt):
+    return stmt.join(Company, Company.id == BankAccount.company_id).join(Bank, Bank.id == BankAccount.bank_id)
+
+def _select_accounts(selection: Optional[FieldSelection], as_rows: bool):
+    """Запрос счетов: все колонки с компанией и банком или только выбранные поля.
+
+    Для выбранных полей ORM-путь получает load_only и joinedload/raiseload по связям,
+    быстрый путь - только нужные колонки и JOIN лишь с запрошенными таблицами.
+    """
+    if selection is None:
+        if as_rows:
+            return _joined(select(*JOINED_COLUMNS))
+        return select(BankAccount).options(joinedload(BankAccount.company), joinedload(BankAccount.bank))
+    relations = selection.relations
+    if as_rows:
+        stmt = select(*selected_columns(BankAccount, selection.fields))
+        for name, fields in relations.items():
+            model, fk_column = RELATED[name]
+            stmt = stmt.add_columns(
+                *[column.label(f"{name}__{column.name}") for column in selected_columns(model, fields)]
+            ).join(model, model.id == fk_column)
+        return stmt
+    options = [load_only(*selected_attributes(BankAccount, selection.fields))]
+    for name, (model, _) in RELATED.items():
+        relationship = getattr(BankAccount, name)
+        if name in relations:
+            options.append(joinedload(relationship).load_only(*selected_attributes(model, relations[name])))
+        else:
+            options.append(raiseload(relationship))
+    return select(BankAccount).options(*options)
+
+def _nest(row) -> dict:
+    """Строка RETURNING или JOINED_COLUMNS -> счет с вложенными company и bank"""
+    account = {}
+    for key, value in row.items():
+        prefix, _, name = key.partition("__")
+        if name:
+            account.setdefault(prefix, {})[name] = value
+        else:
+            account[key] = value
+    return account
+
+def _stats_change(account, delta: int) -> tuple:
+    """Изменение счетчиков по словарю или строке результата со значениями счета"""
+    return (account["bank_id"], account["company_id"], account["currency"], account["is_active"], delta)
 
 class BankAccountCRUD:
-    def create(self, db: Session, obj_in: BankAccountCreate) -> BankAccount:
-        db_obj = BankAccount(**obj_in.dict())
-        db.add(db_obj)
+    async def create(self, db: AsyncSession, obj_in: BankAccountCreate) -> dict:
+        """Создает счет одним INSERT ... RETURNING и обновляет счетчики в той же транзакции.
+
+        Существование компании и банка проверяется по кэшу справочников до вставки;
+        уникальность номера - ограничением unique_account_per_bank.
+        """
+        values = obj_in.dict()
+        await self._check_references(db, values, values["account_number"], values["bank_id"])
         try:
-            db.commit()
-            db.refresh(db_obj)
-            return db_obj
-        except IntegrityError:
-            db.rollback()
-            raise ValueError("Счет с таким номером уже существует в данном банке")
-    
-    def get(self, db: Session, id: int) -> Optional[BankAccount]:
-        return db.query(BankAccount).options(
-            joinedload(BankAccount.company),
-            joinedload(BankAccount.bank)
-        ).filter(BankAccount.id == id).first()
-    
-    def get_by_account_and_bank(self, db: Session, account_number: str, bank_id: int) -> Optional[BankAccount]:
-        return db.query(BankAccount).filter(
-            BankAccount.account_number == account_number,
-            BankAccount.bank_id == bank_id
-        ).first()
-    
-    def get_multi(self, db: Session, skip: int = 0, limit: int = 100) -> List[BankAccount]:
-        return db.query(BankAccount).options(
-            joinedload(BankAccount.company),
-            joinedload(BankAccount.bank)
-        ).offset(skip).limit(limit).all()
-    
-    def get_by_company(self, db: Session, company_id: int) -> List[BankAccount]:
-        return db.query(BankAccount).options(
-            joinedload(BankAccount.bank)
-        ).filter(BankAccount.company_id == company_id).all()
-    
-    def update(self, db: Session, db_obj: BankAccount, obj_in: BankAccountUpdate) -> BankAccount:
-        update_data = obj_in.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_obj, field, value)
+            result = await db.execute(insert(BankAccount).values(**values).returning(*RETURNING_COLUMNS))
+            row = _nest(result.mappings().one())
+            await account_stats_crud.apply(db, [_stats_change(row, 1)])
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            raise ValueError(_integrity_message(e))
+        return row
+    
+    async def _check_references(self, db: AsyncSession, values: dict, account_number: str, bank_id: int) -> None:
+        """ValueError, если компании или банка нет либо ключ счета не сходится с БИК (по кэшу справочников).
+
+        Компания проверяется, только если она есть в values. Проверка идет до
+        записи: иначе дубликат номера с несуществующей компанией в PostgreSQL
+        сообщался бы как дубликат - уникальный индекс срабатывает раньше
+        отложенной до конца оператора проверки внешнего ключа.
+        """
+        if "company_id" in values and await company_cache.get(db, values["company_id"]) is None:
+            await db.rollback()
+            raise ValueError("Компания не найдена")
+        bank = await bank_cache.get(db, bank_id)
+        if bank is None:
+            await db.rollback()
+            raise ValueError("Банк не найден")
+        if not is_valid_account(account_number, account_key_prefix(account_number, bank["bik"])):
+            await db.rollback()
+            raise ValueError(ACCOUNT_KEY_ERROR)
+    
+    async def _autocommit(self, db: AsyncSession) -> None:
+        """Одиночный оператор без BEGIN/COMMIT, если сессия еще не начала транзакцию"""
+        if not db.in_transaction():
+            await db.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+    
+    async def create_many(
+        self, db: AsyncSession, accounts: List[Tuple[int, BankAccountCreate]], errors: Dict[int, str]
+    ) -> int:
+        """Пакетно создает счета; accounts - пары (номер строки, счет).
+
+        Компании и банки проверяются по кэшу справочников (промахи - одним
+        запросом на пакет), дубликаты - одним запросом на весь пакет,
+        отклоненные строки записываются в errors. Возвращает число созданных счетов.
+        """
+        if not accounts:
+            return 0
+        
+        company_ids = {account.company_id for _, account in accounts}
+        bank_ids = {account.bank_id for _, account in accounts}
+        pairs = {(account.account_number, account.bank_id) for _, account in accounts}
+        
+        found_companies = set(await company_cache.get_many(db, company_ids))
+        found_banks = await bank_cache.get_many(db, bank_ids)
+        # Ключи счетов всего пакета проверяются одним векторным вызовом
+        key_codes = check_accounts(
+            [account.account_number for _, account in accounts],
+            [found_banks[account.bank_id]["bik"] if account.bank_id in found_banks else "" for _, account in accounts],
+        )
+        result = await db.execute(
+            select(BankAccount.account_number, BankAccount.bank_id).filter(
+                tuple_(BankAccount.account_number, BankAccount.bank_id).in_(pairs)
+            )
+        )
+        existing = set(tuple(row) for row in result)
+        
+        rows = []
+        for (line, account), key_code in zip(accounts, key_codes.tolist()):
+            key = (account.account_number, account.bank_id)
+            if account.company_id not in found_companies:
+                errors[line] = "Компания не найдена"
+            elif account.bank_id not in found_banks:
+                errors[line] = "Банк не найден"
+            elif key_code != VALID:
+                errors[line] = ACCOUNT_KEY_ERROR
+            elif key in existing:
+                errors[line] = "Счет с таким номером уже существует в данном банке"
+            else:
+                existing.add(key)
+                rows.append((line, account.dict()))
+        if not rows:
+            return 0
+        
         try:
-            db.commit()
-            db.refresh(db_obj)
-            return db_obj
+            await self._insert_rows(db, [row for _, row in rows])
+            await account_stats_crud.apply(db, [_stats_change(row, 1) for _, row in rows])
+            await db.commit()
+            return len(rows)
         except IntegrityError:
-            db.rollback()
-            raise ValueError("Счет с таким номером уже существует в данном банке")
+            await db.rollback()
+        
+        # Пакет столкнулся с параллельной записью - вставляем по одной строке,
+        # чтобы отклонить только конфликтующие
+        created = 0
+        for line, row in rows:
+            try:
+                await db.execute(insert(BankAccount), [row])
+                await account_stats_crud.apply(db, [_stats_change(row, 1)])
+                await db.commit()
+                created += 1
+            except IntegrityError:
+                await db.rollback()
+                errors[line] = "Счет с таким номером уже существует в данном банке"
+        return created
+    
+    async def _insert_rows(self, db: AsyncSession, rows: List[dict]) -> None:
+        """Многострочная вставка; на PostgreSQL с asyncpg - через COPY"""
+        connection = await db.connection()
+        if connection.dialect.name == "postgresql" and connection.dialect.driver == "asyncpg":
+            import asyncpg
+            
+            columns = list(rows[0])
+            raw_connection = await connection.get_raw_connection()
+            try:
+                await raw_connection.driver_connection.copy_records_to_table(
+                    BankAccount.__tablename__,
+                    columns=columns,
+                    records=[tuple(row[column] for column in columns) for row in rows],
+                )
+            except asyncpg.IntegrityConstraintViolationError as e:
+                raise IntegrityError("COPY bank_accounts", None, e)
+        else:
+            await db.execute(insert(BankAccount), rows)
+    
+    async def get(self, db: AsyncSession, id: int, selection: Optional[FieldSelection] = None) -> Optional[BankAccount]:
+        result = await db.execute(
+            _select_accounts(selection, as_rows=False)
+            .filter(BankAccount.id == id).execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+    
+    async def get_version(self, db: AsyncSession, id: int) -> Optional[tuple]:
+        """Версия для ETag без загрузки связей: версии счета, его компании и банка"""
+        result = await db.execute(
+            select(BankAccount.id, BankAccount.version, Company.version, Bank.version)
+            .join(Company, Company.id == BankAccount.company_id)
+            .join(Bank, Bank.id == BankAccount.bank_id)
+            .filter(BankAccount.id == id)
+        )
+        row = result.first()
+        return tuple(row) if row else None
+    
+    def version(self, obj: BankAccount) -> tuple:
+        """Та же версия, что get_version, по загруженному счету с компанией и банком"""
+        return (obj.id, obj.version, obj.company.version, obj.bank.version)
+    
+    def row_version(self, row: dict) -> tuple:
+        """Та же версия по результату create/update"""
+        return (row["id"], row["version"], row["company"]["version"], row["bank"]["version"])
+    
+    async def get_many(self, db: AsyncSession, ids: List[int]) -> Tuple[List[dict], List[int]]:
+        """Счета по списку id: (найденные в порядке запроса, отсутствующие id).
+
+        Компании и банки собираются по всей пачке и загружаются по одному
+        разу на id, а не для каждого счета.
+        """
+        accounts = await load_rows(db, BankAccount, ids)
+        companies = await load_rows(db, Company, {account["company_id"] for account in accounts.values()})
+        banks = await load_rows(db, Bank, {account["bank_id"] for account in accounts.values()})
+        for account in accounts.values():
+            account["company"] = companies[account["company_id"]]
+            account["bank"] = banks[account["bank_id"]]
+        return in_request_order(ids, accounts)
+    
+    async def get_by_account_and_bank(self, db: AsyncSession, account_number: str, bank_id: int) -> Optional[BankAccount]:
+        result = await db.execute(
+            select(BankAccount).filter(
+                BankAccount.account_number == account_number,
+                BankAccount.bank_id == bank_id
+            )
+        )
+        return result.scalars().first()
+    
+    async def get_multi(
+        self, db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+        company_id: Optional[int] = None, bank_id: Optional[int] = None, as_rows: bool = False,
+        selection: Optional[FieldSelection] = None
+    ) -> Tuple[List[BankAccount], Optional[str]]:
+        """Страница счетов; as_rows - словари из одного JOIN без создания ORM-объектов,
+        selection - только выбранные колонки и связи"""
+        stmt = _select_accounts(selection, as_rows)
+        if company_id is not None:
+            stmt = stmt.filter(BankAccount.company_id == company_id)
+        if bank_id is not None:
+            stmt = stmt.filter(BankAccount.bank_id == bank_id)
+        stmt = paginate(stmt, BankAccount, limit=limit, skip=skip, cursor=cursor)
+        result = await db.execute(stmt)
+        if not as_rows:
+            return make_page(result.scalars().all(), limit)
+        items, next_cursor = make_page(result.all(), limit)
+        return [_nest(row._mapping) for row in items], next_cursor
+    
+    async def stream(
+        self, db: AsyncSession, company_id: Optional[int] = None, bank_id: Optional[int] = None,
+        currency: Optional[str] = None, is_active: Optional[str] = None, batch_size: int = 1000
+    ) -> AsyncIterator[List[dict]]:
+        """Отдает счета пакетами по batch_size через серверный курсор, без связей"""
+        stmt = select(BankAccount.__table__)
+        if company_id is not None:
+            stmt = stmt.filter(BankAccount.company_id == company_id)
+        if bank_id is not None:
+            stmt = stmt.filter(BankAccount.bank_id == bank_id)
+        if currency is not None:
+            stmt = stmt.filter(BankAccount.currency == currency)
+        if is_active is not None:
+            stmt = stmt.filter(BankAccount.is_active == is_active)
+        result = await db.stream(
+            stmt.order_by(BankAccount.id).execution_options(yield_per=batch_size)
+        )
+        async for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+    
+    async def get_by_company(
+        self, db: AsyncSession, company_id: int, as_rows: bool = False, selection: Optional[FieldSelection] = None
+    ) -> List[BankAccount]:
+        result = await db.execute(
+            _select_accounts(selection, as_rows).filter(BankAccount.company_id == company_id)
+        )
+        if as_rows:
+            return [_nest(row) for row in result.mappings()]
+        return result.scalars().all()
+    
+    async def update(
+        self, db: AsyncSession, id: int, obj_in: BankAccountUpdate, version: Optional[int] = None
+    ) -> Optional[dict]:
+        """Обновляет счет одним UPDATE ... RETURNING; None, если счета нет.
+
+        Если меняются банк, компания, валюта или активность, прежние значения
+        читаются с блокировкой строки, а счетчики пересчитываются в той же транзакции.
+        При смене номера, банка или компании так же читаются прежние номер и банк, а ссылки
+        и ключ счета проверяются по кэшу справочников.
+        С version строка обновляется, только если ее версия совпадает, иначе VersionConflict.
+        """
+        values = obj_in.dict(exclude_unset=True, exclude={"version"})
+        old = None
+        if (STATS_FIELDS | KEY_FIELDS) & values.keys():
+            result = await db.execute(
+                select(
+                    BankAccount.bank_id, BankAccount.company_id, BankAccount.currency, BankAccount.is_active,
+                    BankAccount.account_number,
+                )
+                .filter(BankAccount.id == id)
+                .with_for_update()
+            )
+            old = result.mappings().first()
+            if old is None:
+                await db.rollback()
+                return None
+            if (KEY_FIELDS | {"company_id"}) & values.keys():
+                await self._check_references(
+                    db, values, values.get("account_number", old["account_number"]), values.get("bank_id", old["bank_id"])
+                )
+        elif values:
+            await self._autocommit(db)
+        
+        try:
+            row = await update_version(db, BankAccount, id, values, version, RETURNING_COLUMNS)
+            if row is not None and STATS_FIELDS & values.keys():
+                await account_stats_crud.apply(db, [_stats_change(old, -1), _stats_change(row, 1)])
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            raise ValueError(_integrity_message(e))
+        return _nest(row) if row is not None else None
+    
+    async def set_status(self, db: AsyncSession, obj_in: BulkStatusUpdate) -> int:
+        """Меняет is_active у счетов по фильтру одним UPDATE; возвращает число измененных.
+
+        Счета, уже имеющие нужный статус, не затрагиваются (их updated_at и version
+        не меняются). RETURNING отдает только колонки счетчиков - по ним в той же
+        транзакции переносятся счетчики /stats/accounts.
+        """
+        stmt = update(BankAccount).where(BankAccount.is_active != obj_in.is_active)
+        for field in ("bank_id", "company_id", "currency"):
+            value = getattr(obj_in, field)
+            if value is not None:
+                stmt = stmt.where(getattr(BankAccount, field) == value)
+        result = await db.execute(
+            stmt.values(is_active=obj_in.is_active, **next_version(BankAccount))
+            .returning(BankAccount.bank_id, BankAccount.company_id, BankAccount.currency)
+            .execution_options(synchronize_session=False)
+        )
+        groups = Counter(tuple(row) for row in result)
+        old_status = "N" if obj_in.is_active == "Y" else "Y"
+        await account_stats_crud.apply(db, [
+            change
+            for (bank_id, company_id, currency), count in groups.items()
+            for change in (
+                (bank_id, company_id, currency, old_status, -count),
+                (bank_id, company_id, currency, obj_in.is_active, count),
+            )
+        ])
+        await db.commit()
+        return sum(groups.values())
     
-    def delete(self, db: Session, id: int) -> Optional[BankAccount]:
-        obj = db.query(BankAccount).filter(BankAccount.id == id).first()
+    async def delete(self, db: AsyncSession, id: int, version: Optional[int] = None) -> Optional[BankAccount]:
+        """Удаляет счет; с version - только эту версию, иначе VersionConflict"""
+        result = await db.execute(select(BankAccount).filter(BankAccount.id == id))
+        obj = result.scalars().first()
         if obj:
-            db.delete(obj)
-            db.commit()
+            if not await delete_version(db, BankAccount, obj.id, version):
+                return None
+            await account_stats_crud.apply(db, [(obj.bank_id, obj.company_id, obj.currency, obj.is_active, -1)])
+            await db.commit()
         return obj
 
 bank_account_crud = BankAccountCRUD()
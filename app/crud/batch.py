@@ -0,0 +1,30 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, Tuple
+
+# Значений в одном IN (...)
+BATCH_CHUNK_SIZE = 1000
+
+def chunked(ids: Iterable[int], size: int = BATCH_CHUNK_SIZE) -> Iterable[List[int]]:
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+async def load_rows(db: AsyncSession, model, ids: Iterable[int]) -> Dict[int, dict]:
+    """Строки по id словарями; каждый id запрашивается один раз, пачками IN"""
+    rows = {}
+    for chunk in chunked(ids):
+        result = await db.execute(select(*model.__table__.c).where(model.id.in_(chunk)))
+        for row in result.mappings():
+            rows[row["id"]] = dict(row)
+    return rows
+
+def in_request_order(ids: List[int], rows: Dict[int, dict]) -> Tuple[List[dict], List[int]]:
+    """Найденные строки в порядке запроса (без повторов) и отсутствующие id"""
+    items, missing = [], []
+    for id in dict.fromkeys(ids):
+        if id in rows:
+            items.append(rows[id])
+        else:
+            missing.append(id)
+    return items, missing
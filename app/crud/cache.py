@@ -0,0 +1,155 @@
+import time
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..models.bank import Bank
+from ..models.company import Company
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+class LRUCache:
+    """LRU-кэш с ограничением размера, временем жизни записей и счетчиками"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Увеличивается при каждой инвалидации: значение, прочитанное из БД
+        # до инвалидации, уже не попадет в кэш
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: Hashable) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        if self.maxsize <= 0 or (generation is not None and generation != self.generation):
+            return
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, *keys: Hashable) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+        self.generation += 1
+    
+    def clear(self) -> None:
+        self._data.clear()
+        self.generation += 1
+    
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+class ReferenceCache:
+    """Read-through кэш справочника по id и по натуральному ключу (БИК, ИНН).
+
+    Хранит словари с краткими полями, а не ORM-объекты, поэтому записи не
+    привязаны к сессии. Отсутствующие записи не кэшируются.
+    """
+    
+    def __init__(self, model, columns: list, key_column, maxsize: int, ttl: float):
+        self.model = model
+        self.columns = columns
+        self.key_column = key_column
+        self.cache = LRUCache(maxsize, ttl)
+    
+    def _store(self, value: dict, generation: int) -> None:
+        self.cache.set(("id", value["id"]), value, generation)
+        self.cache.set((self.key_column.key, value[self.key_column.key]), value, generation)
+    
+    async def get_many(self, db: AsyncSession, ids: Iterable[int], store: bool = True) -> Dict[int, dict]:
+        """Записи по id; store=False - промахи не кладутся в кэш (выгрузки, читающие весь справочник)"""
+        found = {}
+        missing = []
+        for id in ids:
+            value = self.cache.get(("id", id))
+            if value is None:
+                missing.append(id)
+            else:
+                found[id] = value
+        if missing:
+            generation = self.cache.generation
+            result = await db.execute(select(*self.columns).filter(self.model.id.in_(missing)))
+            for row in result.mappings():
+                value = dict(row)
+                found[value["id"]] = value
+                if store:
+                    self._store(value, generation)
+        return found
+    
+    async def get(self, db: AsyncSession, id: int) -> Optional[dict]:
+        return (await self.get_many(db, [id])).get(id)
+    
+    async def get_by_key(self, db: AsyncSession, key: str) -> Optional[dict]:
+        value = self.cache.get((self.key_column.key, key))
+        if value is None:
+            generation = self.cache.generation
+            result = await db.execute(select(*self.columns).filter(self.key_column == key))
+            row = result.mappings().first()
+            if row is None:
+                return None
+            value = dict(row)
+            self._store(value, generation)
+        return value
+    
+    async def preload(self, db: AsyncSession) -> int:
+        """Заполняет кэш первыми записями (при старте); возвращает их число.
+
+        Каждая запись занимает два ключа (id и натуральный ключ), поэтому читается
+        maxsize // 2 записей - иначе вторая половина вытеснила бы первую.
+        """
+        limit = self.cache.maxsize // 2
+        if limit <= 0:
+            return 0
+        generation = self.cache.generation
+        result = await db.execute(select(*self.columns).order_by(self.model.id).limit(limit))
+        rows = result.mappings().all()
+        for row in rows:
+            self._store(dict(row), generation)
+        return len(rows)
+    
+    def invalidate(self, id: int, *keys: str) -> None:
+        """Удаляет запись по id и по указанным значениям натурального ключа"""
+        self.cache.invalidate(("id", id), *((self.key_column.key, key) for key in keys))
+
+bank_cache = ReferenceCache(
+    Bank,
+    [Bank.id, Bank.name, Bank.bik, Bank.correspondent_account],
+    Bank.bik,
+    maxsize=settings.reference_cache_size,
+    ttl=settings.reference_cache_ttl,
+)
+
+company_cache = ReferenceCache(
+    Company,
+    [Company.id, Company.name, Company.inn],
+    Company.inn,
+    maxsize=settings.reference_cache_size,
+    ttl=settings.reference_cache_ttl,
+)
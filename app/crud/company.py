@@ -1,38 +1,190 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
 from ..models.company import Company
-from ..schemas.company import CompanyCreate, CompanyUpdate
-from typing import List, Optional
+from ..models.bank_account import BankAccount
+from .pagination import paginate, make_page
+from .batch import in_request_order, load_rows
+from .fields import selected_attributes, selected_columns, trim_rows
+from .summary import attach_accounts_summary
+from .stats import account_stats_crud
+from .search import search_statement, paginate_search, make_search_page
+from .cache import company_cache
+from .integrity import constraint_name
+from .versioning import (
+    children_version_columns, delete_version, split_children_version, update_version
+)
+from ..schemas.company import CompanyCreate, CompanyPatch, CompanyUpdate
+from ..schemas.fields import FieldSelection
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Колонки RETURNING для patch: запись и сводка по ее счетам для ETag
+PATCH_RETURNING = (*Company.__table__.c, *children_version_columns(Company, BankAccount, "company_id"))
 
 class CompanyCRUD:
-    def create(self, db: Session, obj_in: CompanyCreate) -> Company:
+    async def create(self, db: AsyncSession, obj_in: CompanyCreate) -> Company:
         db_obj = Company(**obj_in.dict())
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        await db.commit()
+        return await self.get(db, id=db_obj.id)
+    
+    async def get(self, db: AsyncSession, id: int) -> Optional[Company]:
+        result = await db.execute(
+            select(Company)
+            .options(selectinload(Company.bank_accounts))
+            .filter(Company.id == id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+    
+    async def get_version(self, db: AsyncSession, id: int) -> Optional[tuple]:
+        """Версия для ETag без загрузки связей: (id, version, число счетов, сумма их версий, последний id счета).
+
+        Версии строк увеличиваются при каждом изменении, поэтому ETag меняется и при
+        правках в пределах одной секунды (точность updated_at в SQLite). Изменение
+        любого счета увеличивает сумму версий, добавление и удаление - число или последний id.
+        """
+        accounts = (
+            select(
+                func.count(BankAccount.id).label("count"),
+                func.coalesce(func.sum(BankAccount.version), 0).label("versions"),
+                func.max(BankAccount.id).label("last_id"),
+            )
+            .filter(BankAccount.company_id == id)
+            .subquery()
+        )
+        result = await db.execute(
+            select(Company.id, Company.version, accounts.c.count, accounts.c.versions, accounts.c.last_id)
+            .join(accounts, true())  # агрегат из одной строки
+            .filter(Company.id == id)
+        )
+        row = result.first()
+        return tuple(row) if row else None
+    
+    def version(self, obj: Company) -> tuple:
+        """Та же версия, что get_version, по загруженному объекту со счетами"""
+        accounts = obj.bank_accounts
+        return (
+            obj.id, obj.version, len(accounts),
+            sum(account.version for account in accounts), max((account.id for account in accounts), default=None),
+        )
+    
+    async def get_by_inn(self, db: AsyncSession, inn: str) -> Optional[Company]:
+        result = await db.execute(select(Company).filter(Company.inn == inn))
+        return result.scalars().first()
+    
+    async def get_lookup(self, db: AsyncSession, ids: Iterable[int], store: bool = True) -> Dict[int, dict]:
+        """Краткие данные по id (без текстовых колонок) из кэша справочника; store=False - не заполнять кэш промахами"""
+        return await company_cache.get_many(db, ids, store=store)
+    
+    async def get_cached(self, db: AsyncSession, id: int) -> Optional[dict]:
+        """Краткие данные по id из кэша; для проверок существования"""
+        return await company_cache.get(db, id)
     
-    def get(self, db: Session, id: int) -> Optional[Company]:
-        return db.query(Company).options(joinedload(Company.bank_accounts)).filter(Company.id == id).first()
+    async def get_cached_by_inn(self, db: AsyncSession, inn: str) -> Optional[dict]:
+        return await company_cache.get_by_key(db, inn)
     
-    def get_by_inn(self, db: Session, inn: str) -> Optional[Company]:
-        return db.query(Company).filter(Company.inn == inn).first()
+    async def get_multi(
+        self, db: AsyncSession, skip: int = 0, limit: int = 100,
+        cursor: Optional[str] = None, sort: str = "id", accounts_limit: int = 0, as_rows: bool = False,
+        selection: Optional[FieldSelection] = None
+    ) -> Tuple[List[Company], Optional[str]]:
+        """Страница записей; as_rows - словари из колонок без создания ORM-объектов.
+
+        При selection читаются только выбранные колонки (и колонка сортировки для
+        курсора), а сводка по счетам считается, только если ее поля запрошены.
+        """
+        if selection is None:
+            stmt = select(*Company.__table__.c) if as_rows else select(Company)
+        elif as_rows:
+            stmt = select(*selected_columns(Company, selection.fields, sort))
+        else:
+            stmt = select(Company).options(load_only(*selected_attributes(Company, selection.fields, sort)))
+        stmt = paginate(stmt, Company, limit=limit, skip=skip, cursor=cursor, sort=sort)
+        result = await db.execute(stmt)
+        items, next_cursor = make_page(result.all() if as_rows else result.scalars().all(), limit, sort)
+        if as_rows:
+            items = [row._asdict() for row in items]
+        if selection is None or {"accounts_count", "bank_accounts"} & set(selection.fields):
+            await attach_accounts_summary(db, items, BankAccount.company_id, accounts_limit, as_rows=as_rows)
+        if as_rows and selection is not None:
+            items = trim_rows(items, selection.fields)
+        return items, next_cursor
+    
+    async def get_many(
+        self, db: AsyncSession, ids: List[int], accounts_limit: int = 0
+    ) -> Tuple[List[dict], List[int]]:
+        """Записи по списку id: (найденные в порядке запроса, отсутствующие id).
+
+        Вместо всех счетов - их число и, при accounts_limit > 0, первые счета
+        (как в списке), чтобы пачка крупных записей не тянула все их счета.
+        """
+        rows = await load_rows(db, Company, ids)
+        await attach_accounts_summary(db, list(rows.values()), BankAccount.company_id, accounts_limit, as_rows=True)
+        return in_request_order(ids, rows)
     
-    def get_multi(self, db: Session, skip: int = 0, limit: int = 100) -> List[Company]:
-        return db.query(Company).options(joinedload(Company.bank_accounts)).offset(skip).limit(limit).all()
+    async def search(
+        self, db: AsyncSession, q: str, limit: int = 20, cursor: Optional[str] = None
+    ) -> Tuple[List[Company], Optional[str]]:
+        """Поиск по названию и INN, по рангу совпадения"""
+        stmt, rank = search_statement(db.get_bind().dialect.name, Company, Company.inn, q)
+        result = await db.execute(paginate_search(stmt, Company, rank, q, limit, cursor))
+        return make_search_page(result.all(), q, limit)
     
-    def update(self, db: Session, db_obj: Company, obj_in: CompanyUpdate) -> Company:
+    async def update(
+        self, db: AsyncSession, db_obj: Company, obj_in: CompanyUpdate, version: Optional[int] = None
+    ) -> Optional[Company]:
+        """Обновление одним UPDATE ... WHERE id [AND version]; VersionConflict, если версия не совпала.
+
+        version - версия из If-Match: запись, измененная после проверки ETag,
+        не перезаписывается. None, если запись удалили после чтения.
+        """
+        old_inn = db_obj.inn
         update_data = obj_in.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_obj, field, value)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
-    
-    def delete(self, db: Session, id: int) -> Optional[Company]:
-        obj = db.query(Company).filter(Company.id == id).first()
+        if await update_version(db, Company, db_obj.id, update_data, version, (Company.id,)) is None:
+            return None
+        await db.commit()
+        company_cache.invalidate(db_obj.id, old_inn, update_data.get("inn", old_inn))
+        return await self.get(db, id=db_obj.id)
+    
+    async def patch(
+        self, db: AsyncSession, id: int, obj_in: CompanyPatch, version: Optional[int] = None
+    ) -> Optional[Tuple[dict, tuple]]:
+        """Частичное обновление одним UPDATE ... WHERE id AND version RETURNING, без счетов.
+
+        Возвращает (запись, версия для ETag): сводка по счетам для ETag читается
+        подзапросами в том же RETURNING. version - ожидаемая версия (из тела или If-Match).
+
+        None, если компании нет; VersionConflict, если версия не совпала; ValueError -
+        ИНН занят. Прежний ИНН (для сброса кэша) читается, только если ИНН меняется.
+        """
+        values = obj_in.dict(exclude_unset=True, exclude={"version"})
+        old_inn = None
+        if "inn" in values:
+            old_inn = await db.scalar(select(Company.inn).where(Company.id == id).with_for_update())
+        try:
+            row = await update_version(db, Company, id, values, version, PATCH_RETURNING)
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            if constraint_name(e) == "ix_companies_inn":
+                raise ValueError("Компания с таким ИНН уже существует")
+            raise ValueError("Недопустимые значения полей компании")
+        if row is not None and values:
+            company_cache.invalidate(id, old_inn, row["inn"])
+        return split_children_version(row) if row is not None else None
+    
+    async def delete(self, db: AsyncSession, id: int, version: Optional[int] = None) -> Optional[Company]:
+        """Удаляет запись (счета - ON DELETE CASCADE); с version - только эту версию, иначе VersionConflict"""
+        result = await db.execute(select(Company).filter(Company.id == id))
+        obj = result.scalars().first()
         if obj:
-            db.delete(obj)
-            db.commit()
+            await account_stats_crud.remove_parent(db, "company", obj.id)
+            if not await delete_version(db, Company, obj.id, version):
+                return None
+            await db.commit()
+            company_cache.invalidate(obj.id, obj.inn)
         return obj
 
-company_crud = CompanyCRUD()
\ No newline at end of file
+company_crud = CompanyCRUD()
@@ -0,0 +1,15 @@
+from typing import Iterable, List
+
+def selected_columns(model, fields: Iterable[str], *required: str) -> list:
+    """Колонки таблицы для выбранных полей; вычисляемые поля (нет в таблице) пропускаются"""
+    table = model.__table__.c
+    return [table[name] for name in dict.fromkeys((*required, *fields)) if name in table]
+
+def selected_attributes(model, fields: Iterable[str], *required: str) -> list:
+    """То же атрибутами модели - для load_only"""
+    return [getattr(model, column.key) for column in selected_columns(model, fields, *required)]
+
+def trim_rows(rows: List[dict], fields: Iterable[str]) -> List[dict]:
+    """Оставляет в словарях быстрого пути только выбранные поля"""
+    fields = tuple(fields)
+    return [{name: row.get(name) for name in fields} for row in rows]
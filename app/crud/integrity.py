@@ -0,0 +1,36 @@
+import re
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.exc import IntegrityError
+from typing import Optional
+from ..database import Base
+
+# SQLite не сообщает имя ограничения, только колонки
+SQLITE_UNIQUE = re.compile(r"UNIQUE constraint failed: (.+)")
+
+def constraint_name(error: IntegrityError) -> Optional[str]:
+    """Имя нарушенного ограничения из ошибки драйвера (psycopg2, asyncpg, sqlite)"""
+    orig = error.orig
+    diag = getattr(orig, "diag", None)
+    if diag is not None and getattr(diag, "constraint_name", None):
+        return diag.constraint_name
+    # asyncpg: исключение самого драйвера или его обертка SQLAlchemy
+    for candidate in (orig, getattr(orig, "__cause__", None)):
+        name = getattr(candidate, "constraint_name", None)
+        if name:
+            return name
+    
+    match = SQLITE_UNIQUE.search(str(orig))
+    if not match:
+        return None
+    columns = [column.strip().split(".") for column in match.group(1).split(",")]
+    table = Base.metadata.tables.get(columns[0][0])
+    if table is None:
+        return None
+    names = {column for _, column in columns}
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint) and {c.name for c in constraint.columns} == names:
+            return constraint.name
+    for index in table.indexes:
+        if index.unique and {c.name for c in index.columns} == names:
+            return index.name
+    return None
@@ -0,0 +1,55 @@
+import base64
+import json
+from sqlalchemy import tuple_
+from typing import Any, List, Optional, Sequence, Tuple
+
+# Колонки сортировки для keyset-пагинации: последний элемент всегда id,
+# чтобы ключ был уникальным
+def sort_columns(model, sort: str) -> list:
+    if sort == "id":
+        return [model.id]
+    return [getattr(model, sort), model.id]
+
+def encode_cursor(sort: str, key: Sequence[Any]) -> str:
+    """Кодирует ключ последней строки страницы в непрозрачный курсор"""
+    raw = json.dumps({"s": sort, "k": list(key)}, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> list:
+    """Раскодирует курсор; ValueError, если курсор поврежден или выдан для другой сортировки"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = data["k"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Некорректный курсор")
+    if data.get("s") != sort or not isinstance(key, list):
+        raise ValueError("Курсор не соответствует сортировке")
+    return key
+
+def paginate(stmt, model, limit: int, skip: int = 0, cursor: Optional[str] = None, sort: str = "id"):
+    """Добавляет к запросу сортировку и условие keyset-пагинации.
+
+    Выбирается limit + 1 строк, чтобы без COUNT узнать, есть ли следующая страница.
+    """
+    columns = sort_columns(model, sort)
+    if cursor is not None:
+        key = decode_cursor(cursor, sort)
+        if len(key) != len(columns):
+            raise ValueError("Некорректный курсор")
+        if len(columns) == 1:
+            stmt = stmt.filter(columns[0] > key[0])
+        else:
+            stmt = stmt.filter(tuple_(*columns) > tuple_(*key))
+    elif skip:
+        stmt = stmt.offset(skip)
+    return stmt.order_by(*columns).limit(limit + 1)
+
+def make_page(items: List[Any], limit: int, sort: str = "id") -> Tuple[List[Any], Optional[str]]:
+    """Отрезает лишнюю строку и формирует курсор следующей страницы"""
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    key = [last.id] if sort == "id" else [getattr(last, sort), last.id]
+    return items, encode_cursor(sort, key)
@@ -0,0 +1,64 @@
+from sqlalchemy import and_, case, func, literal_column, or_, select, table, tuple_
+from typing import Any, List, Optional, Tuple
+from ..models.search import fts_table
+from .pagination import decode_cursor, encode_cursor
+
+# Минимальная длина подстроки для триграммного индекса FTS5
+FTS_MIN_LENGTH = 3
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _folded_name(dialect: str, model):
+    """Название без учета регистра: lower() SQLite не знает кириллицы - casefold() из configure_sqlite"""
+    return func.casefold(model.name) if dialect == "sqlite" else func.lower(model.name)
+
+def _fold(dialect: str, q: str) -> str:
+    return q.casefold() if dialect == "sqlite" else q.lower()
+
+def _name_condition(dialect: str, model, q: str):
+    """Подстрока в названии: pg_trgm (ILIKE) в PostgreSQL, FTS5 в SQLite"""
+    if dialect == "postgresql":
+        return model.name.ilike(f"%{escape_like(q)}%", escape="\\")
+    if dialect == "sqlite" and len(q) >= FTS_MIN_LENGTH:
+        fts = fts_table(model.__tablename__)
+        phrase = '"' + q.replace('"', '""') + '"'
+        return model.id.in_(
+            select(literal_column("rowid")).select_from(table(fts)).where(literal_column(fts).op("MATCH")(phrase))
+        )
+    # Короткий запрос или другая СБД - без индекса
+    return _folded_name(dialect, model).like(f"%{escape_like(_fold(dialect, q))}%", escape="\\")
+
+def search_statement(dialect: str, model, key_column, q: str):
+    """Запрос поиска по названию и ключу (ИНН/БИК) и выражение ранга.
+
+    Ранг: 0 - ключ совпал, 1 - ключ начинается с q, 2 - название начинается
+    с q, 3 - q внутри названия.
+    """
+    conditions = [_name_condition(dialect, model, q)]
+    ranks = []
+    if q.isdigit() and len(q) <= key_column.type.length:
+        # Префикс цифрового ключа - диапазоном по обычному B-tree индексу
+        key_prefix = and_(key_column >= q, key_column <= q + "9" * (key_column.type.length - len(q)))
+        conditions.append(key_prefix)
+        ranks += [(key_column == q, 0), (key_prefix, 1)]
+    ranks.append((_folded_name(dialect, model).like(f"{escape_like(_fold(dialect, q))}%", escape="\\"), 2))
+    rank = case(*ranks, else_=3)
+    return select(model, rank.label("rank")).filter(or_(*conditions)), rank
+
+def paginate_search(stmt, model, rank, q: str, limit: int, cursor: Optional[str] = None):
+    """Keyset-пагинация по (ранг, название, id); курсор привязан к строке поиска"""
+    columns = [rank, model.name, model.id]
+    if cursor is not None:
+        key = decode_cursor(cursor, f"search:{q}")
+        if len(key) != len(columns):
+            raise ValueError("Некорректный курсор")
+        stmt = stmt.filter(tuple_(*columns) > tuple_(*key))
+    return stmt.order_by(*columns).limit(limit + 1)
+
+def make_search_page(rows: List[Tuple[Any, int]], q: str, limit: int) -> Tuple[List[Any], Optional[str]]:
+    items = [item for item, _ in rows[:limit]]
+    if len(rows) <= limit:
+        return items, None
+    last, rank = rows[limit - 1]
+    return items, encode_cursor(f"search:{q}", [rank, last.name, last.id])
@@ -0,0 +1,116 @@
+from collections import defaultdict
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.account_stats import AccountStats
+from ..models.bank_account import BankAccount
+from typing import Dict, Iterable, List, Tuple
+
+# Изменение счетчиков: (bank_id, company_id, currency, is_active, +1/-1)
+Change = Tuple[int, int, str, str, int]
+
+# Поля счета, от которых зависят счетчики
+STATS_FIELDS = {"bank_id", "company_id", "currency", "is_active"}
+GROUP_FIELDS = ("bank_id", "company_id", "currency", "is_active")
+
+# Строк в одном INSERT ... ON CONFLICT (ограничение SQLite на число параметров)
+UPSERT_BATCH_SIZE = 1000
+
+SCOPES = {
+    "bank": BankAccount.bank_id,
+    "company": BankAccount.company_id,
+}
+
+def rebuild_statements() -> list:
+    """Пересчет счетчиков по таблице счетов; используется и синхронным кодом (bench seed)"""
+    statements = [delete(AccountStats)]
+    for scope, column in SCOPES.items():
+        grouped = (
+            select(literal(scope), column, BankAccount.currency, BankAccount.is_active, func.count())
+            .group_by(column, BankAccount.currency, BankAccount.is_active)
+        )
+        statements.append(
+            insert(AccountStats).from_select(
+                ["scope", "parent_id", "currency", "is_active", "count"], grouped
+            )
+        )
+    return statements
+
+class AccountStatsCRUD:
+    async def apply(self, db: AsyncSession, changes: Iterable[Change]) -> None:
+        """Прибавляет изменения к счетчикам в текущей транзакции (без commit)"""
+        deltas: Dict[tuple, int] = defaultdict(int)
+        for bank_id, company_id, currency, is_active, delta in changes:
+            deltas[("bank", bank_id, currency, is_active)] += delta
+            deltas[("company", company_id, currency, is_active)] += delta
+        rows = [
+            {"scope": scope, "parent_id": parent_id, "currency": currency, "is_active": is_active, "count": delta}
+            for (scope, parent_id, currency, is_active), delta in deltas.items()
+            if delta
+        ]
+        if not rows:
+            return
+        
+        dialect = db.get_bind().dialect.name
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            stmt = dialect_insert(AccountStats).values(rows[start:start + UPSERT_BATCH_SIZE])
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=["scope", "parent_id", "currency", "is_active"],
+                set_={"count": AccountStats.count + stmt.excluded["count"]},
+            ))
+    
+    async def remove_parent(self, db: AsyncSession, scope: str, parent_id: int) -> None:
+        """Перед удалением банка или компании вместе со счетами (без commit)"""
+        column = SCOPES[scope]
+        result = await db.execute(
+            select(BankAccount.bank_id, BankAccount.company_id, BankAccount.currency, BankAccount.is_active, func.count())
+            .filter(column == parent_id)
+            .group_by(BankAccount.bank_id, BankAccount.company_id, BankAccount.currency, BankAccount.is_active)
+        )
+        await self.apply(db, [(bank_id, company_id, currency, is_active, -count)
+                              for bank_id, company_id, currency, is_active, count in result])
+        await db.execute(delete(AccountStats).filter(AccountStats.scope == scope, AccountStats.parent_id == parent_id))
+    
+    async def get(
+        self, db: AsyncSession, group_by: List[str], skip: int = 0, limit: int = 1000
+    ) -> List[dict]:
+        """Число счетов по группам - только по таблице счетчиков, без чтения счетов.
+
+        Счетчики ведутся отдельно по банкам и по компаниям, поэтому группировка
+        сразу по bank_id и company_id - ValueError, а не подсчет по всем счетам.
+        """
+        fields = list(dict.fromkeys(group_by))
+        if "bank_id" in fields and "company_id" in fields:
+            raise ValueError(
+                "Группировка одновременно по bank_id и company_id не поддерживается: "
+                "используйте фильтр списка счетов GET /bank-accounts/?company_id=...&bank_id=..."
+            )
+        scope = "company" if "company_id" in fields else "bank"
+        columns = [
+            AccountStats.parent_id.label(field) if field in ("bank_id", "company_id")
+            else getattr(AccountStats, field)
+            for field in fields
+        ]
+        total = func.sum(AccountStats.count)
+        stmt = (
+            select(*columns, total.label("count"))
+            .filter(AccountStats.scope == scope)
+            .having(total > 0)
+        )
+        if columns:
+            stmt = stmt.group_by(*columns)
+        if columns:
+            stmt = stmt.order_by(*columns)
+        result = await db.execute(stmt.offset(skip).limit(limit))
+        return [dict(row) for row in result.mappings() if row["count"]]
+    
+    async def rebuild(self, db: AsyncSession) -> int:
+        """Пересчитывает счетчики с нуля; возвращает число строк счетчиков"""
+        for stmt in rebuild_statements():
+            await db.execute(stmt)
+        await db.commit()
+        result = await db.execute(select(func.count()).select_from(AccountStats))
+        return result.scalar()
+
+account_stats_crud = AccountStatsCRUD()
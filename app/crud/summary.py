@@ -0,0 +1,53 @@
+from collections import defaultdict
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.bank_account import BankAccount
+from typing import Any, List
+
+async def attach_accounts_summary(
+    db: AsyncSession, parents: List[Any], fk_column, accounts_limit: int = 0, as_rows: bool = False
+) -> None:
+    """Проставляет компаниям/банкам accounts_count и, при accounts_limit > 0, первые счета.
+
+    Количество считается одним GROUP BY по id страницы; счета выбираются отдельным
+    запросом с IN (как selectinload), но не более accounts_limit на родителя,
+    вместо JOIN всех счетов к каждой строке. При as_rows родители и счета -
+    словари, а счета кладутся сразу в ключ bank_accounts ответа (схемы *Summary
+    читают его наравне с accounts_preview).
+    """
+    ids = [parent["id"] if as_rows else parent.id for parent in parents]
+    if not ids:
+        return
+    
+    result = await db.execute(
+        select(fk_column, func.count()).where(fk_column.in_(ids)).group_by(fk_column)
+    )
+    counts = dict(result.all())
+    
+    accounts = defaultdict(list)
+    if accounts_limit:
+        row_number = func.row_number().over(partition_by=fk_column, order_by=BankAccount.id).label("rn")
+        numbered = select(BankAccount.id, row_number).where(fk_column.in_(ids)).subquery()
+        result = await db.execute(
+            select(*(BankAccount.__table__.c if as_rows else [BankAccount]))
+            .join(numbered, numbered.c.id == BankAccount.id)
+            .where(numbered.c.rn <= accounts_limit)
+            .order_by(BankAccount.id)
+        )
+        if as_rows:
+            for account in result.mappings():
+                accounts[account[fk_column.key]].append(dict(account))
+        else:
+            for account in result.scalars():
+                accounts[getattr(account, fk_column.key)].append(account)
+    
+    if as_rows:
+        for parent in parents:
+            parent["accounts_count"] = counts.get(parent["id"], 0)
+            parent["bank_accounts"] = accounts[parent["id"]] if accounts_limit else None
+        return
+    
+    for parent in parents:
+        parent.accounts_count = counts.get(parent.id, 0)
+        # None задается явно: иначе схема дошла бы до связи bank_accounts со всеми счетами
+        parent.accounts_preview = accounts[parent.id] if accounts_limit else None
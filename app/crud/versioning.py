@@ -0,0 +1,89 @@
+from typing import Optional, Tuple
+from sqlalchemy import delete, func, literal_column, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+class VersionConflict(Exception):
+    """Запись изменена после того, как клиент прочитал ее версию"""
+
+    def __init__(self, current: int):
+        super().__init__(f"Запись была изменена: текущая версия {current}")
+        self.current = current
+
+def next_version(model) -> dict:
+    """Значение для .values(): версия строки увеличивается при каждом изменении"""
+    return {"version": model.version + 1}
+
+# Метки сводки по дочерним записям в RETURNING (см. children_version_columns)
+CHILDREN_VERSION = ("children_count", "children_versions", "children_last_id")
+
+def children_version_columns(model, child_model, fk_column: str) -> tuple:
+    """Сводка по дочерним записям для ETag подзапросами в RETURNING: число, сумма версий, последний id.
+
+    Те же значения, что читает get_version компании и банка, - ETag ответа
+    PATCH совпадает с ETag следующего GET. Условие связи задается полным
+    именем колонки, как в _related_columns счетов.
+    """
+    condition = getattr(child_model, fk_column) == literal_column(f"{model.__tablename__}.id")
+    aggregates = (
+        func.count(child_model.id),
+        func.coalesce(func.sum(child_model.version), 0),
+        func.max(child_model.id),
+    )
+    return tuple(
+        select(aggregate).where(condition).scalar_subquery().label(label)
+        for label, aggregate in zip(CHILDREN_VERSION, aggregates)
+    )
+
+def split_children_version(row) -> Tuple[dict, tuple]:
+    """Строка с children_version_columns -> (запись без сводки, версия для ETag)"""
+    row = dict(row)
+    children = tuple(row.pop(label) for label in CHILDREN_VERSION)
+    return row, (row["id"], row["version"], *children)
+
+async def update_version(
+    db: AsyncSession, model, id: int, values: dict, version: Optional[int], returning: tuple
+):
+    """Один UPDATE ... WHERE id = :id AND version = :version RETURNING без предварительного чтения.
+
+    Возвращает строку RETURNING или None, если записи нет. Если запись есть,
+    но версия другая, - VersionConflict (транзакция откатывается). Без values
+    строка только читается и версия сверяется с прочитанной. Коммит - за вызывающим.
+    """
+    if values:
+        stmt = update(model).where(model.id == id).values(**values, **next_version(model))
+        if version is not None:
+            stmt = stmt.where(model.version == version)
+        result = await db.execute(stmt.returning(*returning))
+        row = result.mappings().first()
+        if row is not None:
+            return row
+    else:
+        result = await db.execute(select(*returning).where(model.id == id))
+        row = result.mappings().first()
+        if row is None or version is None or row["version"] == version:
+            return row
+    # Строка не обновлена: записи нет или версия не совпала - различаем вторым запросом
+    current = await db.scalar(select(model.version).where(model.id == id))
+    await db.rollback()
+    if current is None:
+        return None
+    raise VersionConflict(current)
+
+async def delete_version(db: AsyncSession, model, id: int, version: Optional[int]) -> bool:
+    """Один DELETE ... WHERE id = :id AND version = :version; коммит - за вызывающим.
+
+    False, если записи нет. Если запись есть, но версия другая, -
+    VersionConflict (транзакция откатывается вместе с предшествующими
+    изменениями, например счетчиками).
+    """
+    stmt = delete(model).where(model.id == id)
+    if version is not None:
+        stmt = stmt.where(model.version == version)
+    result = await db.execute(stmt)
+    if result.rowcount == 1:
+        return True
+    current = await db.scalar(select(model.version).where(model.id == id))
+    await db.rollback()
+    if current is None:
+        return False
+    raise VersionConflict(current)
@@ -1,16 +1,113 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request, Response
 from .config import settings
+from .pool import InstrumentedAsyncPool, instrument_pool
+from .metrics import instrument_engine
+from .profiling import instrument_profiling
+from .replicas import READ_METHODS, ReplicaSet
 
+# Асинхронные драйверы для синхронных URL из DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    """URL с асинхронным драйвером; синхронный драйвер заменяется по ASYNC_DRIVERS"""
+    url = make_url(url)
+    if url.get_dialect().is_async:
+        return url.render_as_string(hide_password=False)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Нет асинхронного драйвера для {url.get_backend_name()}, задайте ASYNC_DATABASE_URL")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+def get_async_database_url() -> str:
+    """URL для асинхронного движка: ASYNC_DATABASE_URL или DATABASE_URL с асинхронным драйвером"""
+    if settings.async_database_url:
+        return settings.async_database_url
+    return to_async_url(settings.database_url)
+
+def casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+def configure_sqlite(engine) -> None:
+    """Настройка каждого соединения SQLite.
+
+    Внешние ключи проверяются только с PRAGMA foreign_keys. Встроенный lower()
+    SQLite приводит к нижнему регистру только ASCII, поэтому для поиска по
+    русским названиям регистрируется функция casefold() на str.casefold.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+        dbapi_connection.create_function("casefold", 1, casefold, deterministic=True)
+
+# Синхронный движок - для миграций и служебных скриптов
 engine = create_engine(settings.database_url)
+configure_sqlite(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def get_pool_options(url: str, instrumented: bool = True) -> dict:
+    """Параметры пула из настроек; SQLite в памяти работает на своем пуле"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    options = {"poolclass": InstrumentedAsyncPool} if instrumented else {}
+    return {
+        **options,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+# Асинхронный движок - для обработки запросов API
+async_database_url = get_async_database_url()
+async_engine = create_async_engine(async_database_url, **get_pool_options(async_database_url))
+configure_sqlite(async_engine.sync_engine)
+instrument_pool(async_engine.sync_engine)
+instrument_engine(async_engine.sync_engine)
+instrument_profiling(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+def create_replica_engine(url: str):
+    url = to_async_url(url)
+    replica_engine = create_async_engine(url, **get_pool_options(url, instrumented=False))
+    configure_sqlite(replica_engine.sync_engine)
+    instrument_engine(replica_engine.sync_engine)
+    instrument_profiling(replica_engine.sync_engine)
+    return replica_engine
+
+# Реплики для чтения (по умолчанию нет)
+replicas = ReplicaSet(
+    [create_replica_engine(url.strip()) for url in settings.database_replica_urls.split(",") if url.strip()],
+    pin_window=settings.read_your_writes_window,
+)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+def session_for(request: Request) -> AsyncSession:
+    """Сессия на реплике для чтения или на основной БД для записи и read-your-writes"""
+    replica_engine = replicas.choose() if replicas.use_replica(request) else None
+    if replica_engine is None:
+        return AsyncSessionLocal()
+    return AsyncSessionLocal(bind=replica_engine)
+
+async def get_db(request: Request, response: Response):
+    if request.method not in READ_METHODS:
+        replicas.pin(response)
+    async with session_for(request) as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
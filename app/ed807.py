@@ -0,0 +1,104 @@
+"""Потоковый разбор справочника БИК Банка России (ЭС ED807).
+
+Файл читается кусками через XMLPullParser: в памяти держится только текущая
+запись BICDirectoryEntry, разобранные элементы сразу освобождаются.
+Пространство имен (urn:cbr-ru:ed:v2.0 и др.) не проверяется.
+"""
+import re
+import xml.etree.ElementTree as ET
+from typing import Iterable, Iterator, List, Optional
+
+# Статус участника "исключается из справочника"
+CLOSED_STATUS = "PSDL"
+# Тип счета "корреспондентский счет"
+CORRESPONDENT_ACCOUNT_TYPE = "CRSA"
+# InfoTypeCode файла изменений (полный справочник - FIRR)
+CHANGES_INFO_TYPE = "SIRR"
+# Файл изменений содержит не все банки - по нему нельзя закрывать отсутствующие
+CHANGES_CLOSE_MISSING_ERROR = "Файл изменений справочника (InfoTypeCode=SIRR) нельзя применять с close_missing"
+
+BIK_PATTERN = re.compile(r"^\d{9}$")
+ACCOUNT_PATTERN = re.compile(r"^\d{20}$")
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def _address(info: ET.Element) -> Optional[str]:
+    """Адрес из атрибутов ParticipantInfo: индекс, населенный пункт, адрес"""
+    settlement = " ".join(part for part in (info.get("Tnp"), info.get("Nnp")) if part)
+    parts = [info.get("Ind"), settlement, info.get("Adr")]
+    return ", ".join(part.strip() for part in parts if part and part.strip()) or None
+
+def parse_entry(entry: ET.Element) -> Optional[dict]:
+    """Запись справочника -> поля банка; None, если в записи нет БИК или наименования"""
+    bik = entry.get("BIC")
+    info = accounts = None
+    correspondent_account = None
+    for child in entry:
+        name = _local(child.tag)
+        if name == "ParticipantInfo":
+            info = child
+        elif name == "Accounts" and child.get("RegulationAccountType") == CORRESPONDENT_ACCOUNT_TYPE:
+            accounts = child
+    if accounts is not None and ACCOUNT_PATTERN.match(accounts.get("Account") or ""):
+        correspondent_account = accounts.get("Account")
+    if not bik or not BIK_PATTERN.match(bik) or info is None or not info.get("NameP"):
+        return None
+    return {
+        "bik": bik,
+        "name": info.get("NameP").strip()[:255],
+        "correspondent_account": correspondent_account,
+        "address": _address(info),
+        "closed": info.get("ParticipantStatus") == CLOSED_STATUS,
+    }
+
+class ED807Parser:
+    """Инкрементальный разбор: feed() принимает очередной кусок файла и
+    возвращает записи, закрытые в этом куске"""
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root: Optional[ET.Element] = None
+        self.skipped = 0
+
+    def _entries(self) -> List[dict]:
+        entries = []
+        for event, element in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = element
+                continue
+            if _local(element.tag) != "BICDirectoryEntry":
+                continue
+            entry = parse_entry(element)
+            if entry is None:
+                self.skipped += 1
+            else:
+                entries.append(entry)
+            # Разобранная запись больше не нужна
+            element.clear()
+            if self._root is not element:
+                try:
+                    self._root.remove(element)
+                except ValueError:
+                    pass  # запись вложена глубже корня, остается пустой элемент
+        return entries
+
+    @property
+    def is_changes(self) -> bool:
+        """Файл содержит только изменения справочника: отсутствующие в нем банки не закрываются"""
+        return self._root is not None and self._root.get("InfoTypeCode") == CHANGES_INFO_TYPE
+    
+    def feed(self, chunk: bytes) -> List[dict]:
+        self._parser.feed(chunk)
+        return self._entries()
+
+    def close(self) -> List[dict]:
+        self._parser.close()
+        return self._entries()
+
+def iter_entries(chunks: Iterable[bytes], parser: Optional[ED807Parser] = None) -> Iterator[dict]:
+    parser = parser or ED807Parser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -0,0 +1,42 @@
+import hashlib
+from fastapi import HTTPException, Response, status
+from typing import Optional
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из частей версии (id, updated_at, сведения о вложенных записях)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """Есть ли etag в значении If-None-Match / If-Match (список через запятую или *).
+
+    If-None-Match сравнивается слабо (W/"x" совпадает с "x"), If-Match - строго
+    (RFC 9110, 13.1.1): слабый тег не подтверждает версию для записи.
+    """
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if weak:
+            candidate = candidate.removeprefix("W/")
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Запись была изменена, получите актуальную версию"
+    )
+
+def check_if_match(if_match: Optional[str], etag: str) -> None:
+    """Оптимистическая блокировка: 412, если клиент изменяет не ту версию записи.
+
+    Проверка по прочитанной версии; запись затем выполняется с WHERE version,
+    и VersionConflict при записи тоже означает 412 (precondition_failed).
+    """
+    if if_match and not etag_matches(if_match, etag, weak=False):
+        raise precondition_failed()
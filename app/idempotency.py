@@ -0,0 +1,311 @@
+"""Повтор запросов с заголовком Idempotency-Key.
+
+Маршруты создания и изменения, отмеченные @idempotent, сохраняют ответ под
+ключом клиента. Повтор с тем же ключом получает сохраненный ответ без
+проверки тела, зависимостей и обращения к ORM; параллельные запросы с одним
+ключом ждут первого и получают его ответ. Ответы 5xx не сохраняются, чтобы
+клиент мог повторить запрос после сбоя.
+
+Хранилище (IDEMPOTENCY_STORE): memory - LRU в памяти процесса, database -
+таблица idempotency_keys, общая для всех воркеров.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from .config import settings
+from .crud.cache import LRUCache
+from .database import async_engine
+from .metrics import IDEMPOTENCY_REQUESTS
+from .models.idempotency import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# Как часто опрашивать строку, пока запрос выполняется в другом воркере
+POLL_INTERVAL = 0.05
+# Устаревшие строки таблицы удаляются после стольких сохранений в процессе
+CLEANUP_EVERY = 1000
+# Заголовки ответа, которые повторяются: остальные (set-cookie закрепления за
+# основной БД, etag) относятся к исходному запросу, а не к его повторам
+STORED_HEADERS = ("content-type", "location")
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes
+
+def fingerprint(request: Request, body: bytes) -> str:
+    """Отпечаток запроса: тот же ключ с другим методом, путем или телом - ошибка клиента"""
+    digest = hashlib.sha256(f"{request.method} {request.url.path}?{request.url.query}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+def store_response(response: Response, request_fingerprint: str) -> Optional[StoredResponse]:
+    """Ответ для сохранения; None для 5xx и потоковых ответов"""
+    if response.status_code >= 500 or not hasattr(response, "body"):
+        return None
+    headers = {name: value for name, value in response.headers.items() if name in STORED_HEADERS}
+    return StoredResponse(request_fingerprint, response.status_code, headers, bytes(response.body))
+
+def mismatch_error() -> HTTPException:
+    """Ключ уже занят другим запросом - выполненным или еще выполняющимся"""
+    IDEMPOTENCY_REQUESTS.labels("mismatch").inc()
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+        detail="Idempotency-Key уже использован для другого запроса"
+    )
+
+class MemoryIdempotencyStore:
+    """Ответы в LRU процесса: повтор, попавший в другой воркер, выполнится заново"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = LRUCache(maxsize, ttl)
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        return self.cache.get(key)
+
+    async def claim(self, key: str, request_fingerprint: str) -> Optional[StoredResponse]:
+        """Занимает ключ для выполнения; если запрос уже выполнен в другом воркере - его ответ"""
+        return None
+
+    async def save(self, key: str, stored: StoredResponse) -> None:
+        self.cache.set(key, stored)
+
+    async def release(self, key: str) -> None:
+        """Освобождает ключ, если ответ не сохранен (ошибка 5xx или исключение)"""
+
+class DatabaseIdempotencyStore(MemoryIdempotencyStore):
+    """Ответы в таблице idempotency_keys с LRU процесса перед ней.
+
+    Выполняющий воркер занимает ключ строкой без ответа (INSERT ... ON CONFLICT
+    DO NOTHING); воркеры с тем же ключом опрашивают строку до появления ответа.
+    Строка без ответа старше wait секунд считается брошенной (воркер упал)
+    и занимается заново.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, wait: float):
+        super().__init__(maxsize, ttl)
+        self.ttl = ttl
+        self.wait = wait
+        self._saved = 0
+        self._insert = postgresql.insert if async_engine.dialect.name == "postgresql" else sqlite.insert
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    async def _read(self, conn, key: str):
+        result = await conn.execute(
+            select(IdempotencyKey.__table__).where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.created_at >= self._now() - timedelta(seconds=self.ttl),
+            )
+        )
+        return result.mappings().first()
+
+    def _stored(self, row) -> StoredResponse:
+        stored = StoredResponse(row["fingerprint"], row["status_code"], json.loads(row["headers"]), row["body"])
+        self.cache.set(row["key"], stored)
+        return stored
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        stored = self.cache.get(key)
+        if stored is not None:
+            return stored
+        async with async_engine.connect() as conn:
+            row = await self._read(conn, key)
+        if row is None or row["status_code"] is None:
+            return None
+        return self._stored(row)
+
+    async def claim(self, key: str, request_fingerprint: str) -> Optional[StoredResponse]:
+        deadline = time.monotonic() + self.wait
+        while True:
+            now = self._now()
+            async with async_engine.begin() as conn:
+                # Просроченная строка освобождает ключ
+                await conn.execute(
+                    delete(IdempotencyKey).where(
+                        IdempotencyKey.key == key,
+                        IdempotencyKey.created_at < now - timedelta(seconds=self.ttl),
+                    )
+                )
+                result = await conn.execute(
+                    self._insert(IdempotencyKey)
+                    .values(key=key, fingerprint=request_fingerprint, created_at=now)
+                    .on_conflict_do_nothing(index_elements=["key"])
+                )
+                if result.rowcount == 1:
+                    return None
+                # Брошенная строка без ответа занимается заново
+                result = await conn.execute(
+                    update(IdempotencyKey)
+                    .where(
+                        IdempotencyKey.key == key,
+                        IdempotencyKey.status_code.is_(None),
+                        IdempotencyKey.created_at < now - timedelta(seconds=self.wait),
+                    )
+                    .values(fingerprint=request_fingerprint, created_at=now)
+                )
+                if result.rowcount == 1:
+                    return None
+                row = await self._read(conn, key)
+            if row is not None and row["status_code"] is not None:
+                return self._stored(row)
+            if row is not None and row["fingerprint"] != request_fingerprint:
+                raise mismatch_error()
+            if time.monotonic() >= deadline:
+                IDEMPOTENCY_REQUESTS.labels("busy").inc()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Запрос с этим Idempotency-Key еще выполняется, повторите позже"
+                )
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def save(self, key: str, stored: StoredResponse) -> None:
+        self.cache.set(key, stored)
+        async with async_engine.begin() as conn:
+            await conn.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .values(status_code=stored.status_code, headers=json.dumps(stored.headers), body=stored.body)
+            )
+            self._saved += 1
+            if self._saved % CLEANUP_EVERY == 0:
+                await conn.execute(
+                    delete(IdempotencyKey).where(
+                        IdempotencyKey.created_at < self._now() - timedelta(seconds=self.ttl)
+                    )
+                )
+
+    async def release(self, key: str) -> None:
+        async with async_engine.begin() as conn:
+            await conn.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None))
+            )
+
+class Idempotency:
+    """Выполнение запроса с Idempotency-Key: повтор, ожидание параллельного или выполнение"""
+
+    def __init__(self, store: MemoryIdempotencyStore):
+        self.store = store
+        # Ключи, выполняющиеся в этом процессе: отпечаток запроса и его будущий ответ
+        self._in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    @staticmethod
+    def _replay(stored: StoredResponse, request_fingerprint: str, result: str) -> Response:
+        if stored.fingerprint != request_fingerprint:
+            raise mismatch_error()
+        IDEMPOTENCY_REQUESTS.labels(result).inc()
+        return Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            headers={**stored.headers, REPLAYED_HEADER: "true"},
+        )
+
+    async def handle(self, request: Request, key: str, handler: Callable) -> Response:
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Idempotency-Key длиннее {MAX_KEY_LENGTH} символов"
+            )
+        request_fingerprint = fingerprint(request, await request.body())
+
+        while True:
+            stored = await self.store.get(key)
+            if stored is not None:
+                return self._replay(stored, request_fingerprint, "replayed")
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            in_flight_fingerprint, in_flight_future = in_flight
+            if in_flight_fingerprint != request_fingerprint:
+                raise mismatch_error()
+            # shield: отмена ожидающего запроса не отменяет выполняющийся
+            stored = await asyncio.shield(in_flight_future)
+            if stored is not None:
+                return self._replay(stored, request_fingerprint, "coalesced")
+            # Первый запрос завершился ошибкой - выполняем сами
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (request_fingerprint, future)
+        stored = None
+        claimed = False
+        try:
+            stored = await self.store.claim(key, request_fingerprint)
+            if stored is not None:
+                return self._replay(stored, request_fingerprint, "coalesced")
+            claimed = True
+            try:
+                response = await handler(request)
+            except HTTPException as e:
+                if e.status_code >= 500:
+                    raise
+                # Ошибки клиента (400, 404, 409, 412) тоже повторяются из хранилища
+                response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            stored = store_response(response, request_fingerprint)
+            if stored is not None:
+                await self.store.save(key, stored)
+            IDEMPOTENCY_REQUESTS.labels("executed").inc()
+            return response
+        finally:
+            # Освобождается только ключ, занятый этим запросом: при 409 от claim()
+            # строка принадлежит другому воркеру
+            if claimed and stored is None:
+                await self.store.release(key)
+            self._in_flight.pop(key, None)
+            future.set_result(stored)
+
+def create_store() -> MemoryIdempotencyStore:
+    if settings.idempotency_store == "database":
+        return DatabaseIdempotencyStore(settings.idempotency_cache_size, settings.idempotency_ttl,
+                                        settings.idempotency_wait)
+    return MemoryIdempotencyStore(settings.idempotency_cache_size, settings.idempotency_ttl)
+
+idempotency = Idempotency(create_store())
+
+def idempotent(endpoint: Callable) -> Callable:
+    """Отмечает маршрут создания или изменения: поддерживается заголовок Idempotency-Key"""
+    endpoint.idempotent = True
+    return endpoint
+
+class IdempotentRoute(APIRoute):
+    """Класс маршрутов роутера: отмеченные @idempotent обрабатываются через idempotency"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if getattr(endpoint, "idempotent", False):
+            openapi_extra = kwargs.get("openapi_extra") or {}
+            kwargs["openapi_extra"] = {**openapi_extra, "parameters": [
+                *openapi_extra.get("parameters", []),
+                {
+                    "name": IDEMPOTENCY_HEADER,
+                    "in": "header",
+                    "required": False,
+                    "schema": {"type": "string", "maxLength": MAX_KEY_LENGTH},
+                    "description": "Ключ повтора: запрос с тем же ключом получит сохраненный ответ",
+                },
+            ]}
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        if not getattr(self.endpoint, "idempotent", False):
+            return handler
+
+        async def idempotent_handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None:
+                return await handler(request)
+            return await idempotency.handle(request, key, handler)
+
+        return idempotent_handler
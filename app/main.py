@@ -1,13 +1,35 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from anyio import to_thread
+from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine
-from .database import Base
-from .routers import companies_router, banks_router, bank_accounts_router
+from fastapi.responses import JSONResponse
+from .config import settings
+from .database import async_engine, replicas
+from .metrics import MetricsMiddleware, metrics_response, track_route
+from .profiling import QueryProfilingMiddleware
+from .routers import (
+    companies_router, banks_router, bank_accounts_router, stats_router, admin_router, validation_router
+)
+from .startup import startup
 
-# Создаем таблицы
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Потоков для синхронных обработчиков столько же, сколько соединений в пуле,
+    # чтобы потоки не простаивали в ожидании соединения
+    to_thread.current_default_thread_limiter().total_tokens = (
+        settings.threadpool_size or settings.db_pool_size + settings.db_max_overflow
+    )
+    # Схема БД, пул соединений и кэш справочников - здесь, а не при импорте
+    await startup.start(app)
+    await replicas.start(settings.replica_check_interval)
+    yield
+    await startup.stop()
+    await replicas.stop()
+    await async_engine.dispose()
 
 app = FastAPI(
+    lifespan=lifespan,
+    dependencies=[Depends(track_route)],
     title="Banking API",
     description="API для управления банковскими счетами компаний",
     version="1.0.0",
@@ -24,10 +46,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Метрики Prometheus по маршрутам
+app.add_middleware(MetricsMiddleware)
+
+# Бюджет SQL-запросов и поиск N+1 (режим разработки/CI)
+if settings.query_profiling:
+    app.add_middleware(
+        QueryProfilingMiddleware,
+        budget=settings.query_budget,
+        slow_query_ms=settings.slow_query_ms,
+        repeated_threshold=settings.repeated_query_threshold,
+    )
+
 # Подключаем роутеры
 app.include_router(companies_router)
 app.include_router(banks_router)
 app.include_router(bank_accounts_router)
+app.include_router(stats_router)
+app.include_router(admin_router)
+app.include_router(validation_router)
 
 @app.get("/")
 def read_root():
@@ -40,4 +77,15 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    """Процесс жив (liveness); БД не проверяется"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def readiness_check():
+    """Приложение готово принимать трафик (readiness): схема проверена, пул и кэш прогреты"""
+    status_code = status.HTTP_200_OK if startup.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(startup.status(), status_code=status_code)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
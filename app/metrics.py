@@ -0,0 +1,144 @@
+import os
+import time
+from contextvars import ContextVar
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Шаблон маршрута текущего запроса - метка для метрик SQL
+current_route: ContextVar[str] = ContextVar("current_route", default="-")
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Количество HTTP-запросов", ["method", "route", "status"]
+)
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ["method", "route"]
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP-запросы в обработке", ["method", "route"],
+    multiprocess_mode="livesum",
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Размер тела ответа", ["method", "route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+DB_STATEMENTS = Counter(
+    "db_statements_total", "Количество SQL-запросов", ["route", "operation"]
+)
+DB_DURATION = Histogram(
+    "db_statement_duration_seconds", "Время выполнения SQL-запроса", ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total", "Запросы с Idempotency-Key по результату", ["result"]
+)
+STARTUP_DURATION = Gauge(
+    "app_startup_seconds", "Время холодного старта по шагам", ["step"], multiprocess_mode="max"
+)
+
+class MetricsMiddleware:
+    """ASGI middleware метрик HTTP по шаблонам маршрутов (/banks/{bank_id}).
+
+    Шаблон берется из scope["route"], который роутер заполняет при выборе
+    маршрута; дочерние метрики с метками кэшируются, чтобы не искать их
+    на каждом запросе.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self._children = {}
+    
+    def _metrics(self, method: str, route: str, status: int):
+        key = (method, route, status)
+        children = self._children.get(key)
+        if children is None:
+            children = (
+                HTTP_REQUESTS.labels(method, route, str(status)),
+                HTTP_DURATION.labels(method, route),
+                HTTP_RESPONSE_SIZE.labels(method, route),
+            )
+            self._children[key] = children
+        return children
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        size = 0
+        
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", "unmatched")
+            requests, duration, response_size = self._metrics(scope["method"], route, status)
+            requests.inc()
+            duration.observe(elapsed)
+            response_size.observe(size)
+
+_in_progress = {}
+
+async def track_route(request: Request):
+    """Зависимость уровня приложения: запросы в работе по маршруту и метка маршрута для SQL.
+
+    Выполняется после выбора маршрута, поэтому шаблон уже известен.
+    """
+    route = request.scope["route"].path
+    key = (request.method, route)
+    in_progress = _in_progress.get(key)
+    if in_progress is None:
+        in_progress = _in_progress[key] = HTTP_IN_PROGRESS.labels(request.method, route)
+    current_route.set(route)
+    in_progress.inc()
+    try:
+        yield
+    finally:
+        in_progress.dec()
+
+def instrument_engine(engine) -> None:
+    """Считает SQL-запросы и их время по событиям курсора синхронного движка"""
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        route = current_route.get()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else "-"
+        DB_STATEMENTS.labels(route, operation).inc()
+        DB_DURATION.labels(route).observe(elapsed)
+    
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+def metrics_response() -> Response:
+    """Метрики в текстовом формате Prometheus.
+
+    При нескольких воркерах задайте PROMETHEUS_MULTIPROC_DIR - метрики
+    процессов будут собираться через общий каталог.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
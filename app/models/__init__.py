@@ -1,3 +1,5 @@
 from .company import Company
 from .bank import Bank  
-from .bank_account import BankAccount
\ No newline at end of file
+from .bank_account import BankAccount
+from .account_stats import AccountStats
+from .idempotency import IdempotencyKey
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String
+from ..database import Base
+
+class AccountStats(Base):
+    """Счетчики счетов для GET /stats/accounts.
+
+    Две группы строк: scope="bank" - по (bank_id, currency, is_active),
+    scope="company" - по (company_id, currency, is_active); parent_id - id
+    банка или компании. Поддерживаются BankAccountCRUD при каждой записи.
+    """
+    __tablename__ = "account_stats"
+    
+    scope = Column(String(10), primary_key=True)
+    parent_id = Column(Integer, primary_key=True)
+    currency = Column(String(3), primary_key=True)
+    is_active = Column(String(1), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
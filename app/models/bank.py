@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
+from .search import register_name_search
 
 class Bank(Base):
     __tablename__ = "banks"
@@ -13,6 +14,23 @@ class Bank(Base):
     address = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Номер версии строки: увеличивается при каждом изменении (оптимистическая блокировка PATCH)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    closed_at = Column(DateTime(timezone=True), nullable=True)  # Исключен из справочника БИК
     
-    # Связь с банковскими счетами
-    bank_accounts = relationship("BankAccount", back_populates="bank", cascade="all, delete-orphan")
\ No newline at end of file
+    # Связь с банковскими счетами; при удалении счета не загружаются - их удаляет ON DELETE CASCADE
+    bank_accounts = relationship(
+        "BankAccount", back_populates="bank", cascade="all, delete-orphan", passive_deletes=True
+    )
+    
+    # Составной индекс для keyset-пагинации по названию
+    __table_args__ = (
+        Index('ix_banks_name_id', 'name', 'id'),
+        # Поиск по подстроке названия (pg_trgm); в SQLite - FTS5, см. register_name_search
+        Index(
+            'ix_banks_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
+
+register_name_search(Bank.__table__)
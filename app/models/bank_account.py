@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -8,12 +8,15 @@ class BankAccount(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     account_number = Column(String(20), nullable=False, index=True)
-    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
-    bank_id = Column(Integer, ForeignKey("banks.id"), nullable=False)
+    # Счета удаляются вместе с компанией или банком на стороне БД (ON DELETE CASCADE)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    bank_id = Column(Integer, ForeignKey("banks.id", ondelete="CASCADE"), nullable=False)
     currency = Column(String(3), nullable=False, default="RUB")  # Валюта счета
     is_active = Column(String(1), nullable=False, default="Y")  # Активен ли счет
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Номер версии строки: увеличивается при каждом изменении (оптимистическая блокировка PATCH)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Связи
     company = relationship("Company", back_populates="bank_accounts")
@@ -22,4 +25,7 @@ class BankAccount(Base):
     # Уникальность номера счета в пределах одного банка
     __table_args__ = (
         UniqueConstraint('account_number', 'bank_id', name='unique_account_per_bank'),
+        # Выборка и подсчет счетов компании/банка по порядку id
+        Index('ix_bank_accounts_company_id_id', 'company_id', 'id'),
+        Index('ix_bank_accounts_bank_id_id', 'bank_id', 'id'),
     )
\ No newline at end of file
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, Text
+from ..database import Base
+
+class IdempotencyKey(Base):
+    """Ответы на запросы с заголовком Idempotency-Key (IDEMPOTENCY_STORE=database).
+
+    Строка со status_code = NULL - запрос еще выполняется в одном из воркеров.
+    Читается и пишется запросами Core, без ORM; устаревшие строки удаляются
+    по created_at.
+    """
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # sha256 метода, пути и тела запроса
+    status_code = Column(Integer, nullable=True)
+    headers = Column(Text, nullable=True)  # JSON
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
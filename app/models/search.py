@@ -0,0 +1,28 @@
+from sqlalchemy import DDL, Table, event
+
+def fts_table(table_name: str) -> str:
+    return f"{table_name}_fts"
+
+def register_name_search(table: Table) -> None:
+    """Индекс поиска по подстроке названия при создании таблицы.
+
+    PostgreSQL: расширение pg_trgm (GIN-индекс объявлен в модели).
+    SQLite: FTS5 с триграммами поверх таблицы и триггеры синхронизации.
+    """
+    name = table.name
+    fts = fts_table(name)
+    event.listen(
+        table, "before_create",
+        DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+    )
+    for statement in (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(name, content='{name}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {name} BEGIN "
+        f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF name ON {name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); "
+        f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+    ):
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
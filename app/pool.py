@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import Tuple
+
+logger = logging.getLogger("app.db.pool")
+
+# События жизненного цикла соединений, которые считаются и пишутся в лог
+POOL_EVENTS = ("connect", "checkout", "checkin", "reset", "invalidate", "soft_invalidate", "close", "detach")
+
+class PoolStats:
+    """Счетчики пула соединений текущего процесса"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = dict.fromkeys(POOL_EVENTS, 0)
+        self.timeouts = 0
+        self.checkout_count = 0
+        self.checkout_time = 0.0
+        self.checkout_time_max = 0.0
+        self.wait_count = 0
+        self.wait_time = 0.0
+        self.wait_time_max = 0.0
+    
+    def record_event(self, name: str) -> None:
+        with self._lock:
+            self.events[name] += 1
+    
+    def record_checkout(self, seconds: float, waited: bool) -> None:
+        with self._lock:
+            self.checkout_count += 1
+            self.checkout_time += seconds
+            self.checkout_time_max = max(self.checkout_time_max, seconds)
+            if waited:
+                self.wait_count += 1
+                self.wait_time += seconds
+                self.wait_time_max = max(self.wait_time_max, seconds)
+    
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+    
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            checkout_avg = self.checkout_time / self.checkout_count if self.checkout_count else 0.0
+            wait_avg = self.wait_time / self.wait_count if self.wait_count else 0.0
+            stats = {
+                "pid": os.getpid(),
+                "pool": pool.status(),
+                "events": dict(self.events),
+                "timeouts": self.timeouts,
+                "checkout_latency_ms": {
+                    "count": self.checkout_count,
+                    "avg": round(checkout_avg * 1000, 3),
+                    "max": round(self.checkout_time_max * 1000, 3),
+                },
+                "wait_ms": {
+                    "count": self.wait_count,
+                    "total": round(self.wait_time * 1000, 3),
+                    "avg": round(wait_avg * 1000, 3),
+                    "max": round(self.wait_time_max * 1000, 3),
+                },
+            }
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+                max_overflow=pool._max_overflow,
+                timeout=pool.timeout(),
+            )
+        return stats
+
+pool_stats = PoolStats()
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Пул, замеряющий время выдачи соединения.
+
+    Выдача, начатая при исчерпанном пуле (все соединения и overflow заняты),
+    считается ожиданием.
+    """
+    
+    def connect(self):
+        exhausted = (
+            self._max_overflow > -1
+            and self.checkedin() == 0
+            and self.overflow() >= self._max_overflow
+        )
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            pool_stats.record_timeout()
+            logger.warning("Таймаут ожидания соединения: %s", self.status())
+            raise
+        pool_stats.record_checkout(time.perf_counter() - start, exhausted)
+        return connection
+
+def _make_listener(name: str):
+    def listener(*args):
+        pool_stats.record_event(name)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("pool %s (pid %s)", name, os.getpid())
+    return listener
+
+def instrument_pool(engine) -> None:
+    """Подписывает счетчики на события пула синхронного движка (для async - engine.sync_engine)"""
+    for name in POOL_EVENTS:
+        event.listen(engine, name, _make_listener(name))
+
+def worker_pool_size(max_connections: int, workers: int, pool_size: int, max_overflow: int) -> Tuple[int, int]:
+    """Пул одного воркера, при котором workers * (pool_size + max_overflow) <= max_connections.
+
+    Сначала урезается overflow, затем постоянные соединения; ValueError, если
+    соединений меньше, чем воркеров.
+    """
+    per_worker = max_connections // workers
+    if per_worker < 1:
+        raise ValueError(f"DB_MAX_CONNECTIONS={max_connections} меньше числа воркеров ({workers})")
+    pool_size = min(pool_size, per_worker)
+    return pool_size, min(max_overflow, per_worker - pool_size)
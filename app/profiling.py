@@ -0,0 +1,118 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("app.db.queries")
+
+class QueryProfile:
+    """SQL-запросы, выполненные в рамках одного HTTP-запроса или блока profile_queries()"""
+    
+    def __init__(self):
+        self.statements: List[Tuple[str, float]] = []
+    
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+    
+    @property
+    def total_time(self) -> float:
+        return sum(elapsed for _, elapsed in self.statements)
+    
+    def record(self, statement: str, elapsed: float) -> None:
+        self.statements.append((statement, elapsed))
+    
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Одинаковые запросы, выполненные threshold и более раз (вероятный N+1)"""
+        counts = Counter(statement for statement, _ in self.statements)
+        return {statement: count for statement, count in counts.items() if count >= threshold}
+
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_profile", default=None)
+
+@contextmanager
+def profile_queries() -> Iterator[QueryProfile]:
+    """Считает SQL-запросы внутри блока, например в тестах:
+
+        with profile_queries() as profile:
+            await bank_crud.get(db, id=1)
+        assert profile.count <= 2
+    """
+    profile = QueryProfile()
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+
+def instrument_profiling(engine) -> None:
+    """Записывает SQL-запросы в активный QueryProfile; без профиля почти ничего не стоит"""
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        if profile is not None and conn.info.get("profile_start"):
+            profile.record(statement, time.perf_counter() - conn.info["profile_start"].pop())
+    
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("profile_start"):
+            conn.info["profile_start"].pop()
+
+class QueryProfilingMiddleware:
+    """Режим разработки/CI: бюджет SQL-запросов на HTTP-запрос.
+
+    Добавляет заголовки Server-Timing и X-Query-Count (по ним тесты проверяют
+    число запросов эндпоинта), пишет в лог app.db.queries запросы сверх
+    бюджета со списком SQL, повторяющиеся запросы (N+1) и медленные запросы.
+    """
+    
+    def __init__(self, app, budget: int, slow_query_ms: float, repeated_threshold: int):
+        self.app = app
+        self.budget = budget
+        self.slow_query = slow_query_ms / 1000
+        self.repeated_threshold = repeated_threshold
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                timing = f'db;dur={profile.total_time * 1000:.3f};desc="{profile.count} queries"'
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode()),
+                    (b"x-query-count", str(profile.count).encode()),
+                ]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            self._report(f"{scope['method']} {scope['path']}", profile)
+    
+    def _report(self, request: str, profile: QueryProfile) -> None:
+        if profile.count > self.budget:
+            logger.warning(
+                "%s: %d SQL-запросов (бюджет %d), %.1f мс\n%s",
+                request, profile.count, self.budget, profile.total_time * 1000,
+                "\n".join(f"  {elapsed * 1000:8.2f} мс  {statement}" for statement, elapsed in profile.statements),
+            )
+        for statement, count in profile.repeated(self.repeated_threshold).items():
+            logger.warning("%s: запрос выполнен %d раз (возможен N+1): %s", request, count, statement)
+        for statement, elapsed in profile.statements:
+            if elapsed >= self.slow_query:
+                logger.warning("%s: медленный запрос %.1f мс: %s", request, elapsed * 1000, statement)
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import math
+import time
+from itertools import count
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("app.db.replicas")
+
+# Методы, которые можно обслуживать с реплики
+READ_METHODS = {"GET", "HEAD"}
+
+# Cookie с моментом (unix time), до которого чтения клиента идут на основную БД
+PIN_COOKIE = "db_primary_until"
+# То же значение в заголовке - для клиентов без хранилища cookie: они повторяют
+# заголовок ответа на запись в своих чтениях
+PIN_HEADER = "X-DB-Primary-Until"
+
+class Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.healthy = True
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.selected = 0
+
+class ReplicaSet:
+    """Реплики для чтения: выбор по кругу среди исправных.
+
+    Реплика исключается при ошибке соединения (событие handle_error) или
+    неудачной проверке и возвращается после успешной фоновой проверки.
+    """
+    
+    def __init__(self, engines: List[AsyncEngine], pin_window: float = 5):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.pin_window = pin_window
+        self._counter = count()
+        self._task: Optional[asyncio.Task] = None
+        for replica in self.replicas:
+            self._watch_errors(replica)
+    
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+    
+    def choose(self) -> Optional[AsyncEngine]:
+        """Следующая исправная реплика; None - читать с основной БД"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        replica = healthy[next(self._counter) % len(healthy)]
+        replica.selected += 1
+        return replica.engine
+    
+    def mark_down(self, replica: Replica, error: str) -> None:
+        if replica.healthy:
+            logger.warning("Реплика %s исключена: %s", self._name(replica), error)
+        replica.healthy = False
+        replica.last_error = error
+    
+    def _watch_errors(self, replica: Replica) -> None:
+        @event.listens_for(replica.engine.sync_engine, "handle_error")
+        def handle_error(exception_context):
+            # Без соединения - ошибка подключения
+            if exception_context.is_disconnect or exception_context.connection is None:
+                self.mark_down(replica, str(exception_context.original_exception))
+    
+    async def check(self, timeout: float = 2) -> None:
+        """Проверяет все реплики запросом SELECT 1"""
+        for replica in self.replicas:
+            replica.checked_at = time.time()
+            try:
+                async with replica.engine.connect() as conn:
+                    await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout)
+            except Exception as e:
+                self.mark_down(replica, str(e) or type(e).__name__)
+                continue
+            if not replica.healthy:
+                logger.info("Реплика %s снова доступна", self._name(replica))
+            replica.healthy = True
+            replica.last_error = None
+    
+    async def _check_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check()
+    
+    async def start(self, interval: float) -> None:
+        """Первая проверка до приема запросов, дальше - фоновая каждые interval секунд"""
+        if self.replicas and self._task is None:
+            await self.check()
+            self._task = asyncio.create_task(self._check_loop(interval))
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+    
+    def use_replica(self, request) -> bool:
+        """Чтение без недавней записи этого клиента (cookie или заголовок PIN_HEADER) можно отдать реплике"""
+        if not self.replicas or request.method not in READ_METHODS:
+            return False
+        pinned_until = request.cookies.get(PIN_COOKIE) or request.headers.get(PIN_HEADER) or 0
+        try:
+            return float(pinned_until) < time.time()
+        except ValueError:
+            return True
+    
+    def pin(self, response) -> None:
+        """После записи чтения клиента на pin_window секунд идут на основную БД"""
+        if self.replicas and self.pin_window > 0:
+            pinned_until = f"{time.time() + self.pin_window:.3f}"
+            response.set_cookie(PIN_COOKIE, pinned_until, max_age=math.ceil(self.pin_window), httponly=True)
+            response.headers[PIN_HEADER] = pinned_until
+    
+    def stats(self) -> List[Dict]:
+        return [
+            {
+                "url": self._name(replica),
+                "healthy": replica.healthy,
+                "selected": replica.selected,
+                "last_error": replica.last_error,
+                "checked_at": replica.checked_at,
+            }
+            for replica in self.replicas
+        ]
+    
+    @staticmethod
+    def _name(replica: Replica) -> str:
+        return replica.engine.url.render_as_string(hide_password=True)
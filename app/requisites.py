@@ -0,0 +1,155 @@
+"""Контрольные суммы банковских реквизитов: ИНН, корреспондентский и расчетный счета"""
+from typing import Dict, List, Sequence
+
+INN10_WEIGHTS = (2, 4, 10, 3, 5, 9, 4, 6, 8)
+INN12_WEIGHTS = (
+    (7, 2, 4, 10, 3, 5, 9, 4, 6, 8),
+    (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8),
+)
+
+# Весовые коэффициенты для 23 цифр: 3 цифры из БИК + 20 цифр счета
+ACCOUNT_WEIGHTS = (7, 1, 3) * 8
+
+# Балансовый счет корреспондентских счетов банков в Банке России
+CORRESPONDENT_ACCOUNT_PREFIX = "30101"
+
+def _inn_digit(digits: str, weights) -> str:
+    return str(sum(int(d) * w for d, w in zip(digits, weights)) % 11 % 10)
+
+def inn_with_checksum(body: str) -> str:
+    """Дописывает контрольные цифры к 9 (юрлицо) или 10 (физлицо) цифрам ИНН"""
+    if len(body) == 9:
+        return body + _inn_digit(body, INN10_WEIGHTS)
+    body += _inn_digit(body, INN12_WEIGHTS[0])
+    return body + _inn_digit(body, INN12_WEIGHTS[1])
+
+def is_valid_inn(inn: str) -> bool:
+    if not (inn.isascii() and inn.isdigit()) or len(inn) not in (10, 12):
+        return False
+    return inn_with_checksum(inn[:9] if len(inn) == 10 else inn[:10]) == inn
+
+def correspondent_key_prefix(bik: str) -> str:
+    """Цифры БИК, участвующие в контроле корреспондентского счета"""
+    return "0" + bik[4:6]
+
+def settlement_key_prefix(bik: str) -> str:
+    """Цифры БИК, участвующие в контроле расчетного счета"""
+    return bik[6:9]
+
+def _account_sum(prefix: str, account: str) -> int:
+    return sum(int(d) * w for d, w in zip(prefix + account, ACCOUNT_WEIGHTS))
+
+def account_with_key(account: str, prefix: str) -> str:
+    """Подставляет контрольный ключ в 9-й разряд 20-значного счета"""
+    account = account[:8] + "0" + account[9:]
+    key = _account_sum(prefix, account) * 3 % 10
+    return account[:8] + str(key) + account[9:]
+
+def is_valid_account(account: str, prefix: str) -> bool:
+    """Проверка контрольного ключа счета; prefix - из *_key_prefix(bik)"""
+    return (
+        len(account) == 20 and account.isascii() and account.isdigit()
+        and _account_sum(prefix, account) % 10 == 0
+    )
+
+def account_key_prefix(account: str, bik: str) -> str:
+    """Цифры БИК для контроля счета: корреспондентский (30101) или счет клиента"""
+    if account.startswith(CORRESPONDENT_ACCOUNT_PREFIX):
+        return correspondent_key_prefix(bik)
+    return settlement_key_prefix(bik)
+
+# Пакетная проверка: строки переводятся в матрицу цифр, контрольные суммы
+# считаются по всем строкам сразу. Ответ - код ошибки для каждой строки.
+VALID, INVALID_FORMAT, INVALID_BIK, INVALID_CHECKSUM = range(4)
+
+INN_ERRORS = {
+    INVALID_FORMAT: "ИНН должен содержать 10 или 12 цифр",
+    INVALID_CHECKSUM: "Неверное контрольное число ИНН",
+}
+ACCOUNT_ERRORS = {
+    INVALID_FORMAT: "Номер счета должен содержать 20 цифр",
+    INVALID_BIK: "БИК должен содержать 9 цифр",
+    INVALID_CHECKSUM: "Неверный контрольный ключ счета",
+}
+
+def _digit_matrix(values: Sequence[str], width: int):
+    """Матрица цифр (n, width), длины строк и признак "строка только из цифр"
+
+    numpy нужен только пакетной проверке и импортируется при первом вызове.
+    Цифры хранятся в float32: суммы с весами точны, а умножение на веса идет через BLAS.
+    """
+    import numpy as np
+    
+    count = len(values)
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=count)
+    joined = "".join(values)
+    if count and joined.isascii() and (lengths == lengths[0]).all() and lengths[0] <= width:
+        # Обычный случай - ASCII-строки одной длины: байты всех строк подряд
+        # сразу складываются в матрицу без промежуточного массива строк
+        codes = np.frombuffer(joined.encode("ascii"), dtype=np.uint8).reshape(count, int(lengths[0]))
+        digits = codes - np.uint8(ord("0"))
+        is_digit = digits <= 9
+        matrix = np.zeros((count, width), dtype=np.float32)
+        matrix[:, :codes.shape[1]] = digits
+        return matrix, lengths, is_digit.all(axis=1)
+    
+    # Строки UCS-4 фиксированной ширины: каждый символ - uint32, хвост дополнен нулями
+    codes = np.array(values, dtype=f"U{width}").view(np.uint32).reshape(count, width)
+    # Символы меньше "0" при вычитании переполняются и тоже оказываются больше 9
+    digits = codes - np.uint32(ord("0"))
+    is_digit = digits <= 9
+    all_digits = np.count_nonzero(is_digit, axis=1) == lengths
+    return np.where(is_digit, digits, 0).astype(np.float32), lengths, all_digits
+
+def check_inns(inns: Sequence[str]):
+    """Коды ошибок (VALID, INVALID_FORMAT, INVALID_CHECKSUM) для списка ИНН"""
+    import numpy as np
+    
+    digits, lengths, all_digits = _digit_matrix(inns, 12)
+    is_inn10 = lengths == 10
+    ok10 = digits[:, :9] @ np.array(INN10_WEIGHTS, dtype=np.float32) % 11 % 10 == digits[:, 9]
+    ok12 = (
+        (digits[:, :10] @ np.array(INN12_WEIGHTS[0], dtype=np.float32) % 11 % 10 == digits[:, 10])
+        & (digits[:, :11] @ np.array(INN12_WEIGHTS[1], dtype=np.float32) % 11 % 10 == digits[:, 11])
+    )
+    codes = np.where(np.where(is_inn10, ok10, ok12), VALID, INVALID_CHECKSUM)
+    codes[~((is_inn10 | (lengths == 12)) & all_digits)] = INVALID_FORMAT
+    return codes
+
+def check_accounts(accounts: Sequence[str], biks: Sequence[str]):
+    """Коды ошибок (VALID, INVALID_FORMAT, INVALID_BIK, INVALID_CHECKSUM) для пар счет + БИК"""
+    import numpy as np
+    
+    digits, lengths, all_digits = _digit_matrix(accounts, 20)
+    bik_digits, bik_lengths, bik_all_digits = _digit_matrix(biks, 9)
+    is_correspondent = (digits[:, :5] == [int(d) for d in CORRESPONDENT_ACCOUNT_PREFIX]).all(axis=1)
+    prefix = np.where(
+        is_correspondent[:, None],
+        np.column_stack([np.zeros(len(biks), dtype=np.float32), bik_digits[:, 4], bik_digits[:, 5]]),
+        bik_digits[:, 6:9],
+    )
+    weights = np.array(ACCOUNT_WEIGHTS, dtype=np.float32)
+    checksum = prefix @ weights[:3] + digits @ weights[3:23]
+    codes = np.where(checksum % 10 == 0, VALID, INVALID_CHECKSUM)
+    codes[~((bik_lengths == 9) & bik_all_digits)] = INVALID_BIK
+    codes[~((lengths == 20) & all_digits)] = INVALID_FORMAT
+    return codes
+
+def failures(codes, messages: Dict[int, str]) -> List[dict]:
+    """Ошибки в виде {"index", "error"} только для строк с ненулевым кодом"""
+    import numpy as np
+    
+    indexes = np.flatnonzero(codes)
+    return [
+        {"index": index, "error": messages[code]}
+        for index, code in zip(indexes.tolist(), codes[indexes].tolist())
+    ]
+
+def check_requisites(inns: Sequence[str], accounts: Sequence[str], biks: Sequence[str]) -> dict:
+    """Пакетная проверка ИНН и пар счет + БИК для POST /validate/requisites"""
+    return {
+        "inns_checked": len(inns),
+        "accounts_checked": len(accounts),
+        "inn_errors": failures(check_inns(inns), INN_ERRORS),
+        "account_errors": failures(check_accounts(accounts, biks), ACCOUNT_ERRORS),
+    }
@@ -1,3 +1,6 @@
 from .companies import router as companies_router
 from .banks import router as banks_router
 from .bank_accounts import router as bank_accounts_router
+from .admin import router as admin_router
+from .stats import router as stats_router
+from .validation import router as validation_router
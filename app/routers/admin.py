@@ -0,0 +1,44 @@
+from anyio import to_thread
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..crud.cache import bank_cache, company_cache
+from ..crud.stats import account_stats_crud
+from ..database import async_engine, get_db, replicas
+from ..pool import pool_stats
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/cache")
+def get_cache_stats():
+    """Статистика кэша справочников"""
+    return {
+        "banks": bank_cache.cache.stats(),
+        "companies": company_cache.cache.stats(),
+    }
+
+@router.delete("/cache", status_code=status.HTTP_204_NO_CONTENT)
+def clear_cache():
+    """Очистить кэш справочников"""
+    bank_cache.cache.clear()
+    company_cache.cache.clear()
+
+@router.get("/pool")
+async def get_pool_stats():
+    """Состояние пула соединений с БД и пула потоков текущего процесса"""
+    limiter = to_thread.current_default_thread_limiter()
+    stats = pool_stats.snapshot(async_engine.pool)
+    stats["threadpool"] = {
+        "total": limiter.total_tokens,
+        "borrowed": limiter.borrowed_tokens,
+    }
+    return stats
+
+@router.get("/replicas")
+def get_replicas():
+    """Состояние реплик для чтения"""
+    return replicas.stats()
+
+@router.post("/stats/rebuild")
+async def rebuild_account_stats(db: AsyncSession = Depends(get_db)):
+    """Пересчитать счетчики /stats/accounts по таблице счетов"""
+    return {"rows": await account_stats_crud.rebuild(db)}
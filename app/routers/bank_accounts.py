@@ -1,136 +1,359 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..schemas.bank_account import BankAccountCreate, BankAccountUpdate, BankAccountResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Literal, Optional
+from ..config import settings
+from ..database import get_db, session_for
+from ..idempotency import IdempotentRoute, idempotent
+from ..serialization import fast_response, sparse_response
+from ..etag import check_if_match, etag_matches, make_etag, not_modified, precondition_failed
+from ..schemas.pagination import Page
+from ..schemas.batch import Batch, BatchRequest, BATCH_GET_MAX_IDS
+from ..schemas.fields import parse_fields, sparse_model
+from ..schemas.company import CompanyBrief
+from ..schemas.bank import BankBrief
+from ..schemas.bank_account import (
+    BankAccountCreate, BankAccountPatch, BankAccountUpdate, BankAccountResponse, BulkImportResult,
+    BulkStatusResult, BulkStatusUpdate
+)
+from ..streaming import detect_format, iter_records, format_validation_error, encode_csv, encode_ndjson
 from ..crud.bank_account import bank_account_crud
 from ..crud.company import company_crud
 from ..crud.bank import bank_crud
+from ..crud.versioning import VersionConflict
 
-router = APIRouter(prefix="/bank-accounts", tags=["bank-accounts"])
+router = APIRouter(prefix="/bank-accounts", tags=["bank-accounts"], route_class=IdempotentRoute)
+
+# Строк в одном пакете массовой загрузки
+BULK_BATCH_SIZE = 5000
+
+# Строк в одном пакете выгрузки
+EXPORT_BATCH_SIZE = 1000
+
+# Вложенные записи счета для ?include=
+ACCOUNT_RELATIONS = {"company": CompanyBrief, "bank": BankBrief}
+
+FIELDS_DESCRIPTION = "Поля через запятую, например id,account_number,bank_id или company.name"
+INCLUDE_DESCRIPTION = "Вложенные записи через запятую: company, bank"
+
+EXPORT_CSV_FIELDS = [
+    "id", "account_number", "currency", "is_active", "created_at", "updated_at",
+    "company_id", "company.name", "company.inn",
+    "bank_id", "bank.name", "bank.bik", "bank.correspondent_account",
+]
+
+async def _export_batches(request: Request, **filters):
+    """Пакеты счетов с подставленными компанией и банком.
+
+    Счета читаются серверным курсором; компании и банки берутся из кэша
+    справочников, промахи дозапрашиваются через отдельную сессию. Промахи не
+    кладутся в общий LRU (полная выгрузка вытеснила бы из него горячие записи),
+    а копятся в словарях этой выгрузки.
+    """
+    companies: Dict[int, dict] = {}
+    banks: Dict[int, dict] = {}
+    async with session_for(request) as db, session_for(request) as lookup_db:
+        async for rows in bank_account_crud.stream(db, batch_size=EXPORT_BATCH_SIZE, **filters):
+            companies.update(await company_crud.get_lookup(
+                lookup_db, {row["company_id"] for row in rows} - companies.keys(), store=False
+            ))
+            banks.update(await bank_crud.get_lookup(
+                lookup_db, {row["bank_id"] for row in rows} - banks.keys(), store=False
+            ))
+            for row in rows:
+                row["company"] = companies.get(row["company_id"])
+                row["bank"] = banks.get(row["bank_id"])
+            yield rows
 
 @router.post("/", response_model=BankAccountResponse, status_code=status.HTTP_201_CREATED)
-def create_bank_account(account: BankAccountCreate, db: Session = Depends(get_db)):
+@idempotent
+async def create_bank_account(account: BankAccountCreate, db: AsyncSession = Depends(get_db)):
     """Создать новый банковский счет"""
-    # Проверяем существование компании
-    company = company_crud.get(db, id=account.company_id)
-    if not company:
+    try:
+        return await bank_account_crud.create(db=db, obj_in=account)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Компания не найдена"
+            detail=str(e)
         )
-    
-    # Проверяем существование банка
-    bank = bank_crud.get(db, id=account.bank_id)
-    if not bank:
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def import_bank_accounts(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Формат файла; по умолчанию по Content-Type"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Массовая загрузка банковских счетов из CSV или NDJSON"""
+    file_format = format or detect_format(request.headers.get("content-type", ""))
+    if file_format is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Банк не найден"
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Поддерживаются форматы CSV и NDJSON"
         )
     
-    # Проверяем уникальность номера счета в банке
-    existing_account = bank_account_crud.get_by_account_and_bank(
-        db, account_number=account.account_number, bank_id=account.bank_id
-    )
-    if existing_account:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Счет с таким номером уже существует в данном банке"
-        )
+    total = created = 0
+    errors: Dict[int, str] = {}
+    batch = []
+    async for line, record in iter_records(request.stream(), file_format):
+        total += 1
+        if isinstance(record, str):
+            errors[line] = record
+            continue
+        try:
+            batch.append((line, BankAccountCreate(**record)))
+        except ValidationError as e:
+            errors[line] = format_validation_error(e)
+            continue
+        if len(batch) >= BULK_BATCH_SIZE:
+            created += await bank_account_crud.create_many(db, batch, errors)
+            batch = []
+    created += await bank_account_crud.create_many(db, batch, errors)
     
+    return {
+        "total": total,
+        "created": created,
+        "failed": len(errors),
+        "errors": [{"line": line, "error": error} for line, error in sorted(errors.items())],
+    }
+
+@router.post("/status", response_model=BulkStatusResult)
+async def set_accounts_status(status_update: BulkStatusUpdate, db: AsyncSession = Depends(get_db)):
+    """Деактивировать или реактивировать счета по фильтру (bank_id, company_id, currency)"""
+    updated = await bank_account_crud.set_status(db, status_update)
+    return {"updated": updated}
+
+@router.get("/", response_model=Page[BankAccountResponse])
+async def get_bank_accounts(
+    skip: int = Query(0, ge=0, description="Смещение (устаревший способ, используйте cursor)"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    company_id: Optional[int] = Query(None, description="Только счета компании"),
+    bank_id: Optional[int] = Query(None, description="Только счета банка"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить список банковских счетов"""
     try:
-        return bank_account_crud.create(db=db, obj_in=account)
+        selection = parse_fields(BankAccountResponse, fields, include, ACCOUNT_RELATIONS)
+        items, next_cursor = await bank_account_crud.get_multi(
+            db=db, skip=skip, limit=limit, cursor=cursor, company_id=company_id, bank_id=bank_id,
+            as_rows=settings.fast_responses, selection=selection
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    content = {"items": items, "next_cursor": next_cursor}
+    if selection is not None:
+        return sparse_response(Page[sparse_model(selection)], content, as_rows=settings.fast_responses)
+    return fast_response(content)
 
-@router.get("/", response_model=List[BankAccountResponse])
-def get_bank_accounts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Получить список банковских счетов"""
-    return bank_account_crud.get_multi(db=db, skip=skip, limit=limit)
+@router.get("/export")
+async def export_bank_accounts(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    company_id: Optional[int] = None,
+    bank_id: Optional[int] = None,
+    currency: Optional[str] = Query(None, min_length=3, max_length=3),
+    is_active: Optional[str] = Query(None, pattern="^[YN]$")
+):
+    """Выгрузить банковские счета потоком в NDJSON или CSV"""
+    batches = _export_batches(request, company_id=company_id, bank_id=bank_id, currency=currency, is_active=is_active)
+    
+    async def content():
+        header = True
+        async for rows in batches:
+            if format == "csv":
+                yield encode_csv(rows, EXPORT_CSV_FIELDS, header=header)
+                header = False
+            else:
+                yield encode_ndjson(rows)
+        if format == "csv" and header:
+            yield encode_csv([], EXPORT_CSV_FIELDS, header=True)
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        content(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="bank_accounts.{format}"'}
+    )
+
+@router.get("/batch", response_model=Batch[BankAccountResponse])
+async def get_accounts_batch(
+    ids: List[int] = Query(..., min_length=1, max_length=BATCH_GET_MAX_IDS, description="Идентификаторы: ?ids=1&ids=2"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить несколько банковских счетов по списку ID"""
+    items, missing = await bank_account_crud.get_many(db, ids)
+    return fast_response({"items": items, "missing": missing})
+
+@router.post("/batch", response_model=Batch[BankAccountResponse])
+async def post_accounts_batch(batch: BatchRequest, db: AsyncSession = Depends(get_db)):
+    """Получить несколько банковских счетов по списку ID из тела запроса"""
+    items, missing = await bank_account_crud.get_many(db, batch.ids)
+    return fast_response({"items": items, "missing": missing})
 
 @router.get("/{account_id}", response_model=BankAccountResponse)
-def get_bank_account(account_id: int, db: Session = Depends(get_db)):
+async def get_bank_account(
+    account_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """Получить банковский счет по ID"""
-    account = bank_account_crud.get(db=db, id=account_id)
+    try:
+        selection = parse_fields(BankAccountResponse, fields, include, ACCOUNT_RELATIONS)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # Версия проверяется легким запросом, без загрузки связей; при выборе полей
+    # связи могут быть не загружены, и ETag тоже берется из этого запроса
+    version = None
+    if if_none_match or selection is not None:
+        version = await bank_account_crud.get_version(db, id=account_id)
+        if version and selection is not None:
+            version = (*version, selection.key)
+        if version and etag_matches(if_none_match, make_etag(*version)):
+            return not_modified(make_etag(*version))
+    
+    account = await bank_account_crud.get(db=db, id=account_id, selection=selection)
     if not account:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Банковский счет не найден"
         )
+    if selection is not None:
+        return sparse_response(sparse_model(selection), account, headers={"ETag": make_etag(*version)})
+    response.headers["ETag"] = make_etag(*bank_account_crud.version(account))
     return account
 
 @router.get("/company/{company_id}", response_model=List[BankAccountResponse])
-def get_company_accounts(company_id: int, db: Session = Depends(get_db)):
+async def get_company_accounts(
+    company_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    db: AsyncSession = Depends(get_db)
+):
     """Получить банковские счета компании"""
+    try:
+        selection = parse_fields(BankAccountResponse, fields, include, ACCOUNT_RELATIONS)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
     # Проверяем существование компании
-    company = company_crud.get(db, id=company_id)
+    company = await company_crud.get_cached(db, id=company_id)
     if not company:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Компания не найдена"
         )
     
-    return bank_account_crud.get_by_company(db=db, company_id=company_id)
+    accounts = await bank_account_crud.get_by_company(
+        db=db, company_id=company_id, as_rows=settings.fast_responses, selection=selection
+    )
+    if selection is not None:
+        return sparse_response(List[sparse_model(selection)], accounts, as_rows=settings.fast_responses)
+    return fast_response(accounts)
 
 @router.put("/{account_id}", response_model=BankAccountResponse)
-def update_bank_account(account_id: int, account_update: BankAccountUpdate, db: Session = Depends(get_db)):
+@idempotent
+async def update_bank_account(
+    account_id: int,
+    account_update: BankAccountUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """Обновить банковский счет"""
-    account = bank_account_crud.get(db=db, id=account_id)
+    # Версия проверяется легким запросом только при If-Match, запись - с WHERE version
+    version = None
+    if if_match:
+        current = await bank_account_crud.get_version(db, id=account_id)
+        if current:
+            check_if_match(if_match, make_etag(*current))
+            version = current[1]
+    
+    try:
+        account = await bank_account_crud.update(db=db, id=account_id, obj_in=account_update, version=version)
+    except VersionConflict:
+        raise precondition_failed()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     if not account:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Банковский счет не найден"
         )
-    
-    # Проверяем существование компании при обновлении
-    if account_update.company_id and account_update.company_id != account.company_id:
-        company = company_crud.get(db, id=account_update.company_id)
-        if not company:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Компания не найдена"
-            )
-    
-    # Проверяем существование банка при обновлении
-    if account_update.bank_id and account_update.bank_id != account.bank_id:
-        bank = bank_crud.get(db, id=account_update.bank_id)
-        if not bank:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Банк не найден"
-            )
-    
-    # Проверяем уникальность номера счета в банке при обновлении
-    if (account_update.account_number and account_update.account_number != account.account_number) or \
-       (account_update.bank_id and account_update.bank_id != account.bank_id):
-        
-        check_account_number = account_update.account_number or account.account_number
-        check_bank_id = account_update.bank_id or account.bank_id
-        
-        existing_account = bank_account_crud.get_by_account_and_bank(
-            db, account_number=check_account_number, bank_id=check_bank_id
-        )
-        if existing_account and existing_account.id != account.id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Счет с таким номером уже существует в данном банке"
-            )
-    
+    response.headers["ETag"] = make_etag(*bank_account_crud.row_version(account))
+    return account
+
+@router.patch("/{account_id}", response_model=BankAccountResponse)
+@idempotent
+async def patch_bank_account(
+    account_id: int,
+    account_patch: BankAccountPatch,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Частично обновить банковский счет"""
+    version = account_patch.version
+    if if_match:
+        current = await bank_account_crud.get_version(db, id=account_id)
+        if current:
+            check_if_match(if_match, make_etag(*current))
+            version = version or current[1]
     try:
-        return bank_account_crud.update(db=db, db_obj=account, obj_in=account_update)
+        account = await bank_account_crud.update(db=db, id=account_id, obj_in=account_patch, version=version)
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    if not account:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Банковский счет не найден"
+        )
+    response.headers["ETag"] = make_etag(*bank_account_crud.row_version(account))
+    return account
 
 @router.delete("/{account_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_bank_account(account_id: int, db: Session = Depends(get_db)):
+async def delete_bank_account(
+    account_id: int,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """Удалить банковский счет"""
-    account = bank_account_crud.delete(db=db, id=account_id)
+    version = None
+    if if_match:
+        current = await bank_account_crud.get_version(db, id=account_id)
+        if current:
+            check_if_match(if_match, make_etag(*current))
+            version = current[1]
+    try:
+        account = await bank_account_crud.delete(db=db, id=account_id, version=version)
+    except VersionConflict:
+        raise precondition_failed()
     if not account:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
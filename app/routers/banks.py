@@ -1,65 +1,269 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from xml.etree.ElementTree import ParseError
+from typing import List, Literal, Optional
+from ..config import settings
 from ..database import get_db
-from ..schemas.bank import BankCreate, BankUpdate, BankResponse
+from ..idempotency import IdempotentRoute, idempotent
+from ..serialization import fast_response, sparse_response
+from ..etag import check_if_match, etag_matches, make_etag, not_modified, precondition_failed
+from ..schemas.pagination import Page
+from ..schemas.batch import Batch, BatchRequest, BATCH_GET_MAX_IDS
+from ..schemas.fields import parse_fields, sparse_model
+from ..schemas.bank import (
+    BankBrief, BankCreate, BankPatch, BankUpdate, BankResponse, BankSummary, DirectoryImportResult, check_correspondent_account
+)
+from ..ed807 import CHANGES_CLOSE_MISSING_ERROR, ED807Parser
 from ..crud.bank import bank_crud
+from ..crud.versioning import VersionConflict
 
-router = APIRouter(prefix="/banks", tags=["banks"])
+router = APIRouter(prefix="/banks", tags=["banks"], route_class=IdempotentRoute)
 
 @router.post("/", response_model=BankResponse, status_code=status.HTTP_201_CREATED)
-def create_bank(bank: BankCreate, db: Session = Depends(get_db)):
+@idempotent
+async def create_bank(bank: BankCreate, db: AsyncSession = Depends(get_db)):
     """Создать новый банк"""
     # Проверяем уникальность БИК
-    existing_bank = bank_crud.get_by_bik(db, bik=bank.bik)
+    existing_bank = await bank_crud.get_by_bik(db, bik=bank.bik)
     if existing_bank:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Банк с таким БИК уже существует"
         )
-    return bank_crud.create(db=db, obj_in=bank)
+    return await bank_crud.create(db=db, obj_in=bank)
 
-@router.get("/", response_model=List[BankResponse])
-def get_banks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.get("/", response_model=Page[BankSummary])
+async def get_banks(
+    skip: int = Query(0, ge=0, description="Смещение (устаревший способ, используйте cursor)"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    sort: Literal["id", "name"] = Query("id", description="Сортировка: по id или по названию"),
+    include_accounts: bool = Query(False, description="Добавить первые счета каждой записи"),
+    accounts_limit: int = Query(10, ge=1, le=100, description="Сколько счетов включать на запись"),
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,name"),
+    db: AsyncSession = Depends(get_db)
+):
     """Получить список банков"""
-    return bank_crud.get_multi(db=db, skip=skip, limit=limit)
+    try:
+        selection = parse_fields(BankSummary, fields)
+        items, next_cursor = await bank_crud.get_multi(
+            db=db, skip=skip, limit=limit, cursor=cursor, sort=sort,
+            accounts_limit=accounts_limit if include_accounts else 0, as_rows=settings.fast_responses,
+            selection=selection
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    content = {"items": items, "next_cursor": next_cursor}
+    if selection is not None:
+        return sparse_response(Page[sparse_model(selection)], content, as_rows=settings.fast_responses)
+    return fast_response(content)
+
+@router.get("/search", response_model=Page[BankBrief])
+async def search_banks(
+    q: str = Query(..., min_length=1, max_length=255, description="Часть названия или начало BIK"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Поиск банков по названию и BIK"""
+    try:
+        items, next_cursor = await bank_crud.search(db=db, q=q.strip(), limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/batch", response_model=Batch[BankSummary])
+async def get_banks_batch(
+    ids: List[int] = Query(..., min_length=1, max_length=BATCH_GET_MAX_IDS, description="Идентификаторы: ?ids=1&ids=2"),
+    include_accounts: bool = Query(False, description="Добавить первые счета каждой записи"),
+    accounts_limit: int = Query(10, ge=1, le=100, description="Сколько счетов включать на запись"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить несколько банков по списку ID"""
+    items, missing = await bank_crud.get_many(db, ids, accounts_limit=accounts_limit if include_accounts else 0)
+    return fast_response({"items": items, "missing": missing})
+
+@router.post("/import", response_model=DirectoryImportResult)
+async def import_bik_directory(
+    request: Request,
+    close_missing: bool = Query(
+        False, description="Закрыть банки, которых нет в файле (только для полного справочника InfoTypeCode=FIRR)"
+    ),
+    dry_run: bool = Query(False, description="Только посчитать изменения"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Синхронизировать банки со справочником БИК (ED807, XML в теле запроса)"""
+    parser = ED807Parser()
+    entries = []
+    try:
+        async for chunk in request.stream():
+            entries.extend(parser.feed(chunk))
+        entries.extend(parser.close())
+    except ParseError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Некорректный XML справочника: {e}"
+        )
+    if not entries:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="В файле нет записей справочника БИК"
+        )
+    if close_missing and parser.is_changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=CHANGES_CLOSE_MISSING_ERROR
+        )
+    counts = await bank_crud.sync_directory(db, entries, close_missing=close_missing, dry_run=dry_run)
+    return {"total": len(entries) + parser.skipped, "skipped": parser.skipped, "dry_run": dry_run, **counts}
+
+@router.post("/batch", response_model=Batch[BankSummary])
+async def post_banks_batch(
+    batch: BatchRequest,
+    include_accounts: bool = Query(False, description="Добавить первые счета каждой записи"),
+    accounts_limit: int = Query(10, ge=1, le=100, description="Сколько счетов включать на запись"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить несколько банков по списку ID из тела запроса"""
+    items, missing = await bank_crud.get_many(db, batch.ids, accounts_limit=accounts_limit if include_accounts else 0)
+    return fast_response({"items": items, "missing": missing})
 
 @router.get("/{bank_id}", response_model=BankResponse)
-def get_bank(bank_id: int, db: Session = Depends(get_db)):
+async def get_bank(
+    bank_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """Получить банк по ID"""
-    bank = bank_crud.get(db=db, id=bank_id)
+    # Версия проверяется легким запросом, без загрузки счетов
+    if if_none_match:
+        version = await bank_crud.get_version(db, id=bank_id)
+        if version and etag_matches(if_none_match, make_etag(*version)):
+            return not_modified(make_etag(*version))
+    
+    bank = await bank_crud.get(db=db, id=bank_id)
     if not bank:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Банк не найден"
         )
+    response.headers["ETag"] = make_etag(*bank_crud.version(bank))
     return bank
 
 @router.put("/{bank_id}", response_model=BankResponse)
-def update_bank(bank_id: int, bank_update: BankUpdate, db: Session = Depends(get_db)):
+@idempotent
+async def update_bank(
+    bank_id: int,
+    bank_update: BankUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """Обновить банк"""
-    bank = bank_crud.get(db=db, id=bank_id)
+    bank = await bank_crud.get(db=db, id=bank_id)
     if not bank:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Банк не найден"
         )
+    check_if_match(if_match, make_etag(*bank_crud.version(bank)))
     
     # Проверяем уникальность БИК при обновлении
     if bank_update.bik and bank_update.bik != bank.bik:
-        existing_bank = bank_crud.get_by_bik(db, bik=bank_update.bik)
+        existing_bank = await bank_crud.get_by_bik(db, bik=bank_update.bik)
         if existing_bank:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Банк с таким БИК уже существует"
             )
     
-    return bank_crud.update(db=db, db_obj=bank, obj_in=bank_update)
+    # Ключ корреспондентского счета - по итоговой паре, если меняется одно из полей
+    if bank_update.bik or bank_update.correspondent_account:
+        try:
+            check_correspondent_account(
+                bank_update.bik or bank.bik, bank_update.correspondent_account or bank.correspondent_account
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
+    try:
+        bank = await bank_crud.update(
+            db=db, db_obj=bank, obj_in=bank_update, version=bank.version if if_match else None
+        )
+    except VersionConflict:
+        raise precondition_failed()
+    if not bank:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Банк не найден"
+        )
+    response.headers["ETag"] = make_etag(*bank_crud.version(bank))
+    return bank
+
+@router.patch("/{bank_id}", response_model=BankBrief)
+@idempotent
+async def patch_bank(
+    bank_id: int,
+    bank_patch: BankPatch,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Частично обновить банк (без загрузки счетов)"""
+    version = bank_patch.version
+    if if_match:
+        current = await bank_crud.get_version(db, id=bank_id)
+        if current:
+            check_if_match(if_match, make_etag(*current))
+            version = version or current[1]
+    try:
+        result = await bank_crud.patch(db=db, id=bank_id, obj_in=bank_patch, version=version)
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Банк не найден"
+        )
+    bank, etag_version = result
+    response.headers["ETag"] = make_etag(*etag_version)
+    return bank
 
 @router.delete("/{bank_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_bank(bank_id: int, db: Session = Depends(get_db)):
+async def delete_bank(
+    bank_id: int,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """Удалить банк"""
-    bank = bank_crud.delete(db=db, id=bank_id)
+    version = None
+    if if_match:
+        current = await bank_crud.get_version(db, id=bank_id)
+        if current:
+            check_if_match(if_match, make_etag(*current))
+            version = current[1]
+    try:
+        bank = await bank_crud.delete(db=db, id=bank_id, version=version)
+    except VersionConflict:
+        raise precondition_failed()
     if not bank:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,65 +1,219 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from ..config import settings
 from ..database import get_db
-from ..schemas.company import CompanyCreate, CompanyUpdate, CompanyResponse
+from ..idempotency import IdempotentRoute, idempotent
+from ..serialization import fast_response, sparse_response
+from ..etag import check_if_match, etag_matches, make_etag, not_modified, precondition_failed
+from ..schemas.pagination import Page
+from ..schemas.batch import Batch, BatchRequest, BATCH_GET_MAX_IDS
+from ..schemas.fields import parse_fields, sparse_model
+from ..schemas.company import CompanyBrief, CompanyCreate, CompanyPatch, CompanyUpdate, CompanyResponse, CompanySummary
 from ..crud.company import company_crud
+from ..crud.versioning import VersionConflict
 
-router = APIRouter(prefix="/companies", tags=["companies"])
+router = APIRouter(prefix="/companies", tags=["companies"], route_class=IdempotentRoute)
 
 @router.post("/", response_model=CompanyResponse, status_code=status.HTTP_201_CREATED)
-def create_company(company: CompanyCreate, db: Session = Depends(get_db)):
+@idempotent
+async def create_company(company: CompanyCreate, db: AsyncSession = Depends(get_db)):
     """Создать новую компанию"""
     # Проверяем уникальность ИНН
-    existing_company = company_crud.get_by_inn(db, inn=company.inn)
+    existing_company = await company_crud.get_by_inn(db, inn=company.inn)
     if existing_company:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Компания с таким ИНН уже существует"
         )
-    return company_crud.create(db=db, obj_in=company)
+    return await company_crud.create(db=db, obj_in=company)
 
-@router.get("/", response_model=List[CompanyResponse])
-def get_companies(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.get("/", response_model=Page[CompanySummary])
+async def get_companies(
+    skip: int = Query(0, ge=0, description="Смещение (устаревший способ, используйте cursor)"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    sort: Literal["id", "name"] = Query("id", description="Сортировка: по id или по названию"),
+    include_accounts: bool = Query(False, description="Добавить первые счета каждой записи"),
+    accounts_limit: int = Query(10, ge=1, le=100, description="Сколько счетов включать на запись"),
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,name"),
+    db: AsyncSession = Depends(get_db)
+):
     """Получить список компаний"""
-    return company_crud.get_multi(db=db, skip=skip, limit=limit)
+    try:
+        selection = parse_fields(CompanySummary, fields)
+        items, next_cursor = await company_crud.get_multi(
+            db=db, skip=skip, limit=limit, cursor=cursor, sort=sort,
+            accounts_limit=accounts_limit if include_accounts else 0, as_rows=settings.fast_responses,
+            selection=selection
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    content = {"items": items, "next_cursor": next_cursor}
+    if selection is not None:
+        return sparse_response(Page[sparse_model(selection)], content, as_rows=settings.fast_responses)
+    return fast_response(content)
+
+@router.get("/search", response_model=Page[CompanyBrief])
+async def search_companies(
+    q: str = Query(..., min_length=1, max_length=255, description="Часть названия или начало INN"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Поиск компаний по названию и INN"""
+    try:
+        items, next_cursor = await company_crud.search(db=db, q=q.strip(), limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/batch", response_model=Batch[CompanySummary])
+async def get_companies_batch(
+    ids: List[int] = Query(..., min_length=1, max_length=BATCH_GET_MAX_IDS, description="Идентификаторы: ?ids=1&ids=2"),
+    include_accounts: bool = Query(False, description="Добавить первые счета каждой записи"),
+    accounts_limit: int = Query(10, ge=1, le=100, description="Сколько счетов включать на запись"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить несколько компаний по списку ID"""
+    items, missing = await company_crud.get_many(db, ids, accounts_limit=accounts_limit if include_accounts else 0)
+    return fast_response({"items": items, "missing": missing})
+
+@router.post("/batch", response_model=Batch[CompanySummary])
+async def post_companies_batch(
+    batch: BatchRequest,
+    include_accounts: bool = Query(False, description="Добавить первые счета каждой записи"),
+    accounts_limit: int = Query(10, ge=1, le=100, description="Сколько счетов включать на запись"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить несколько компаний по списку ID из тела запроса"""
+    items, missing = await company_crud.get_many(db, batch.ids, accounts_limit=accounts_limit if include_accounts else 0)
+    return fast_response({"items": items, "missing": missing})
 
 @router.get("/{company_id}", response_model=CompanyResponse)
-def get_company(company_id: int, db: Session = Depends(get_db)):
+async def get_company(
+    company_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """Получить компанию по ID"""
-    company = company_crud.get(db=db, id=company_id)
+    # Версия проверяется легким запросом, без загрузки счетов
+    if if_none_match:
+        version = await company_crud.get_version(db, id=company_id)
+        if version and etag_matches(if_none_match, make_etag(*version)):
+            return not_modified(make_etag(*version))
+    
+    company = await company_crud.get(db=db, id=company_id)
     if not company:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Компания не найдена"
         )
+    response.headers["ETag"] = make_etag(*company_crud.version(company))
     return company
 
 @router.put("/{company_id}", response_model=CompanyResponse)
-def update_company(company_id: int, company_update: CompanyUpdate, db: Session = Depends(get_db)):
+@idempotent
+async def update_company(
+    company_id: int,
+    company_update: CompanyUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """Обновить компанию"""
-    company = company_crud.get(db=db, id=company_id)
+    company = await company_crud.get(db=db, id=company_id)
     if not company:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Компания не найдена"
         )
+    check_if_match(if_match, make_etag(*company_crud.version(company)))
     
     # Проверяем уникальность ИНН при обновлении
     if company_update.inn and company_update.inn != company.inn:
-        existing_company = company_crud.get_by_inn(db, inn=company_update.inn)
+        existing_company = await company_crud.get_by_inn(db, inn=company_update.inn)
         if existing_company:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Компания с таким ИНН уже существует"
             )
     
-    return company_crud.update(db=db, db_obj=company, obj_in=company_update)
+    try:
+        company = await company_crud.update(
+            db=db, db_obj=company, obj_in=company_update, version=company.version if if_match else None
+        )
+    except VersionConflict:
+        raise precondition_failed()
+    if not company:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Компания не найдена"
+        )
+    response.headers["ETag"] = make_etag(*company_crud.version(company))
+    return company
+
+@router.patch("/{company_id}", response_model=CompanyBrief)
+@idempotent
+async def patch_company(
+    company_id: int,
+    company_patch: CompanyPatch,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Частично обновить компанию (без загрузки счетов)"""
+    version = company_patch.version
+    if if_match:
+        current = await company_crud.get_version(db, id=company_id)
+        if current:
+            check_if_match(if_match, make_etag(*current))
+            version = version or current[1]
+    try:
+        result = await company_crud.patch(db=db, id=company_id, obj_in=company_patch, version=version)
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Компания не найдена"
+        )
+    company, etag_version = result
+    response.headers["ETag"] = make_etag(*etag_version)
+    return company
 
 @router.delete("/{company_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_company(company_id: int, db: Session = Depends(get_db)):
+async def delete_company(
+    company_id: int,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """Удалить компанию"""
-    company = company_crud.delete(db=db, id=company_id)
+    version = None
+    if if_match:
+        current = await company_crud.get_version(db, id=company_id)
+        if current:
+            check_if_match(if_match, make_etag(*current))
+            version = current[1]
+    try:
+        company = await company_crud.delete(db=db, id=company_id, version=version)
+    except VersionConflict:
+        raise precondition_failed()
     if not company:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal
+from ..database import get_db
+from ..schemas.stats import AccountStatsGroup
+from ..crud.stats import account_stats_crud
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+@router.get("/accounts", response_model=List[AccountStatsGroup], response_model_exclude_none=True)
+async def get_account_stats(
+    group_by: List[Literal["bank_id", "company_id", "currency", "is_active"]] = Query(
+        [], description="Поля группировки; без них - общее число счетов"
+    ),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Число счетов по банкам, компаниям, валютам и активности"""
+    try:
+        return await account_stats_crud.get(db=db, group_by=group_by, skip=skip, limit=limit)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
@@ -0,0 +1,14 @@
+from anyio import to_thread
+from fastapi import APIRouter
+from ..requisites import check_requisites
+from ..serialization import fast_response
+from ..schemas.requisites import RequisitesCheckRequest, RequisitesCheckResult
+
+router = APIRouter(prefix="/validate", tags=["validation"])
+
+@router.post("/requisites", response_model=RequisitesCheckResult)
+async def validate_requisites(body: RequisitesCheckRequest):
+    """Проверить контрольные суммы ИНН и ключи счетов по БИК"""
+    # Проверка занимает процессор - выполняется в потоке, не блокируя цикл событий
+    result = await to_thread.run_sync(check_requisites, body.inns, body.accounts, body.biks)
+    return fast_response(result)
@@ -1,3 +1,6 @@
-from .company import CompanyCreate, CompanyUpdate, CompanyResponse
-from .bank import BankCreate, BankUpdate, BankResponse
-from .bank_account import BankAccountCreate, BankAccountUpdate, BankAccountResponse
+from .company import CompanyCreate, CompanyUpdate, CompanyPatch, CompanyResponse, CompanyBrief, CompanySummary
+from .bank import BankCreate, BankUpdate, BankPatch, BankResponse, BankBrief, BankSummary, DirectoryImportResult
+from .bank_account import BankAccountCreate, BankAccountUpdate, BankAccountPatch, BankAccountResponse, BankAccountBrief, BulkImportResult, BulkStatusUpdate, BulkStatusResult
+from .stats import AccountStatsGroup
+from .batch import Batch, BatchRequest
+from .requisites import RequisitesCheckRequest, RequisitesCheckResult
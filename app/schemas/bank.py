@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import AliasChoices, BaseModel, Field, field_validator, model_validator
 from typing import Optional, List
 from datetime import datetime
 import re
+from ..requisites import correspondent_key_prefix, is_valid_account
 
 
 class BankBase(BaseModel):
@@ -22,8 +23,18 @@ class BankBase(BaseModel):
             raise ValueError('Корреспондентский счет должен содержать 20 цифр')
         return v
 
+def check_correspondent_account(bik: Optional[str], correspondent_account: Optional[str]) -> None:
+    """Контрольный ключ корреспондентского счета по БИК"""
+    if bik and correspondent_account and not is_valid_account(correspondent_account, correspondent_key_prefix(bik)):
+        raise ValueError('Корреспондентский счет не соответствует БИК (неверный контрольный ключ)')
+
 class BankCreate(BankBase):
-    pass
+    # Ключ проверяется только во входящих данных: ответы строятся
+    # и из записей, созданных до появления проверки
+    @model_validator(mode='after')
+    def validate_correspondent_key(self):
+        check_correspondent_account(self.bik, self.correspondent_account)
+        return self
 
 class BankUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=255)
@@ -42,12 +53,43 @@ class BankUpdate(BaseModel):
         if v and not re.match(r'^\d{20}$', v):
             raise ValueError('Корреспондентский счет должен содержать 20 цифр')
         return v
+    
+    @model_validator(mode='after')
+    def validate_correspondent_key(self):
+        # Если меняется только одно из полей, ключ проверяется в PUT и PATCH /banks/{id}
+        check_correspondent_account(self.bik, self.correspondent_account)
+        return self
+
+class BankPatch(BankUpdate):
+    """Частичное обновление (PATCH): только переданные поля и ожидаемая версия"""
+    version: Optional[int] = Field(None, ge=1, description="Версия записи из ответа; если запись уже изменилась - 409. Без version и If-Match изменение безусловное")
 
-class BankResponse(BankBase):
+class BankBrief(BankBase):
+    """Банк без вложенных счетов"""
     id: int
     created_at: datetime
     updated_at: Optional[datetime]
-    bank_accounts: List['BankAccountResponse'] = []
+    version: int
+    closed_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
+
+class BankResponse(BankBrief):
+    bank_accounts: List['BankAccountBrief'] = []
+
+class BankSummary(BankBrief):
+    """Банк в списке: количество счетов и, по запросу, первые счета"""
+    accounts_count: int = 0
+    bank_accounts: Optional[List['BankAccountBrief']] = Field(
+        None, validation_alias=AliasChoices("accounts_preview", "bank_accounts")
+    )
+
+class DirectoryImportResult(BaseModel):
+    total: int = Field(..., description="Записей в справочнике")
+    skipped: int = Field(0, description="Записей без БИК или наименования")
+    created: int
+    updated: int
+    closed: int
+    unchanged: int
+    dry_run: bool = False
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Optional
 from datetime import datetime
 import re
 
@@ -32,19 +32,55 @@ class BankAccountUpdate(BaseModel):
             raise ValueError('Номер счета должен содержать 20 цифр')
         return v
 
-class BankAccountResponse(BankAccountBase):
+class BankAccountPatch(BankAccountUpdate):
+    """Частичное обновление (PATCH): только переданные поля и ожидаемая версия"""
+    version: Optional[int] = Field(None, ge=1, description="Версия записи из ответа; если запись уже изменилась - 409. Без version и If-Match изменение безусловное")
+
+class BankAccountBrief(BankAccountBase):
+    """Счет без вложенных компании и банка"""
     id: int
     created_at: datetime
     updated_at: Optional[datetime]
-    company: Optional['CompanyResponse'] = None
-    bank: Optional['BankResponse'] = None
+    version: int
     
     class Config:
         from_attributes = True
 
+class BankAccountResponse(BankAccountBrief):
+    company: Optional['CompanyBrief'] = None
+    bank: Optional['BankBrief'] = None
+
+class BulkImportError(BaseModel):
+    line: int = Field(..., description="Номер строки в файле")
+    error: str
+
+class BulkImportResult(BaseModel):
+    total: int = Field(..., description="Обработано строк с данными")
+    created: int
+    failed: int
+    errors: List[BulkImportError] = []
+
+class BulkStatusUpdate(BaseModel):
+    """Деактивация или реактивация счетов по фильтру"""
+    is_active: str = Field(..., pattern="^[YN]$", description="Новый статус: Y - активировать, N - деактивировать")
+    bank_id: Optional[int] = Field(None, description="Только счета банка")
+    company_id: Optional[int] = Field(None, description="Только счета компании")
+    currency: Optional[str] = Field(None, min_length=3, max_length=3, description="Только счета в валюте")
+    
+    @model_validator(mode='after')
+    def validate_filter(self):
+        if self.bank_id is None and self.company_id is None and self.currency is None:
+            raise ValueError('Укажите хотя бы один фильтр: bank_id, company_id или currency')
+        return self
+
+class BulkStatusResult(BaseModel):
+    updated: int = Field(..., description="Счетов, у которых изменился статус")
+
 # Обновляем forward references
-from .company import CompanyResponse
-from .bank import BankResponse
+from .company import CompanyBrief, CompanyResponse, CompanySummary
+from .bank import BankBrief, BankResponse, BankSummary
 BankAccountResponse.model_rebuild()
 CompanyResponse.model_rebuild()
-BankResponse.model_rebuild()
\ No newline at end of file
+BankResponse.model_rebuild()
+CompanySummary.model_rebuild()
+BankSummary.model_rebuild()
\ No newline at end of file
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+from typing import Generic, List, TypeVar
+
+T = TypeVar("T")
+
+# Предел id в одном запросе: в URL (GET) и в теле (POST)
+BATCH_GET_MAX_IDS = 1000
+BATCH_POST_MAX_IDS = 10000
+
+class BatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BATCH_POST_MAX_IDS, description="Идентификаторы записей")
+
+class Batch(BaseModel, Generic[T]):
+    items: List[T] = Field(..., description="Найденные записи в порядке запроса")
+    missing: List[int] = Field([], description="Идентификаторы, для которых записей нет")
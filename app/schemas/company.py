@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import AliasChoices, BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 import re
+from ..requisites import is_valid_inn
 
 class CompanyBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=255, description="Название компании")
@@ -15,7 +16,13 @@ class CompanyBase(BaseModel):
         return v
 
 class CompanyCreate(CompanyBase):
-    pass
+    # Контрольные суммы проверяются только во входящих данных: ответы строятся
+    # и из записей, созданных до появления проверки
+    @field_validator('inn')
+    def validate_inn_checksum(cls, v):
+        if not is_valid_inn(v):
+            raise ValueError('Неверное контрольное число ИНН')
+        return v
 
 class CompanyUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=255)
@@ -26,13 +33,30 @@ class CompanyUpdate(BaseModel):
     def validate_inn(cls, v):
         if v and not re.match(r'^\d{10}$|^\d{12}$', v):
             raise ValueError('ИНН должен содержать 10 или 12 цифр')
+        if v and not is_valid_inn(v):
+            raise ValueError('Неверное контрольное число ИНН')
         return v
 
-class CompanyResponse(CompanyBase):
+class CompanyPatch(CompanyUpdate):
+    """Частичное обновление (PATCH): только переданные поля и ожидаемая версия"""
+    version: Optional[int] = Field(None, ge=1, description="Версия записи из ответа; если запись уже изменилась - 409. Без version и If-Match изменение безусловное")
+
+class CompanyBrief(CompanyBase):
+    """Компания без вложенных счетов"""
     id: int
     created_at: datetime
     updated_at: Optional[datetime]
-    bank_accounts: List['BankAccountResponse'] = []
+    version: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CompanyResponse(CompanyBrief):
+    bank_accounts: List['BankAccountBrief'] = []
+
+class CompanySummary(CompanyBrief):
+    """Компания в списке: количество счетов и, по запросу, первые счета"""
+    accounts_count: int = 0
+    bank_accounts: Optional[List['BankAccountBrief']] = Field(
+        None, validation_alias=AliasChoices("accounts_preview", "bank_accounts")
+    )
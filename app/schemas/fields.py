@@ -0,0 +1,87 @@
+from copy import copy
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, create_model
+from typing import Dict, NamedTuple, Optional, Tuple, Type
+
+class FieldSelection(NamedTuple):
+    """Выбранные поля ответа (?fields=, ?include=).
+
+    fields - поля записи в порядке модели, id всегда первым; include - вложенные
+    записи: (имя связи, модель, поля).
+    """
+    model: Type[BaseModel]
+    fields: Tuple[str, ...]
+    include: Tuple[Tuple[str, Type[BaseModel], Tuple[str, ...]], ...] = ()
+
+    @property
+    def relations(self) -> Dict[str, Tuple[str, ...]]:
+        return {name: fields for name, _, fields in self.include}
+
+    @property
+    def key(self) -> str:
+        """Набор полей строкой - для ETag представления"""
+        nested = ";".join(f"{name}:{','.join(fields)}" for name, _, fields in self.include)
+        return f"{','.join(self.fields)};{nested}"
+
+def _split(value: Optional[str]) -> list:
+    if not value:
+        return []
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+def _ordered(model: Type[BaseModel], names) -> Tuple[str, ...]:
+    names = set(names)
+    return ("id", *(name for name in model.model_fields if name in names and name != "id"))
+
+def parse_fields(
+    model: Type[BaseModel], fields: Optional[str], include: Optional[str] = None,
+    relations: Dict[str, Type[BaseModel]] = {}
+) -> Optional[FieldSelection]:
+    """Разбирает ?fields=id,account_number,company.name и ?include=company,bank.
+
+    None, если оба параметра не заданы - отдается полное представление. Без fields
+    возвращаются все поля записи; без include вложенные записи попадают в ответ,
+    только если их поля перечислены в fields через точку. ValueError - неизвестное
+    поле или связь.
+    """
+    if fields is None and include is None:
+        return None
+    own = [name for name in model.model_fields if name not in relations]
+    columns = set(own) if fields is None else {"id"}
+    nested: Dict[str, set] = {}
+    for name in _split(include):
+        if name not in relations:
+            raise ValueError(f"Неизвестная связь: {name}")
+        nested.setdefault(name, set())
+    for name in _split(fields):
+        relation, _, field = name.partition(".")
+        if field:
+            if relation not in relations or field not in relations[relation].model_fields:
+                raise ValueError(f"Неизвестное поле: {name}")
+            nested.setdefault(relation, set()).add(field)
+        elif name in relations:
+            nested.setdefault(name, set())
+        elif name in own:
+            columns.add(name)
+        else:
+            raise ValueError(f"Неизвестное поле: {name}")
+    return FieldSelection(
+        model,
+        _ordered(model, columns),
+        tuple(
+            (name, related, _ordered(related, nested[name] or related.model_fields))
+            for name, related in relations.items() if name in nested
+        ),
+    )
+
+@lru_cache(maxsize=256)
+def sparse_model(selection: FieldSelection) -> Type[BaseModel]:
+    """Модель ответа только с выбранными полями; поля копируются из исходной модели"""
+    definitions = {}
+    for name in selection.fields:
+        info = selection.model.model_fields[name]
+        definitions[name] = (info.annotation, copy(info))
+    for name, related, fields in selection.include:
+        definitions[name] = (Optional[sparse_model(FieldSelection(related, fields))], None)
+    return create_model(
+        f"{selection.model.__name__}Fields", __config__=ConfigDict(from_attributes=True), **definitions
+    )
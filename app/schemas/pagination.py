@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы; null на последней странице")
@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List
+
+# Строк одного вида в запросе POST /validate/requisites
+REQUISITES_MAX_ITEMS = 1_000_000
+
+class RequisitesCheckRequest(BaseModel):
+    """Реквизиты для проверки. Пары счет + БИК передаются двумя списками одинаковой
+    длины (accounts[i] и biks[i]): плоские списки строк разбираются быстрее, чем
+    сотни тысяч вложенных массивов"""
+    inns: List[str] = Field([], max_length=REQUISITES_MAX_ITEMS, description="ИНН")
+    accounts: List[str] = Field([], max_length=REQUISITES_MAX_ITEMS, description="Номера счетов")
+    biks: List[str] = Field([], max_length=REQUISITES_MAX_ITEMS, description="БИК банка для каждого счета")
+    
+    @model_validator(mode='after')
+    def validate_pairs(self):
+        if len(self.accounts) != len(self.biks):
+            raise ValueError('Списки accounts и biks должны быть одинаковой длины')
+        return self
+
+class RequisiteError(BaseModel):
+    index: int = Field(..., description="Позиция в списке запроса (с нуля)")
+    error: str
+
+class RequisitesCheckResult(BaseModel):
+    inns_checked: int
+    accounts_checked: int
+    inn_errors: List[RequisiteError] = []
+    account_errors: List[RequisiteError] = []
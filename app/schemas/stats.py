@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class AccountStatsGroup(BaseModel):
+    """Число счетов в группе; заполнены только поля группировки"""
+    bank_id: Optional[int] = None
+    company_id: Optional[int] = None
+    currency: Optional[str] = None
+    is_active: Optional[str] = None
+    count: int = Field(..., description="Число счетов")
@@ -0,0 +1,39 @@
+import orjson
+from functools import lru_cache
+from fastapi import Response
+from pydantic import TypeAdapter
+from typing import Any, Dict, Optional
+from .config import settings
+
+class FastJSONResponse(Response):
+    """JSON через orjson; даты в том же виде, что у pydantic (UTC как Z)"""
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+def fast_response(content: Any) -> Any:
+    """Быстрый путь для списков (FAST_RESPONSES): готовые словари из CRUD (as_rows=True)
+    кодируются orjson без проверки response_model; иначе ответ проверяет FastAPI"""
+    if settings.fast_responses:
+        return FastJSONResponse(content)
+    return content
+
+@lru_cache(maxsize=256)
+def _adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+def sparse_response(
+    response_type: Any, content: Any, as_rows: bool = False, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Ответ с выборочными полями (?fields=): response_model маршрута описывает полное
+    представление, поэтому содержимое проверяется моделью из sparse_model, а словари
+    быстрого пути (as_rows) уже содержат только нужные ключи и кодируются сразу"""
+    if as_rows:
+        return FastJSONResponse(content, headers=headers)
+    adapter = _adapter(response_type)
+    return Response(
+        adapter.dump_json(adapter.validate_python(content, from_attributes=True)),
+        media_type="application/json",
+        headers=headers,
+    )
@@ -0,0 +1,67 @@
+"""Запуск в продакшене: несколько воркеров uvicorn под общим супервизором.
+
+    python -m app.server --workers 4 --port 8000
+
+Для разработки с перезагрузкой по изменениям используйте python run.py.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+from .config import settings
+from .pool import worker_pool_size
+
+logger = logging.getLogger("uvicorn.error")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.server", description="Продакшен-сервер Banking API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.web_workers or os.cpu_count() or 1,
+                        help="Процессов-воркеров; по умолчанию WEB_WORKERS или число ядер")
+    parser.add_argument("--max-requests", type=int, default=settings.worker_max_requests,
+                        help="Перезапуск воркера после стольких запросов; 0 - без перезапуска")
+    parser.add_argument("--max-requests-jitter", type=int, default=settings.worker_max_requests_jitter)
+    parser.add_argument("--graceful-timeout", type=int, default=settings.graceful_timeout,
+                        help="Секунд на завершение начатых запросов после SIGTERM")
+    args = parser.parse_args(argv)
+
+    try:
+        pool_size, max_overflow = worker_pool_size(
+            settings.db_max_connections, args.workers, settings.db_pool_size, settings.db_max_overflow
+        )
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    # Воркеры читают настройки из окружения при импорте приложения
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+
+    config = uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        # uvloop и httptools, если установлены (uvicorn[standard])
+        loop="auto",
+        http="auto",
+        limit_max_requests=args.max_requests or None,
+        limit_max_requests_jitter=args.max_requests_jitter if args.max_requests else 0,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    logger.info(
+        "Воркеров: %d, пул БД на воркер: %d + %d (всего до %d соединений), loop: %s, http: %s",
+        args.workers, pool_size, max_overflow, args.workers * (pool_size + max_overflow),
+        "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "httptools" if importlib.util.find_spec("httptools") else "h11",
+    )
+    # Супервизор и при одном воркере: он перезапускает воркеры, завершившиеся
+    # по limit_max_requests, а по SIGTERM дожидается их мягкой остановки
+    Multiprocess(config, sockets=[config.bind_socket()]).run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from pathlib import Path
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from typing import Dict, Optional, Set
+from . import IMPORT_STARTED
+from .config import settings
+from .crud.cache import bank_cache, company_cache
+from .database import AsyncSessionLocal, Base, async_engine
+from .metrics import STARTUP_DURATION
+
+logger = logging.getLogger("app.startup")
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+@lru_cache(maxsize=1)
+def alembic_heads() -> Set[str]:
+    """Последние ревизии миграций в каталоге alembic (читаются один раз)"""
+    # alembic импортируется только для проверки, а не при импорте приложения
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+async def database_revisions(engine: AsyncEngine) -> Set[str]:
+    """Ревизии, отмеченные в таблице alembic_version"""
+    from alembic.runtime.migration import MigrationContext
+    
+    async with engine.connect() as conn:
+        return set(await conn.run_sync(lambda sync_conn: MigrationContext.configure(sync_conn).get_current_heads()))
+
+async def check_schema(engine: AsyncEngine) -> None:
+    """RuntimeError, если схема БД не на последней миграции"""
+    heads = alembic_heads()
+    current = await database_revisions(engine)
+    if current != heads:
+        raise RuntimeError(
+            f"Схема БД не на последней миграции ({', '.join(sorted(current)) or 'нет ревизии'}, "
+            f"нужна {', '.join(sorted(heads))}): выполните alembic upgrade head"
+        )
+
+async def create_schema(engine: AsyncEngine) -> None:
+    """Создание таблиц по моделям без миграций - только для разработки"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+async def warm_pool(engine: AsyncEngine, size: int) -> None:
+    """Открывает size соединений сразу, чтобы первые запросы не ждали подключения"""
+    connections = await asyncio.gather(*(engine.connect() for _ in range(size)))
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in connections))
+    finally:
+        for conn in connections:
+            await conn.close()
+
+async def preload_reference_cache() -> None:
+    async with AsyncSessionLocal() as db:
+        await bank_cache.preload(db)
+        await company_cache.preload(db)
+
+class Startup:
+    """Инициализация приложения в lifespan и признак готовности.
+
+    Импорт приложения не обращается к БД. Шаги с БД выполняются при старте;
+    если БД недоступна или схема не на последней миграции, процесс все равно
+    принимает запросы (/health отвечает), /ready отвечает 503, а инициализация
+    повторяется в фоне. Время шагов сохраняется для отчета о холодном старте.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.steps: Dict[str, float] = {}
+        self.total: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _step(self, name: str, action) -> None:
+        start = time.perf_counter()
+        await action
+        self.steps[name] = time.perf_counter() - start
+
+    async def _initialize(self) -> None:
+        if settings.database_create_all:
+            await self._step("create_all", create_schema(async_engine))
+        else:
+            await self._step("schema_check", check_schema(async_engine))
+        await self._step("pool", warm_pool(async_engine, settings.db_pool_size))
+        if settings.reference_cache_preload:
+            await self._step("reference_cache", preload_reference_cache())
+
+    def _prebuild(self, app: FastAPI) -> None:
+        """Схемы OpenAPI (и модели ответов в них) строятся при старте, а не на первом запросе /docs"""
+        start = time.perf_counter()
+        app.openapi()
+        self.steps["openapi"] = time.perf_counter() - start
+
+    async def _try_initialize(self) -> bool:
+        try:
+            await self._initialize()
+        except Exception as e:
+            if self.error != str(e):
+                logger.warning("Приложение не готово: %s", e)
+            self.error = str(e) or type(e).__name__
+            return False
+        self.ready = True
+        self.error = None
+        self.total = time.perf_counter() - IMPORT_STARTED
+        self._report()
+        return True
+
+    async def _retry_loop(self, interval: float) -> None:
+        while not await self._try_initialize():
+            await asyncio.sleep(interval)
+
+    async def start(self, app: FastAPI) -> None:
+        self.steps["import"] = time.perf_counter() - IMPORT_STARTED
+        self._prebuild(app)
+        if not await self._try_initialize():
+            self._task = asyncio.create_task(self._retry_loop(settings.startup_retry_interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.ready = False
+
+    def _report(self) -> None:
+        for name, seconds in self.steps.items():
+            STARTUP_DURATION.labels(name).set(seconds)
+        STARTUP_DURATION.labels("total").set(self.total)
+        logger.info(
+            "Холодный старт %.0f мс: %s", self.total * 1000,
+            ", ".join(f"{name} {seconds * 1000:.0f} мс" for name, seconds in self.steps.items())
+        )
+
+    def status(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "error": self.error,
+            "startup_ms": {
+                **{name: round(seconds * 1000, 1) for name, seconds in self.steps.items()},
+                "total": round(self.total * 1000, 1) if self.total is not None else None,
+            },
+        }
+
+startup = Startup()
@@ -0,0 +1,102 @@
+import codecs
+import csv
+import io
+import json
+from datetime import date, datetime
+from pydantic import ValidationError
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+def detect_format(content_type: str) -> Optional[str]:
+    """Определяет формат файла (csv/ndjson) по Content-Type"""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in CSV_MEDIA_TYPES:
+        return "csv"
+    if media_type in NDJSON_MEDIA_TYPES:
+        return "ndjson"
+    return None
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Разбивает поток байтов на строки, не накапливая весь файл в памяти"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def iter_records(chunks: AsyncIterator[bytes], file_format: str) -> AsyncIterator[Tuple[int, Union[dict, str]]]:
+    """Читает записи CSV (с заголовком) или NDJSON.
+
+    Возвращает пары (номер строки в файле, запись); если строку не удалось
+    разобрать, вместо записи возвращается текст ошибки. Поля CSV не должны
+    содержать переводов строк.
+    """
+    header = None
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        if file_format == "ndjson":
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, "Некорректный JSON"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, "Строка должна содержать JSON-объект"
+                continue
+            yield line_no, record
+        else:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, f"Ожидалось полей: {len(header)}, получено: {len(values)}"
+                continue
+            # Пустые значения не передаем, чтобы сработали значения по умолчанию
+            yield line_no, {name: value for name, value in zip(header, values) if value != ""}
+
+def format_validation_error(exc: ValidationError) -> str:
+    """Ошибки pydantic одной строкой: 'поле: сообщение; ...'"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    )
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode_ndjson(records: List[dict]) -> str:
+    """Пакет записей в NDJSON"""
+    return "".join(
+        json.dumps(record, ensure_ascii=False, default=_json_default) + "\n" for record in records
+    )
+
+def _resolve(record: dict, path: str):
+    value = record
+    for key in path.split("."):
+        if value is None:
+            return None
+        value = value.get(key)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def encode_csv(records: List[dict], fields: List[str], header: bool = False) -> str:
+    """Пакет записей в CSV; поля вложенных объектов задаются через точку (company.name)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    writer.writerows([_resolve(record, field) for field in fields] for record in records)
+    return buffer.getvalue()
@@ -0,0 +1 @@
+"""Нагрузочные тесты Banking API: генерация данных, прогон сценариев, сравнение с эталоном"""
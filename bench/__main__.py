@@ -0,0 +1,104 @@
+"""Командная строка нагрузочных тестов.
+
+    python -m bench seed --banks 10000 --companies 1000000 --accounts 5000000
+    python -m bench run --requests 2000 --clients 32 --output results.json
+    python -m bench compare baseline.json results.json --tolerance 0.2
+    python -m bench scale --workers 1 2 4 8 --requests 5000 --clients 64
+    python -m bench requisites --count 500000
+
+База выбирается через DATABASE_URL (или --database-url) так же, как у приложения.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Нагрузочные тесты Banking API")
+    parser.add_argument("--database-url", help="Переопределить DATABASE_URL")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    seed_parser = commands.add_parser("seed", help="Заполнить БД сгенерированными данными")
+    seed_parser.add_argument("--banks", type=int, default=10000)
+    seed_parser.add_argument("--companies", type=int, default=1000000)
+    seed_parser.add_argument("--accounts", type=int, default=5000000)
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.add_argument("--reset", action="store_true", help="Удалить существующие данные")
+    
+    run_parser = commands.add_parser("run", help="Прогнать сценарии по всем эндпоинтам")
+    run_parser.add_argument("--requests", type=int, default=1000, help="Запросов на сценарий")
+    run_parser.add_argument("--clients", type=int, default=16, help="Параллельных клиентов")
+    run_parser.add_argument("--warmup", type=int, default=50, help="Запросов прогрева на сценарий чтения")
+    run_parser.add_argument("--url", help="Адрес запущенного сервера; по умолчанию приложение в процессе")
+    run_parser.add_argument("--only", nargs="*", help="Только сценарии с указанными префиксами")
+    run_parser.add_argument("--output", help="Сохранить результаты в JSON")
+    
+    scale_parser = commands.add_parser("scale", help="Сравнить пропускную способность app.server при разном числе воркеров")
+    scale_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    scale_parser.add_argument("--requests", type=int, default=2000, help="Запросов на сценарий")
+    scale_parser.add_argument("--clients", type=int, default=64, help="Параллельных клиентов")
+    scale_parser.add_argument("--warmup", type=int, default=100, help="Запросов прогрева на сценарий")
+    scale_parser.add_argument("--only", nargs="*", help="Только сценарии с указанными префиксами")
+    scale_parser.add_argument("--port", type=int, default=8765)
+    scale_parser.add_argument("--output", help="Сохранить результаты в JSON")
+    
+    requisites_parser = commands.add_parser("requisites", help="Измерить скорость проверки реквизитов")
+    requisites_parser.add_argument("--count", type=int, default=500000, help="ИНН и пар счет + БИК в запросе")
+    requisites_parser.add_argument("--repeat", type=int, default=5)
+    requisites_parser.add_argument("--output", help="Сохранить результаты в JSON")
+    
+    compare_parser = commands.add_parser("compare", help="Сравнить прогон с эталоном")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение (доля)")
+    
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    
+    # Приложение импортируется после выбора БД
+    if args.command == "seed":
+        from .datagen import seed
+        print(json.dumps(seed(args.banks, args.companies, args.accounts, seed=args.seed, reset=args.reset),
+                         ensure_ascii=False, indent=2))
+        return 0
+    
+    if args.command == "run":
+        from .load import run
+        results = asyncio.run(run(args.requests, args.clients, args.warmup, url=args.url, only=args.only))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        return 1 if any(stats["errors"] for stats in results["scenarios"].values()) else 0
+    
+    if args.command == "scale":
+        from .scale import scale
+        results = asyncio.run(scale(args.workers, args.requests, args.clients, args.warmup,
+                                    only=args.only, port=args.port))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        return 0
+    
+    if args.command == "requisites":
+        from .requisites import measure
+        results = asyncio.run(measure(args.count, args.repeat))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        return 0
+    
+    from .load import compare
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.tolerance)
+    for line in regressions:
+        print(line)
+    print("Регрессий нет" if not regressions else f"Регрессий: {len(regressions)}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
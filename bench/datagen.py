@@ -0,0 +1,146 @@
+"""Генерация большого набора данных с корректными реквизитами.
+
+Строки пишутся напрямую в таблицы пакетами: в PostgreSQL через COPY,
+в остальных СУБД через executemany. Идентификаторы задаются явно,
+поэтому набор воспроизводим при одинаковом seed.
+"""
+import csv
+import io
+import random
+import time
+from typing import Dict, Iterator, List
+from sqlalchemy import func, select, text
+from app.database import Base, engine
+from app.crud.stats import rebuild_statements
+from app.models import AccountStats, Bank, BankAccount, Company
+from app.requisites import (
+    account_with_key, correspondent_key_prefix, inn_with_checksum, settlement_key_prefix
+)
+
+SEED_BATCH_SIZE = 10000
+
+NAME_PREFIXES = ["Альфа", "Восток", "Север", "Юг", "Центр", "Прогресс", "Стандарт", "Развитие", "Капитал", "Инвест"]
+NAME_SUFFIXES = ["Строй", "Торг", "Сервис", "Логистик", "Софт", "Энерго", "Агро", "Пром", "Трейд", "Консалт"]
+CITIES = ["Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань", "Нижний Новгород", "Самара"]
+
+# Валюта и активность счетов с весами
+CURRENCIES = (["RUB"] * 18) + ["USD", "EUR"]
+ACTIVITY = (["Y"] * 19) + ["N"]
+
+def make_bik(n: int) -> str:
+    return f"04{n:07d}"
+
+def make_correspondent_account(bik: str) -> str:
+    return account_with_key(f"301018100{'0' * 8}{bik[-3:]}", correspondent_key_prefix(bik))
+
+def make_inn(n: int) -> str:
+    return inn_with_checksum(f"77{n:07d}")
+
+def make_account_number(serial: int, bik: str) -> str:
+    return account_with_key(f"407028100{serial:011d}", settlement_key_prefix(bik))
+
+def make_name(rng: random.Random, kind: str) -> str:
+    return f'{kind} "{rng.choice(NAME_PREFIXES)}{rng.choice(NAME_SUFFIXES)}"'
+
+def generate_banks(count: int, rng: random.Random) -> Iterator[Dict]:
+    for i in range(1, count + 1):
+        bik = make_bik(i)
+        yield {
+            "id": i,
+            "name": f"{make_name(rng, 'Банк')} {i}",
+            "bik": bik,
+            "correspondent_account": make_correspondent_account(bik),
+            "address": f"{rng.choice(CITIES)}, ул. Банковская, {rng.randint(1, 200)}",
+        }
+
+def generate_companies(count: int, rng: random.Random) -> Iterator[Dict]:
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "name": make_name(rng, rng.choice(["ООО", "АО", "ПАО"])),
+            "inn": make_inn(i),
+            "description": None,
+        }
+
+def generate_accounts(count: int, companies: int, banks: int, rng: random.Random) -> Iterator[Dict]:
+    for i in range(1, count + 1):
+        bank_id = rng.randint(1, banks)
+        yield {
+            "id": i,
+            "account_number": make_account_number(i, make_bik(bank_id)),
+            "company_id": rng.randint(1, companies),
+            "bank_id": bank_id,
+            "currency": rng.choice(CURRENCIES),
+            "is_active": rng.choice(ACTIVITY),
+        }
+
+def _batches(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _copy(conn, table, batch: List[Dict]) -> None:
+    """Загрузка пакета через COPY (psycopg2)"""
+    columns = list(batch[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    cursor.copy_expert(
+        f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')", buffer
+    )
+
+def _load(conn, model, rows: Iterator[Dict]) -> int:
+    table = model.__table__
+    use_copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+    total = 0
+    for batch in _batches(rows, SEED_BATCH_SIZE):
+        if use_copy:
+            _copy(conn, table, batch)
+        else:
+            conn.execute(table.insert(), batch)
+        total += len(batch)
+    return total
+
+def seed(banks: int, companies: int, accounts: int, seed: int = 42, reset: bool = False) -> Dict:
+    """Заполняет пустую БД и возвращает число строк и время загрузки по таблицам"""
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+    result = {}
+    with engine.begin() as conn:
+        if reset:
+            for model in (AccountStats, BankAccount, Company, Bank):
+                conn.execute(model.__table__.delete())
+        elif conn.execute(select(func.count()).select_from(Bank)).scalar():
+            raise RuntimeError("База уже содержит данные, используйте --reset")
+        
+        for name, model, rows in (
+            ("banks", Bank, generate_banks(banks, rng)),
+            ("companies", Company, generate_companies(companies, rng)),
+            ("bank_accounts", BankAccount, generate_accounts(accounts, companies, banks, rng)),
+        ):
+            start = time.perf_counter()
+            count = _load(conn, model, rows)
+            result[name] = {"rows": count, "seconds": round(time.perf_counter() - start, 2)}
+        
+        # Счетчики /stats/accounts: строки загружены в обход BankAccountCRUD
+        for stmt in rebuild_statements():
+            conn.execute(stmt)
+        
+        if conn.dialect.name == "postgresql":
+            # Явные id не сдвигают последовательности
+            for model in (Bank, Company, BankAccount):
+                table = model.__table__.name
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+                ))
+            conn.execute(text("ANALYZE"))
+    return result
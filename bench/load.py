@@ -0,0 +1,319 @@
+"""Прогон сценариев нагрузки по всем эндпоинтам API.
+
+Каждый сценарий - один эндпоинт: N запросов от C параллельных клиентов.
+Приложение запускается в том же процессе (httpx.ASGITransport) или
+запросы идут на внешний сервер (--url). Идентификаторы для чтения
+выбираются случайно из диапазонов, найденных прямым запросом к БД.
+"""
+import asyncio
+import json
+import platform
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import httpx
+from sqlalchemy import func, select
+from app.database import engine
+from app.models import Bank, BankAccount, Company
+from app.requisites import inn_with_checksum
+from .datagen import NAME_SUFFIXES, make_account_number, make_correspondent_account, make_inn
+
+# Запрос: (метод, путь, аргументы httpx) или None, если сценарию больше нечего делать
+Request = Optional[Tuple[str, str, Dict]]
+
+@dataclass
+class Context:
+    """Общее состояние прогона: диапазоны id и созданные в ходе прогона записи"""
+    rng: random.Random
+    ranges: Dict[str, Tuple[int, int]]
+    run_offset: int = 0
+    counter: int = 0
+    bank_biks: Dict[int, str] = field(default_factory=dict)
+    etags: Dict[Tuple[str, int], str] = field(default_factory=dict)
+    created: Dict[str, List[int]] = field(default_factory=lambda: {"banks": [], "companies": [], "bank_accounts": []})
+    
+    def random_id(self, table: str) -> int:
+        low, high = self.ranges[table]
+        return self.rng.randint(low, high)
+    
+    def next_number(self) -> int:
+        self.counter += 1
+        return self.counter
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[Context], Request]
+    expect: Tuple[int, ...] = (200,)
+    on_response: Optional[Callable[[Context, httpx.Response], None]] = None
+    warmup: bool = True
+
+def _get(path: str) -> Callable[[Context], Request]:
+    return lambda ctx: ("GET", path.format(ctx=ctx), {})
+
+def _bench_bik(ctx: Context, n: int) -> str:
+    # Диапазон 049xxxxxx не пересекается с БИК сгенерированного набора
+    return f"049{(ctx.run_offset + n) % 10**6:06d}"
+
+def _bench_inn(ctx: Context, n: int) -> str:
+    return inn_with_checksum(f"99{(ctx.run_offset + n) % 10**7:07d}")
+
+def _create_bank(ctx: Context) -> Request:
+    n = ctx.next_number()
+    bik = _bench_bik(ctx, n)
+    return ("POST", "/banks/", {"json": {
+        "name": f"Нагрузочный банк {n}", "bik": bik,
+        "correspondent_account": make_correspondent_account(bik),
+    }})
+
+def _create_company(ctx: Context) -> Request:
+    n = ctx.next_number()
+    return ("POST", "/companies/", {"json": {"name": f"Нагрузочная компания {n}", "inn": _bench_inn(ctx, n)}})
+
+def _account_row(ctx: Context) -> Optional[Dict]:
+    if not ctx.created["banks"] or not ctx.created["companies"]:
+        return None
+    bank_id = ctx.rng.choice(ctx.created["banks"])
+    serial = 90_000_000_000 + (ctx.run_offset * 1000 + ctx.next_number()) % 10**10
+    return {
+        "account_number": make_account_number(serial, ctx.bank_biks[bank_id]),
+        "company_id": ctx.rng.choice(ctx.created["companies"]),
+        "bank_id": bank_id,
+    }
+
+def _create_account(ctx: Context) -> Request:
+    row = _account_row(ctx)
+    return row and ("POST", "/bank-accounts/", {"json": row})
+
+def _bulk_accounts(ctx: Context, size: int = 100) -> Request:
+    rows = [_account_row(ctx) for _ in range(size)]
+    if None in rows:
+        return None
+    body = "".join(json.dumps(row) + "\n" for row in rows)
+    return ("POST", "/bank-accounts/bulk", {"content": body, "headers": {"Content-Type": "application/x-ndjson"}})
+
+def _remember(table: str):
+    def on_response(ctx: Context, response: httpx.Response) -> None:
+        data = response.json()
+        ctx.created[table].append(data["id"])
+        if table == "banks":
+            ctx.bank_biks[data["id"]] = data["bik"]
+    return on_response
+
+def _update(table: str, path: str, body: Callable[[Context], Dict]) -> Callable[[Context], Request]:
+    def build(ctx: Context) -> Request:
+        if not ctx.created[table]:
+            return None
+        return ("PUT", f"{path}/{ctx.rng.choice(ctx.created[table])}", {"json": body(ctx)})
+    return build
+
+def _delete(table: str, path: str) -> Callable[[Context], Request]:
+    def build(ctx: Context) -> Request:
+        if not ctx.created[table]:
+            return None
+        return ("DELETE", f"{path}/{ctx.created[table].pop()}", {})
+    return build
+
+def _conditional_get(table: str, path: str) -> Callable[[Context], Request]:
+    """Повторный GET с If-None-Match: ETag берется из предыдущего ответа по тому же id"""
+    def build(ctx: Context) -> Request:
+        entity_id = ctx.random_id(table)
+        etag = ctx.etags.get((table, entity_id))
+        headers = {"If-None-Match": etag} if etag else {}
+        return ("GET", f"{path}/{entity_id}", {"headers": headers})
+    return build
+
+def _store_etag(table: str):
+    def on_response(ctx: Context, response: httpx.Response) -> None:
+        etag = response.headers.get("etag")
+        if etag:
+            entity_id = int(response.request.url.path.rsplit("/", 1)[1])
+            ctx.etags[(table, entity_id)] = etag
+    return on_response
+
+def _batch(table: str, path: str, size: int) -> Callable[[Context], Request]:
+    def build(ctx: Context) -> Request:
+        return ("POST", f"{path}/batch", {"json": {"ids": [ctx.random_id(table) for _ in range(size)]}})
+    return build
+
+SCENARIOS: List[Scenario] = [
+    Scenario("root", _get("/")),
+    Scenario("health", _get("/health")),
+    Scenario("banks.list", _get("/banks/?limit=100")),
+    Scenario("banks.list_by_name", _get("/banks/?limit=100&sort=name")),
+    Scenario("banks.list_with_accounts", _get("/banks/?limit=50&include_accounts=true")),
+    Scenario("banks.search", lambda ctx: ("GET", f"/banks/search?q={ctx.rng.choice(NAME_SUFFIXES)}", {})),
+    Scenario("banks.get", lambda ctx: ("GET", f"/banks/{ctx.random_id('banks')}", {})),
+    Scenario("banks.get_conditional", _conditional_get("banks", "/banks"), expect=(200, 304),
+             on_response=_store_etag("banks")),
+    Scenario("banks.batch", _batch("banks", "/banks", 10)),
+    Scenario("companies.list", _get("/companies/?limit=100")),
+    Scenario("companies.list_by_name", _get("/companies/?limit=100&sort=name")),
+    Scenario("companies.list_with_accounts", _get("/companies/?limit=50&include_accounts=true")),
+    Scenario("companies.search", lambda ctx: ("GET", f"/companies/search?q={ctx.rng.choice(NAME_SUFFIXES)}", {})),
+    Scenario("companies.search_inn",
+             lambda ctx: ("GET", f"/companies/search?q={make_inn(ctx.random_id('companies'))[:6]}", {})),
+    Scenario("companies.get", lambda ctx: ("GET", f"/companies/{ctx.random_id('companies')}", {})),
+    Scenario("companies.batch", _batch("companies", "/companies", 100)),
+    Scenario("bank_accounts.list", _get("/bank-accounts/?limit=100")),
+    Scenario("bank_accounts.list_fields", _get("/bank-accounts/?limit=100&fields=id,account_number,bank_id")),
+    Scenario("bank_accounts.list_by_company",
+             lambda ctx: ("GET", f"/bank-accounts/?company_id={ctx.random_id('companies')}", {})),
+    Scenario("bank_accounts.list_by_bank",
+             lambda ctx: ("GET", f"/bank-accounts/?bank_id={ctx.random_id('banks')}&limit=100", {})),
+    Scenario("bank_accounts.get", lambda ctx: ("GET", f"/bank-accounts/{ctx.random_id('bank_accounts')}", {})),
+    Scenario("bank_accounts.batch", _batch("bank_accounts", "/bank-accounts", 100)),
+    Scenario("bank_accounts.company",
+             lambda ctx: ("GET", f"/bank-accounts/company/{ctx.random_id('companies')}", {})),
+    Scenario("bank_accounts.export",
+             lambda ctx: ("GET", f"/bank-accounts/export?bank_id={ctx.random_id('banks')}", {})),
+    Scenario("stats.accounts", _get("/stats/accounts")),
+    Scenario("stats.accounts_by_bank_currency", _get("/stats/accounts?group_by=bank_id&group_by=currency")),
+    Scenario("stats.accounts_by_company",
+             lambda ctx: ("GET", "/stats/accounts?group_by=company_id&group_by=is_active&limit=1000", {})),
+    Scenario("admin.cache", _get("/admin/cache")),
+    Scenario("admin.pool", _get("/admin/pool")),
+    Scenario("metrics", _get("/metrics")),
+    # Запись: созданные записи используются в обновлениях и удаляются в конце
+    Scenario("banks.create", _create_bank, expect=(201,), on_response=_remember("banks"), warmup=False),
+    Scenario("companies.create", _create_company, expect=(201,), on_response=_remember("companies"), warmup=False),
+    Scenario("bank_accounts.create", _create_account, expect=(201,), on_response=_remember("bank_accounts"),
+             warmup=False),
+    Scenario("bank_accounts.bulk", _bulk_accounts, warmup=False),
+    Scenario("banks.update", _update("banks", "/banks", lambda ctx: {"address": f"Адрес {ctx.next_number()}"}),
+             warmup=False),
+    Scenario("companies.update",
+             _update("companies", "/companies", lambda ctx: {"description": f"Описание {ctx.next_number()}"}),
+             warmup=False),
+    Scenario("bank_accounts.update",
+             _update("bank_accounts", "/bank-accounts", lambda ctx: {"is_active": ctx.rng.choice("YN")}),
+             warmup=False),
+    Scenario("bank_accounts.delete", _delete("bank_accounts", "/bank-accounts"), expect=(204,), warmup=False),
+    Scenario("companies.delete", _delete("companies", "/companies"), expect=(204,), warmup=False),
+    Scenario("banks.delete", _delete("banks", "/banks"), expect=(204,), warmup=False),
+]
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], errors: int, statuses: Counter, elapsed: float) -> Dict:
+    latencies = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+    }
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, ctx: Context,
+                       requests: int, clients: int, record: bool = True) -> Dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors = 0
+    remaining = requests
+    
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            request = scenario.build(ctx)
+            if request is None:
+                return
+            method, path, kwargs = request
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            if response.status_code not in scenario.expect:
+                errors += 1
+            elif scenario.on_response:
+                scenario.on_response(ctx, response)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return summarize(latencies, errors, statuses, time.perf_counter() - start)
+
+def id_ranges() -> Dict[str, Tuple[int, int]]:
+    """Диапазоны id по таблицам для случайного выбора записей"""
+    ranges = {}
+    with engine.connect() as conn:
+        for name, model in (("banks", Bank), ("companies", Company), ("bank_accounts", BankAccount)):
+            low, high = conn.execute(select(func.min(model.id), func.max(model.id))).one()
+            if low is None:
+                raise RuntimeError(f"Таблица {name} пуста, сначала выполните bench seed")
+            ranges[name] = (low, high)
+    return ranges
+
+async def run(requests: int, clients: int, warmup: int, url: Optional[str] = None,
+              only: Optional[List[str]] = None, seed: int = 42) -> Dict:
+    # Смещение номеров создаваемых записей, чтобы повторные прогоны не конфликтовали
+    ctx = Context(rng=random.Random(seed), ranges=id_ranges(), run_offset=int(time.time()) % 10**5 * 10)
+    scenarios = [s for s in SCENARIOS if not only or any(s.name.startswith(prefix) for prefix in only)]
+    
+    results = {}
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=60)
+        lifespan = None
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+    
+    try:
+        async with client:
+            for scenario in scenarios:
+                if warmup and scenario.warmup:
+                    await run_scenario(client, scenario, ctx, warmup, clients)
+                results[scenario.name] = await run_scenario(client, scenario, ctx, requests, clients)
+                stats = results[scenario.name]
+                print(f"{scenario.name:32} {stats['rps']:>9.1f} rps  p50 {stats['p50_ms']:>8.2f}  "
+                      f"p95 {stats['p95_ms']:>8.2f}  p99 {stats['p99_ms']:>8.2f} ms  errors {stats['errors']}")
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "target": url or "in-process",
+            "database": engine.dialect.name,
+            "dataset": {name: high - low + 1 for name, (low, high) in ctx.ranges.items()},
+            "requests": requests,
+            "clients": clients,
+            "warmup": warmup,
+            "python": platform.python_version(),
+        },
+        "scenarios": results,
+    }
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> List[str]:
+    """Регрессии текущего прогона относительно эталона: рост p95 или падение RPS больше допуска"""
+    regressions = []
+    for name, base in baseline["scenarios"].items():
+        stats = current["scenarios"].get(name)
+        if not stats or not base["requests"]:
+            continue
+        if base["p95_ms"] and stats["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {stats['p95_ms']} мс")
+        if base["rps"] and stats["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']} -> {stats['rps']}")
+        if stats["errors"] > base["errors"]:
+            regressions.append(f"{name}: ошибок {base['errors']} -> {stats['errors']}")
+    return regressions
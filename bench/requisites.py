@@ -0,0 +1,76 @@
+"""Пропускная способность проверки реквизитов: проверок в секунду.
+
+Сравнивает поштучную проверку (как в схемах), пакетную (numpy) и
+POST /validate/requisites целиком, с разбором JSON и ответом.
+"""
+import random
+import time
+from typing import Dict, List, Tuple
+import httpx
+import orjson
+from app.requisites import check_accounts, check_inns, is_valid_account, is_valid_inn, settlement_key_prefix
+from .datagen import make_account_number, make_bik, make_inn
+
+# Доля строк с ошибкой: в ответе возвращаются только они
+INVALID_SHARE = 0.01
+
+def make_requisites(count: int, rng: random.Random) -> Tuple[List[str], List[str], List[str]]:
+    inns, accounts, biks = [], [], []
+    for _ in range(count):
+        inn = make_inn(rng.randrange(10**7))
+        bik = make_bik(rng.randrange(1, 10**5))
+        account = make_account_number(rng.randrange(10**10), bik)
+        if rng.random() < INVALID_SHARE:
+            inn = inn[:-1] + str((int(inn[-1]) + 1) % 10)
+            account = account[:-1] + str((int(account[-1]) + 1) % 10)
+        inns.append(inn)
+        accounts.append(account)
+        biks.append(bik)
+    return inns, accounts, biks
+
+def _best(action, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+async def measure(count: int, repeat: int = 5, seed: int = 42) -> Dict:
+    from app.main import app
+    
+    inns, accounts, biks = make_requisites(count, random.Random(seed))
+    checks = 2 * count
+    sample = min(count, 100_000)
+    
+    def scalar():
+        for inn in inns[:sample]:
+            is_valid_inn(inn)
+        for account, bik in zip(accounts[:sample], biks):
+            is_valid_account(account, settlement_key_prefix(bik))
+    
+    def vectorized():
+        check_inns(inns)
+        check_accounts(accounts, biks)
+    
+    results = {
+        "scalar": 2 * sample / _best(scalar, repeat),
+        "vectorized": checks / _best(vectorized, repeat),
+    }
+    
+    # Тело кодируется заранее: время клиента на JSON не входит в замер
+    body = orjson.dumps({"inns": inns, "accounts": accounts, "biks": biks})
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300) as client:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = await client.post(
+                "/validate/requisites", content=body, headers={"Content-Type": "application/json"}
+            )
+            timings.append(time.perf_counter() - start)
+            response.raise_for_status()
+    results["endpoint"] = checks / min(timings)
+    
+    for name, rate in results.items():
+        print(f"{name:12} {rate / 1e6:>8.2f} млн проверок/с")
+    return {"count": count, "checks_per_second": {name: round(rate) for name, rate in results.items()}}
@@ -0,0 +1,77 @@
+"""Масштабирование по ядрам: одни и те же сценарии против app.server с разным числом воркеров.
+
+Для каждого числа воркеров запускается отдельный сервер, после /ready выполняется
+прогон через HTTP, затем сервер останавливается по SIGTERM.
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+import httpx
+from .load import run
+
+# Сценарии чтения по умолчанию: без записи, чтобы прогоны были сравнимы
+SCALE_SCENARIOS = ["bank_accounts.get", "bank_accounts.list", "companies.get", "banks.list"]
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--max-requests", "0"],
+        env={**os.environ, "WEB_WORKERS": str(workers)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+async def wait_ready(url: str, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    detail = "сервер не отвечает"
+    async with httpx.AsyncClient(base_url=url, timeout=5) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get("/ready")
+                if response.status_code == 200:
+                    return
+                detail = response.json().get("error")
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Сервер не готов: {detail}")
+
+def stop_server(server: subprocess.Popen, timeout: float = 60) -> None:
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+async def scale(workers: List[int], requests: int, clients: int, warmup: int,
+                only: Optional[List[str]] = None, port: int = 8765) -> Dict:
+    url = f"http://127.0.0.1:{port}"
+    runs = {}
+    for count in workers:
+        print(f"--- воркеров: {count}")
+        server = start_server(count, port)
+        try:
+            await wait_ready(url)
+            runs[count] = await run(requests, clients, warmup, url=url, only=only or SCALE_SCENARIOS)
+        finally:
+            stop_server(server)
+
+    base = workers[0]
+    print(f"\n{'сценарий':32}" + "".join(f"{f'{count} воркер.':>14}" for count in workers))
+    for name in runs[base]["scenarios"]:
+        base_rps = runs[base]["scenarios"][name]["rps"]
+        cells = []
+        for count in workers:
+            rps = runs[count]["scenarios"][name]["rps"]
+            cells.append(f"{rps:>7.0f} x{rps / base_rps if base_rps else 0:<4.1f}")
+        print(f"{name:32}" + "".join(f"{cell:>14}" for cell in cells))
+
+    return {
+        "meta": {**runs[base]["meta"], "target": "app.server", "cpu_count": os.cpu_count(), "workers": workers},
+        "runs": {str(count): result["scenarios"] for count, result in runs.items()},
+    }
@@ -7,7 +7,6 @@ import uvicorn
 import asyncio
 import httpx
 import json
-from app.main import app
 
 async def test_api():
     """Тестирование основных API endpoints"""
@@ -104,10 +103,10 @@ async def test_api():
         print("\n🎉 Тестирование завершено успешно!")
 
 def run_server():
-    """Запуск сервера"""
+    """Запуск сервера разработки: один процесс с перезагрузкой по изменениям"""
     print("🚀 Запуск Banking API сервера...")
     print("📖 Документация доступна по адресу: http://localhost:8000/docs")
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
 
 if __name__ == "__main__":
     import sys
@@ -115,6 +114,10 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "test":
         # Запуск тестов
         asyncio.run(test_api())
+    elif len(sys.argv) > 1 and sys.argv[1] == "prod":
+        # Несколько воркеров без перезагрузки, параметры - как у python -m app.server
+        from app.server import main
+        sys.exit(main(sys.argv[2:]))
     else:
         # Запуск сервера
         run_server()
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Тесты API на SQLite через aiosqlite - тот же асинхронный движок, что и в работе.
+
+Настройки читаются при импорте app, поэтому окружение задается до него:
+отдельный файл БД во временном каталоге, схема по моделям и заголовок
+X-Query-Count на каждом ответе.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+TEST_DIR = Path(tempfile.mkdtemp(prefix="banking-api-tests-"))
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{TEST_DIR / 'primary.db'}",
+    "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{TEST_DIR / 'primary.db'}",
+    "DATABASE_REPLICA_URLS": "",
+    "DATABASE_CREATE_ALL": "true",
+    "QUERY_PROFILING": "true",
+    "IDEMPOTENCY_STORE": "memory",
+    "SECRET_KEY": "test",
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+    "DB_NAME": "test",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine
+from app.crud.cache import bank_cache, company_cache
+from app.idempotency import idempotency
+from app.requisites import (
+    account_with_key, correspondent_key_prefix, inn_with_checksum, settlement_key_prefix
+)
+
+def clear_database() -> None:
+    """Удаляет все строки синхронным движком и сбрасывает кэши процесса"""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    bank_cache.cache.clear()
+    company_cache.cache.clear()
+    idempotency.store.cache.clear()
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+    clear_database()
+
+class Factory:
+    """Создание записей через API с корректными реквизитами"""
+
+    def __init__(self, client: TestClient):
+        self.client = client
+        self.serial = 0
+
+    def _next(self) -> int:
+        self.serial += 1
+        return self.serial
+
+    def company(self, **fields) -> dict:
+        serial = self._next()
+        body = {"name": f"Компания {serial}", "inn": inn_with_checksum(f"77{serial:07d}"), **fields}
+        response = self.client.post("/companies/", json=body)
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    def bank(self, **fields) -> dict:
+        bik = f"0445{self._next():05d}"
+        body = {
+            "name": f"Банк {bik}",
+            "bik": bik,
+            "correspondent_account": account_with_key("30101810000000000000", correspondent_key_prefix(bik)),
+            **fields,
+        }
+        response = self.client.post("/banks/", json=body)
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    def account(self, company: dict, bank: dict, **fields) -> dict:
+        number = account_with_key(f"40702810{self._next():012d}", settlement_key_prefix(bank["bik"]))
+        body = {"account_number": number, "company_id": company["id"], "bank_id": bank["id"], **fields}
+        response = self.client.post("/bank-accounts/", json=body)
+        assert response.status_code == 201, response.text
+        return response.json()
+
+@pytest.fixture
+def factory(client) -> Factory:
+    return Factory(client)
@@ -0,0 +1,131 @@
+from app.requisites import account_with_key, settlement_key_prefix
+
+def test_create_and_get(client, factory):
+    company, bank = factory.company(), factory.bank()
+    account = factory.account(company, bank)
+    assert account["company"]["id"] == company["id"]
+    assert account["bank"]["bik"] == bank["bik"]
+
+    response = client.get(f"/bank-accounts/{account['id']}")
+    assert response.status_code == 200
+    assert response.json()["account_number"] == account["account_number"]
+
+def test_create_errors(client, factory):
+    company, bank = factory.company(), factory.bank()
+    account = factory.account(company, bank)
+    number = account_with_key("40702810000000000999", settlement_key_prefix(bank["bik"]))
+
+    def create(**fields):
+        body = {"account_number": number, "company_id": company["id"], "bank_id": bank["id"], **fields}
+        return client.post("/bank-accounts/", json=body)
+
+    assert create(company_id=999).json()["detail"] == "Компания не найдена"
+    assert create(bank_id=999).json()["detail"] == "Банк не найден"
+    assert create(account_number=account["account_number"]).json()["detail"] == (
+        "Счет с таким номером уже существует в данном банке"
+    )
+    # Дубликат номера с несуществующей компанией - ошибка компании, а не дубликата
+    assert create(account_number=account["account_number"], company_id=999).json()["detail"] == "Компания не найдена"
+    assert create(account_number="40702810000000000000").status_code == 400
+
+def test_list_and_company_accounts(client, factory):
+    company, other, bank = factory.company(), factory.company(), factory.bank()
+    ids = [factory.account(company, bank)["id"] for _ in range(2)]
+    factory.account(other, bank)
+
+    assert len(client.get("/bank-accounts/").json()["items"]) == 3
+    response = client.get(f"/bank-accounts/company/{company['id']}")
+    assert [account["id"] for account in response.json()] == ids
+    assert client.get("/bank-accounts/company/999").status_code == 404
+
+def test_update_moves_stats(client, factory):
+    company, bank = factory.company(), factory.bank()
+    account = factory.account(company, bank)
+
+    response = client.put(f"/bank-accounts/{account['id']}", json={"currency": "USD"})
+    assert response.status_code == 200
+    stats = client.get("/stats/accounts", params={"group_by": "currency"}).json()
+    assert [(group["currency"], group["count"]) for group in stats] == [("USD", 1)]
+
+def test_patch_if_match(client, factory):
+    account = factory.account(factory.company(), factory.bank())
+    etag = client.get(f"/bank-accounts/{account['id']}").headers["etag"]
+
+    response = client.patch(f"/bank-accounts/{account['id']}", json={"is_active": "N"}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["is_active"] == "N"
+    assert response.headers["etag"] == client.get(f"/bank-accounts/{account['id']}").headers["etag"]
+
+    response = client.patch(f"/bank-accounts/{account['id']}", json={"is_active": "Y"}, headers={"If-Match": etag})
+    assert response.status_code == 412
+    response = client.patch(f"/bank-accounts/{account['id']}", json={"is_active": "Y", "version": 1})
+    assert response.status_code == 409
+
+def test_bulk_status(client, factory):
+    company, bank = factory.company(), factory.bank()
+    for _ in range(3):
+        factory.account(company, bank)
+
+    response = client.post("/bank-accounts/status", json={"is_active": "N", "bank_id": bank["id"]})
+    assert response.json() == {"updated": 3}
+    response = client.post("/bank-accounts/status", json={"is_active": "N", "bank_id": bank["id"]})
+    assert response.json() == {"updated": 0}
+
+def test_bulk_import(client, factory):
+    company, bank = factory.company(), factory.bank()
+    number = account_with_key("40702810000000000777", settlement_key_prefix(bank["bik"]))
+    body = (
+        f"account_number,company_id,bank_id\n"
+        f"{number},{company['id']},{bank['id']}\n"
+        f"{number},{company['id']},{bank['id']}\n"
+    )
+    response = client.post("/bank-accounts/bulk", content=body, headers={"Content-Type": "text/csv"})
+    result = response.json()
+    assert (result["total"], result["created"], result["failed"]) == (2, 1, 1)
+
+def test_idempotent_create(client, factory):
+    company, bank = factory.company(), factory.bank()
+    number = account_with_key("40702810000000000555", settlement_key_prefix(bank["bik"]))
+    body = {"account_number": number, "company_id": company["id"], "bank_id": bank["id"]}
+    headers = {"Idempotency-Key": "create-account"}
+
+    first = client.post("/bank-accounts/", json=body, headers=headers)
+    second = client.post("/bank-accounts/", json=body, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.json()["id"] == first.json()["id"]
+
+    other = client.post("/bank-accounts/", json={**body, "currency": "USD"}, headers=headers)
+    assert other.status_code == 422
+
+def test_delete(client, factory):
+    account = factory.account(factory.company(), factory.bank())
+    assert client.delete(f"/bank-accounts/{account['id']}").status_code == 204
+    assert client.get(f"/bank-accounts/{account['id']}").status_code == 404
+    assert client.delete(f"/bank-accounts/{account['id']}").status_code == 404
+
+def test_stats_groups(client, factory):
+    company, bank = factory.company(), factory.bank()
+    factory.account(company, bank)
+    factory.account(company, bank, currency="USD")
+
+    response = client.get("/stats/accounts", params={"group_by": ["bank_id", "currency"]})
+    assert [(group["bank_id"], group["currency"], group["count"]) for group in response.json()] == [
+        (bank["id"], "RUB", 1), (bank["id"], "USD", 1),
+    ]
+    response = client.get("/stats/accounts", params={"group_by": ["bank_id", "company_id"]})
+    assert response.status_code == 400
+
+def test_sparse_fields(client, factory):
+    company, bank = factory.company(), factory.bank()
+    account = factory.account(company, bank)
+
+    # Связь, которой нет в fields и include, не загружается и не попадает в ответ
+    response = client.get(f"/bank-accounts/{account['id']}", params={"fields": "id,company.name"})
+    assert response.status_code == 200
+    assert response.json() == {"id": account["id"], "company": {"id": company["id"], "name": company["name"]}}
+
+    response = client.get("/bank-accounts/", params={"fields": "id,account_number"})
+    assert response.json()["items"] == [{"id": account["id"], "account_number": account["account_number"]}]
+    response = client.get(f"/bank-accounts/company/{company['id']}", params={"fields": "id", "include": "bank"})
+    assert [item["bank"]["bik"] for item in response.json()] == [bank["bik"]]
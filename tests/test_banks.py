@@ -0,0 +1,59 @@
+from app.requisites import account_with_key, correspondent_key_prefix
+
+def test_create_and_get(client, factory):
+    bank = factory.bank(address="Москва")
+    response = client.get(f"/banks/{bank['id']}")
+    assert response.status_code == 200
+    assert response.json()["bik"] == bank["bik"]
+    assert response.json()["bank_accounts"] == []
+
+def test_duplicate_bik(client, factory):
+    bank = factory.bank()
+    response = client.post("/banks/", json={"name": "Дубль", "bik": bank["bik"]})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Банк с таким БИК уже существует"
+
+def test_correspondent_account_key(client):
+    response = client.post("/banks/", json={"name": "Банк", "bik": "044525225", "correspondent_account": "30101810400000000226"})
+    assert response.status_code == 422
+
+def test_list_and_batch(client, factory):
+    first, second = factory.bank(), factory.bank()
+    factory.account(factory.company(), first)
+
+    items = client.get("/banks/").json()["items"]
+    assert {item["id"]: item["accounts_count"] for item in items} == {first["id"]: 1, second["id"]: 0}
+
+    body = client.get("/banks/batch", params={"ids": [second["id"], first["id"], 999]}).json()
+    assert [item["id"] for item in body["items"]] == [second["id"], first["id"]]
+    assert body["missing"] == [999]
+
+def test_patch(client, factory):
+    bank = factory.bank()
+    etag = client.get(f"/banks/{bank['id']}").headers["etag"]
+
+    response = client.patch(f"/banks/{bank['id']}", json={"address": "Казань"}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["address"] == "Казань"
+    assert response.headers["etag"] == client.get(f"/banks/{bank['id']}").headers["etag"]
+
+    response = client.patch(f"/banks/{bank['id']}", json={"address": "Омск"}, headers={"If-Match": etag})
+    assert response.status_code == 412
+
+def test_patch_bik_checks_correspondent_account(client, factory):
+    bank = factory.bank()
+    response = client.patch(f"/banks/{bank['id']}", json={"bik": "044525225"})
+    assert response.status_code == 400
+
+    correspondent_account = account_with_key("30101810000000000000", correspondent_key_prefix("044525225"))
+    response = client.patch(
+        f"/banks/{bank['id']}", json={"bik": "044525225", "correspondent_account": correspondent_account}
+    )
+    assert response.status_code == 200
+
+def test_delete(client, factory):
+    bank = factory.bank()
+    account = factory.account(factory.company(), bank)
+    assert client.delete(f"/banks/{bank['id']}").status_code == 204
+    assert client.get(f"/banks/{bank['id']}").status_code == 404
+    assert client.get(f"/bank-accounts/{account['id']}").status_code == 404
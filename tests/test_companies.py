@@ -0,0 +1,108 @@
+from app.requisites import inn_with_checksum
+
+def test_create_and_get(client, factory):
+    company = factory.company(description="Описание")
+    assert company["version"] == 1
+    assert company["bank_accounts"] == []
+
+    response = client.get(f"/companies/{company['id']}")
+    assert response.status_code == 200
+    assert response.json()["inn"] == company["inn"]
+    assert response.headers["etag"]
+
+def test_duplicate_inn(client, factory):
+    company = factory.company()
+    response = client.post("/companies/", json={"name": "Дубль", "inn": company["inn"]})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Компания с таким ИНН уже существует"
+
+def test_invalid_inn(client):
+    response = client.post("/companies/", json={"name": "Ошибка", "inn": "7707083890"})
+    assert response.status_code == 422
+
+def test_not_found(client):
+    assert client.get("/companies/999").status_code == 404
+    assert client.patch("/companies/999", json={"name": "x"}).status_code == 404
+    assert client.delete("/companies/999").status_code == 404
+
+def test_list_with_accounts_summary(client, factory):
+    bank = factory.bank()
+    first, second = factory.company(), factory.company()
+    factory.account(first, bank)
+    factory.account(first, bank)
+
+    response = client.get("/companies/", params={"include_accounts": True, "accounts_limit": 1})
+    assert response.status_code == 200
+    items = {item["id"]: item for item in response.json()["items"]}
+    assert items[first["id"]]["accounts_count"] == 2
+    assert len(items[first["id"]]["bank_accounts"]) == 1
+    assert items[second["id"]]["accounts_count"] == 0
+
+def test_cursor_pagination(client, factory):
+    ids = [factory.company()["id"] for _ in range(3)]
+    page = client.get("/companies/", params={"limit": 2}).json()
+    assert [item["id"] for item in page["items"]] == ids[:2]
+    page = client.get("/companies/", params={"limit": 2, "cursor": page["next_cursor"]}).json()
+    assert [item["id"] for item in page["items"]] == ids[2:]
+    assert page["next_cursor"] is None
+
+def test_batch(client, factory):
+    first, second = factory.company(), factory.company()
+    response = client.post("/companies/batch", json={"ids": [second["id"], 999, first["id"]]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["id"] for item in body["items"]] == [second["id"], first["id"]]
+    assert body["missing"] == [999]
+
+def test_update_with_if_match(client, factory):
+    company = factory.company()
+    etag = client.get(f"/companies/{company['id']}").headers["etag"]
+
+    response = client.put(f"/companies/{company['id']}", json={"name": "Новое"}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+
+    response = client.put(f"/companies/{company['id']}", json={"name": "Еще"}, headers={"If-Match": etag})
+    assert response.status_code == 412
+
+def test_patch_version(client, factory):
+    company = factory.company()
+    response = client.patch(f"/companies/{company['id']}", json={"description": "d", "version": 1})
+    assert response.status_code == 200
+    assert response.headers["etag"] == client.get(f"/companies/{company['id']}").headers["etag"]
+
+    response = client.patch(f"/companies/{company['id']}", json={"description": "e", "version": 1})
+    assert response.status_code == 409
+
+def test_patch_duplicate_inn(client, factory):
+    first, second = factory.company(), factory.company()
+    response = client.patch(f"/companies/{second['id']}", json={"inn": first["inn"]})
+    assert response.status_code == 400
+
+def test_delete_cascades_accounts(client, factory):
+    bank = factory.bank()
+    company = factory.company()
+    account = factory.account(company, bank)
+
+    assert client.delete(f"/companies/{company['id']}").status_code == 204
+    assert client.get(f"/bank-accounts/{account['id']}").status_code == 404
+    assert client.get(f"/banks/{bank['id']}").json()["bank_accounts"] == []
+
+def test_search(client, factory):
+    company = factory.company(name="Ромашка")
+    factory.company(inn=inn_with_checksum("500100732"))
+    response = client.get("/companies/search", params={"q": "Ромаш"})
+    assert [item["id"] for item in response.json()["items"]] == [company["id"]]
+
+def test_search_cyrillic_case(client, factory):
+    prefix = factory.company(name="Сбербанк Лизинг")
+    inner = factory.company(name="ООО Сбережения")
+    factory.company(name="Газпром")
+
+    # Короткий запрос - без индекса FTS5, регистр кириллицы тоже не важен
+    response = client.get("/companies/search", params={"q": "сБ"})
+    assert [item["id"] for item in response.json()["items"]] == [prefix["id"], inner["id"]]
+
+    # Начало названия ранжируется выше подстроки и при другом регистре
+    response = client.get("/companies/search", params={"q": "сБЕР"})
+    assert [item["id"] for item in response.json()["items"]] == [prefix["id"], inner["id"]]
@@ -0,0 +1,68 @@
+"""If-Match при PUT и DELETE: запись, измененная между проверкой ETag и записью, не перезаписывается.
+
+Изменение вставляется сразу после чтения версии обработчиком, через
+синхронный движок - как запись другого клиента в этот момент.
+"""
+import pytest
+from sqlalchemy import update
+from app.crud.bank import bank_crud
+from app.crud.bank_account import bank_account_crud
+from app.crud.company import company_crud
+from app.database import engine
+from app.models.bank import Bank
+from app.models.bank_account import BankAccount
+from app.models.company import Company
+
+def change_after(monkeypatch, crud, method: str, model) -> None:
+    """После method (чтения версии) строка изменяется другим клиентом"""
+    read = getattr(crud, method)
+
+    async def read_then_change(db, id):
+        result = await read(db, id=id)
+        with engine.begin() as conn:
+            conn.execute(update(model).where(model.id == id).values(version=model.version + 1))
+        return result
+
+    monkeypatch.setattr(crud, method, read_then_change)
+
+@pytest.fixture
+def records(factory):
+    company, bank = factory.company(), factory.bank()
+    return {"company": company, "bank": bank, "account": factory.account(company, bank)}
+
+CASES = [
+    ("company", "/companies/{id}", company_crud, Company, {"name": "Новое"}),
+    ("bank", "/banks/{id}", bank_crud, Bank, {"name": "Новый"}),
+    ("account", "/bank-accounts/{id}", bank_account_crud, BankAccount, {"currency": "USD"}),
+]
+
+@pytest.mark.parametrize("record, path, crud, model, body", CASES)
+def test_put_concurrent_change(client, records, monkeypatch, record, path, crud, model, body):
+    url = path.format(id=records[record]["id"])
+    etag = client.get(url).headers["etag"]
+    # PUT компании и банка читает запись целиком, PUT счета - только версию
+    change_after(monkeypatch, crud, "get_version" if record == "account" else "get", model)
+
+    response = client.put(url, json=body, headers={"If-Match": etag})
+    assert response.status_code == 412
+    monkeypatch.undo()
+    assert client.get(url).json()[next(iter(body))] != next(iter(body.values()))
+
+@pytest.mark.parametrize("record, path, crud, model, body", CASES)
+def test_delete_concurrent_change(client, records, monkeypatch, record, path, crud, model, body):
+    url = path.format(id=records[record]["id"])
+    etag = client.get(url).headers["etag"]
+    change_after(monkeypatch, crud, "get_version", model)
+
+    assert client.delete(url, headers={"If-Match": etag}).status_code == 412
+    monkeypatch.undo()
+    assert client.get(url).status_code == 200
+
+def test_delete_keeps_stats_on_conflict(client, records, monkeypatch):
+    url = f"/companies/{records['company']['id']}"
+    etag = client.get(url).headers["etag"]
+    change_after(monkeypatch, company_crud, "get_version", Company)
+
+    assert client.delete(url, headers={"If-Match": etag}).status_code == 412
+    monkeypatch.undo()
+    assert [group["count"] for group in client.get("/stats/accounts").json()] == [1]
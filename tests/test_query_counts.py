@@ -0,0 +1,148 @@
+"""Число SQL-запросов эндпоинтов чтения и записи (X-Query-Count).
+
+Каждый эндпоинт вызывается на малом и на втрое большем наборе данных:
+число запросов не должно зависеть от числа записей (N+1) и не должно
+превышать бюджет. Кэши справочников сбрасываются перед каждым вызовом,
+чтобы промахи кэша считались одинаково.
+"""
+import pytest
+from app.crud.cache import bank_cache, company_cache
+from app.crud.company import company_crud
+from app.database import AsyncSessionLocal
+from app.profiling import profile_queries
+from app.requisites import (
+    account_with_key, correspondent_key_prefix, inn_with_checksum, settlement_key_prefix
+)
+
+# (метод, путь, параметры, тело, наибольшее число запросов);
+# {company}, {bank}, {account} и {*_ids} подставляются из набора данных
+ENDPOINTS = [
+    ("GET", "/companies/", {}, None, 2),
+    ("GET", "/companies/", {"include_accounts": True}, None, 3),
+    ("GET", "/companies/", {"fields": "id,name"}, None, 1),
+    ("GET", "/companies/{company}", {}, None, 2),
+    ("GET", "/companies/batch", {"ids": "{company_ids}", "include_accounts": True}, None, 3),
+    ("POST", "/companies/batch", {}, {"ids": "{company_ids}"}, 2),
+    ("GET", "/banks/", {}, None, 2),
+    ("GET", "/banks/", {"include_accounts": True}, None, 3),
+    ("GET", "/banks/{bank}", {}, None, 2),
+    ("GET", "/banks/batch", {"ids": "{bank_ids}"}, None, 2),
+    ("POST", "/banks/batch", {"include_accounts": True}, {"ids": "{bank_ids}"}, 3),
+    ("GET", "/bank-accounts/", {}, None, 1),
+    ("GET", "/bank-accounts/", {"include": "company"}, None, 1),
+    ("GET", "/bank-accounts/{account}", {}, None, 1),
+    ("GET", "/bank-accounts/company/{company}", {}, None, 2),
+    ("GET", "/bank-accounts/batch", {"ids": "{account_ids}"}, None, 3),
+    ("POST", "/bank-accounts/batch", {}, {"ids": "{account_ids}"}, 3),
+]
+
+def serial(data: dict) -> int:
+    data["serial"] = data.get("serial", 0) + 1
+    return data["serial"]
+
+def new_company(data: dict) -> dict:
+    return {"name": "Новая компания", "inn": inn_with_checksum(f"78{serial(data):07d}")}
+
+def new_bank(data: dict) -> dict:
+    bik = f"0446{serial(data):05d}"
+    return {
+        "name": "Новый банк", "bik": bik,
+        "correspondent_account": account_with_key("30101810000000000000", correspondent_key_prefix(bik)),
+    }
+
+def new_account(data: dict) -> dict:
+    bik = data["first"][1]["bik"]
+    return {
+        "account_number": account_with_key(f"40702840{serial(data):012d}", settlement_key_prefix(bik)),
+        "company_id": data["company_ids"][0],
+        "bank_id": data["bank_ids"][0],
+    }
+
+# Эндпоинты записи: тело строится из набора данных при каждом вызове, и каждый
+# вызов действительно меняет запись (поля счетчиков чередуются); DELETE удаляет
+# последнюю запись набора ({last_*})
+WRITES = [
+    ("POST", "/companies/", new_company, 4),
+    ("PUT", "/companies/{company}", lambda data: {"name": "Переименована"}, 5),
+    ("PATCH", "/companies/{company}", lambda data: {"description": "Описание"}, 1),
+    ("DELETE", "/companies/{last_company}", None, 5),
+    ("POST", "/banks/", new_bank, 4),
+    ("PUT", "/banks/{bank}", lambda data: {"address": "Москва"}, 5),
+    ("PATCH", "/banks/{bank}", lambda data: {"address": "Казань"}, 1),
+    ("DELETE", "/banks/{last_bank}", None, 5),
+    ("POST", "/bank-accounts/", new_account, 4),
+    ("PUT", "/bank-accounts/{account}", lambda data: {"currency": ("USD", "EUR")[serial(data) % 2]}, 3),
+    ("PATCH", "/bank-accounts/{account}", lambda data: {"is_active": "YN"[serial(data) % 2]}, 3),
+    ("DELETE", "/bank-accounts/{last_account}", None, 3),
+]
+
+def add_data(factory, data: dict, companies: int) -> None:
+    """Добавляет companies компаний с банком и тремя счетами на каждую.
+
+    Счета добавляются и первой компании и первому банку, чтобы с набором
+    росли и вложенные счета записей, по которым вызываются эндпоинты записи.
+    """
+    for _ in range(companies):
+        company, bank = factory.company(), factory.bank()
+        data.setdefault("first", (company, bank))
+        first_company, first_bank = data["first"]
+        data["company_ids"].append(company["id"])
+        data["bank_ids"].append(bank["id"])
+        for owner, issuer in ((company, bank), (first_company, bank), (company, first_bank)):
+            data["account_ids"].append(factory.account(owner, issuer)["id"])
+
+def fill(value, data: dict):
+    if isinstance(value, str) and value.startswith("{") and value.endswith("_ids}"):
+        return data[value[1:-1]]
+    return value
+
+def query_count(client, method: str, path: str, params: dict, body, data: dict) -> int:
+    bank_cache.cache.clear()
+    company_cache.cache.clear()
+    url = path.format(
+        company=data["company_ids"][0], bank=data["bank_ids"][0], account=data["account_ids"][0],
+        last_company=data["company_ids"][-1], last_bank=data["bank_ids"][-1], last_account=data["account_ids"][-1],
+    )
+    if callable(body):
+        body = body(data)
+    response = client.request(
+        method, url,
+        params={name: fill(value, data) for name, value in params.items()},
+        json={name: fill(value, data) for name, value in body.items()} if body else None,
+    )
+    assert response.is_success, response.text
+    return int(response.headers["x-query-count"])
+
+@pytest.mark.parametrize("method, path, params, body, budget", ENDPOINTS)
+def test_query_count_does_not_grow(client, factory, method, path, params, body, budget):
+    data = {"company_ids": [], "bank_ids": [], "account_ids": []}
+    add_data(factory, data, 2)
+    small = query_count(client, method, path, params, body, data)
+    add_data(factory, data, 4)
+    large = query_count(client, method, path, params, body, data)
+    assert large == small, f"{method} {path}: {small} запросов на 2 записи, {large} на 6"
+    assert large <= budget
+
+@pytest.mark.parametrize("method, path, body, budget", WRITES)
+def test_write_query_count(client, factory, method, path, body, budget):
+    data = {"company_ids": [], "bank_ids": [], "account_ids": []}
+    add_data(factory, data, 2)
+    small = query_count(client, method, path, {}, body, data)
+    add_data(factory, data, 4)
+    large = query_count(client, method, path, {}, body, data)
+    assert large == small, f"{method} {path}: {small} запросов на 2 записи, {large} на 6"
+    assert large <= budget
+
+def test_profile_queries_batch(client, factory):
+    ids = [factory.company()["id"] for _ in range(5)]
+
+    async def load():
+        async with AsyncSessionLocal() as db:
+            with profile_queries() as profile:
+                items, missing = await company_crud.get_many(db, ids, accounts_limit=2)
+        return len(items), profile.count
+
+    found, count = client.portal.call(load)
+    assert found == 5
+    # записи, число счетов и первые счета - по одному запросу на пачку
+    assert count <= 3
@@ -0,0 +1,71 @@
+"""Чтения на реплике, запись на основной БД и закрепление клиента после записи.
+
+Основная БД и реплика - два файла SQLite. Реплика не получает изменений
+основной БД, поэтому по содержимому ответа видно, какая из них его обслужила.
+"""
+import time
+import pytest
+from sqlalchemy import create_engine, select
+import app.database as database
+from app.database import Base, create_replica_engine, engine
+from app.models.company import Company
+from app.replicas import PIN_COOKIE, PIN_HEADER, ReplicaSet
+from app.requisites import inn_with_checksum
+from .conftest import TEST_DIR
+
+REPLICA_URL = f"sqlite:///{TEST_DIR / 'replica.db'}"
+
+@pytest.fixture
+def replica(client, monkeypatch):
+    """Синхронный движок файла реплики; на время теста запросы API читают с нее"""
+    replica_sync = create_engine(REPLICA_URL)
+    Base.metadata.create_all(replica_sync)
+    replica_set = ReplicaSet([create_replica_engine(REPLICA_URL)], pin_window=5)
+    monkeypatch.setattr(database, "replicas", replica_set)
+    yield replica_sync
+    client.portal.call(replica_set.stop)
+    with replica_sync.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    replica_sync.dispose()
+
+def company_names(sync_engine) -> list:
+    with sync_engine.connect() as conn:
+        return list(conn.scalars(select(Company.name).order_by(Company.id)))
+
+def test_reads_go_to_replica(client, replica):
+    with replica.begin() as conn:
+        conn.execute(Company.__table__.insert().values(name="Только на реплике", inn=inn_with_checksum("770000101")))
+
+    response = client.get("/companies/")
+    assert [item["name"] for item in response.json()["items"]] == ["Только на реплике"]
+    assert company_names(engine) == []
+
+def test_writes_go_to_primary(client, replica):
+    response = client.post("/companies/", json={"name": "Новая", "inn": inn_with_checksum("770000102")})
+    assert response.status_code == 201
+    assert company_names(engine) == ["Новая"]
+    assert company_names(replica) == []
+
+def test_write_pins_client_to_primary(client, replica):
+    response = client.post("/companies/", json={"name": "Новая", "inn": inn_with_checksum("770000103")})
+    company_id = response.json()["id"]
+    assert PIN_COOKIE in response.cookies
+    pinned_until = response.headers[PIN_HEADER]
+
+    # Клиент хранит cookie - читает свою запись с основной БД
+    assert client.get(f"/companies/{company_id}").status_code == 200
+
+    # Без cookie чтение уходит на реплику, где записи еще нет
+    client.cookies.clear()
+    assert client.get(f"/companies/{company_id}").status_code == 404
+
+    # Клиент без cookie закрепляется заголовком из ответа на запись
+    response = client.get(f"/companies/{company_id}", headers={PIN_HEADER: pinned_until})
+    assert response.status_code == 200
+
+def test_expired_pin_reads_replica(client, replica):
+    response = client.post("/companies/", json={"name": "Новая", "inn": inn_with_checksum("770000104")})
+    company_id = response.json()["id"]
+    client.cookies.set(PIN_COOKIE, f"{time.time() - 1:.3f}")
+    assert client.get(f"/companies/{company_id}").status_code == 404